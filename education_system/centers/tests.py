@@ -1,3 +1,49 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from education_system.instrumentation import ViewBudgetExceeded, registry
+
+from .models import Center
+
+
+@override_settings(VIEW_BUDGET_ACTION='raise')
+class CenterListBudgetTests(TestCase):
+    """center_list stays within its VIEW_BUDGETS entry however many centers there are"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for n in range(10):
+            coordinator = User.objects.create(username=f'coordinator{n}')
+            Center.objects.create(
+                name=f'Center {n}', location='Pune', coordinator=coordinator,
+                established_date=date(2020, 1, 1), capacity=50,
+            )
+
+    def setUp(self):
+        registry.reset()
+
+    def test_center_list_within_budget(self):
+        response = self.client.get(reverse('center_list'))
+        self.assertEqual(response.status_code, 200)
+        totals = registry.snapshot()['center_list']
+        self.assertLessEqual(totals['queries'], 5)
+        self.assertEqual(totals['over_budget'], 0)
+
+    def test_over_budget_raises(self):
+        with override_settings(VIEW_BUDGETS={'center_list': {'queries': 1}}):
+            with self.assertRaisesMessage(ViewBudgetExceeded, 'queries'):
+                self.client.get(reverse('center_list'))
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('center_list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('django_view_requests_total{view="center_list",status="2xx"} 1', body)
+        self.assertIn('django_view_duration_seconds_count{view="center_list"} 1', body)
+
+        remote = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(remote.status_code, 404)
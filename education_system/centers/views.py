@@ -1,11 +1,17 @@
 from django.shortcuts import render, get_object_or_404
 from django.db.models import Count, Avg, Q, F
 from .models import Center
-from students.models import Student, Attendance
-from datetime import date, timedelta
+from students.models import Student
+from students.bitmaps import attendance_by_student
+from students.metrics import attendance_window_start
+from datetime import date
+
+# Students below this 30-day attendance rate, or absent this many recorded days running, are flagged
+LOW_ATTENDANCE_RATE = 75
+ABSENCE_STREAK_ALERT = 3
 
 def center_list(request):
-    centers = Center.objects.annotate(
+    centers = Center.objects.select_related('coordinator').annotate(
         student_count=Count('student', filter=Q(student__is_active=True)),
         total_capacity=F('capacity')
     )
@@ -19,28 +25,36 @@ def center_detail(request, center_id):
     center = get_object_or_404(Center, id=center_id)
     
     # Get students in this center
-    students = Student.objects.filter(center=center, is_active=True)
+    students = Student.objects.filter(center=center, is_active=True).order_by('last_name', 'first_name', 'id')
     
     # Calculate center statistics
     total_students = students.count()
     capacity_utilization = (total_students / center.capacity * 100) if center.capacity > 0 else 0
     
-    # Get attendance statistics for last 30 days
-    thirty_days_ago = date.today() - timedelta(days=30)
-    center_attendance = Attendance.objects.filter(
-        student__center=center,
-        date__gte=thirty_days_ago
-    )
+    # Per-student attendance for the last 30 days, counted from the monthly bitmaps
+    today = date.today()
+    attendance = attendance_by_student(attendance_window_start(today), today, centers=[center])
+    recorded_days = sum(summary['recorded_days'] for summary in attendance.values())
+    present_days = sum(summary['present_days'] for summary in attendance.values())
+    attendance_rate = (present_days / recorded_days * 100) if recorded_days > 0 else 0
     
-    total_attendance_records = center_attendance.count()
-    present_records = center_attendance.filter(is_present=True).count()
-    attendance_rate = (present_records / total_attendance_records * 100) if total_attendance_records > 0 else 0
+    shown = list(students[:10])  # Show first 10 students
+    for student in shown:
+        student.attendance = attendance.get(student.id)
     
     context = {
         'center': center,
-        'students': students[:10],  # Show first 10 students
+        'students': shown,
         'total_students': total_students,
         'capacity_utilization': round(capacity_utilization, 1),
         'attendance_rate': round(attendance_rate, 1),
+        'low_attendance_count': sum(
+            1 for summary in attendance.values() if summary['attendance_rate'] < LOW_ATTENDANCE_RATE
+        ),
+        'absent_running_count': sum(
+            1 for summary in attendance.values() if summary['absence_streak'] >= ABSENCE_STREAK_ALERT
+        ),
+        'low_attendance_rate': LOW_ATTENDANCE_RATE,
+        'absence_streak_alert': ABSENCE_STREAK_ALERT,
     }
     return render(request, 'centers/center_detail.html', context)
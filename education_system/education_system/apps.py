@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class EducationSystemConfig(AppConfig):
+    """Project-wide wiring that belongs to no single app"""
+    name = 'education_system'
+
+    def ready(self):
+        # Tuning for every SQLite connection the project opens
+        from . import sqlite  # noqa: F401
@@ -0,0 +1,302 @@
+"""
+Per-view request instrumentation.
+
+RequestMetricsMiddleware records, for every request, the number of SQL
+queries and the time spent in them, the time spent rendering templates, the
+total time and the response size, and aggregates them per URL name. The
+totals are served in Prometheus text format by metrics_view (local clients
+only, see METRICS_ALLOWED_IPS). Counters live in the process, so each worker
+reports its own.
+
+VIEW_BUDGETS sets per-view limits (see get_budget for how entries match);
+a request over budget is logged, or raises ViewBudgetExceeded when
+VIEW_BUDGET_ACTION is 'raise' (useful in tests and development).
+
+Template time is measured by InstrumentedDjangoTemplates, a drop-in
+replacement for the DjangoTemplates backend that times top-level renders.
+
+A streamed response (other than a file download) produces its body, and
+often runs its queries, after the view has returned; such requests are
+measured and checked once the body has been sent or the stream is closed.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse, Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class ViewBudgetExceeded(Exception):
+    """A request went over its VIEW_BUDGETS limits and VIEW_BUDGET_ACTION is 'raise'"""
+
+
+class RequestMetrics:
+    """Measurements for the request being handled"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        # Templates rendered while another is rendering (e.g. from a tag) are already counted
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time recorded for RequestMetricsMiddleware"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+class MetricsRegistry:
+    """Per-view totals since the process started"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, status, sample, over_budget):
+        with self._lock:
+            totals = self._views.setdefault(view, {
+                'requests': {},
+                'queries': 0,
+                'sql_seconds': 0.0,
+                'template_seconds': 0.0,
+                'duration_seconds': 0.0,
+                'response_bytes': 0,
+                'buckets': [0] * len(DURATION_BUCKETS),
+                'over_budget': 0,
+            })
+            status_class = f'{status // 100}xx'
+            totals['requests'][status_class] = totals['requests'].get(status_class, 0) + 1
+            totals['queries'] += sample['queries']
+            totals['sql_seconds'] += sample['sql_ms'] / 1000
+            totals['template_seconds'] += sample['template_ms'] / 1000
+            totals['duration_seconds'] += sample['duration_ms'] / 1000
+            totals['response_bytes'] += sample['response_bytes']
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if sample['duration_ms'] / 1000 <= bound:
+                    totals['buckets'][index] += 1
+            if over_budget:
+                totals['over_budget'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: dict(totals, requests=dict(totals['requests']), buckets=list(totals['buckets']))
+                for view, totals in self._views.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def get_budget(view):
+    """The VIEW_BUDGETS entry for a URL name, its 'namespace:*' entry, or 'default'"""
+    budgets = getattr(settings, 'VIEW_BUDGETS', {})
+    if view in budgets:
+        return budgets[view]
+    namespace = view.rpartition(':')[0]
+    if namespace and f'{namespace}:*' in budgets:
+        return budgets[f'{namespace}:*']
+    return budgets.get('default', {})
+
+
+def check_budget(view, sample):
+    """{field: (measured, limit)} for each limit the sample went over"""
+    return {
+        field: (sample[field], limit)
+        for field, limit in get_budget(view).items()
+        if limit is not None and sample[field] > limit
+    }
+
+
+def _response_size(response):
+    if response.has_header('Content-Length'):
+        return int(response['Content-Length'])
+    if response.streaming:
+        # Not known until the body has been sent
+        return 0
+    return len(response.content)
+
+
+def _measuring(metrics):
+    """Count queries on every connection into `metrics` while the returned context is open"""
+    stack = ExitStack()
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(metrics.execute_wrapper))
+    return stack
+
+
+def _measured_stream(content, metrics, finish):
+    """Yield a streamed body, counting the queries and bytes that produce it, then call finish(bytes)"""
+    sent = 0
+    iterator = iter(content)
+    try:
+        while True:
+            # Only around producing each chunk: the stream may be closed from another thread
+            with _measuring(metrics):
+                chunk = next(iterator, None)
+            if chunk is None:
+                break
+            sent += len(chunk)
+            yield chunk
+    finally:
+        finish(sent)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match and match.view_name else '<unresolved>'
+
+
+class RequestMetricsMiddleware:
+    """Measure each request and check it against its view's budget (see module docstring)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with _measuring(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        view = _view_name(request)
+        if view == 'metrics':
+            return response
+
+        if response.streaming and not response.is_async and not isinstance(response, FileResponse):
+            response.streaming_content = _measured_stream(
+                response.streaming_content, metrics,
+                lambda sent: self.finish(request, view, response, metrics, started, sent),
+            )
+            return response
+        self.finish(request, view, response, metrics, started, _response_size(response))
+        return response
+
+    def finish(self, request, view, response, metrics, started, response_bytes):
+        """Record a measured request and check it against its budget"""
+        sample = {
+            'queries': metrics.queries,
+            'sql_ms': metrics.sql_time * 1000,
+            'template_ms': metrics.template_time * 1000,
+            'duration_ms': (time.perf_counter() - started) * 1000,
+            'response_bytes': response_bytes,
+        }
+        exceeded = check_budget(view, sample)
+        registry.record(view, response.status_code, sample, bool(exceeded))
+
+        if exceeded:
+            details = ', '.join(
+                f'{field} {measured:.0f} > {limit}' for field, (measured, limit) in exceeded.items()
+            )
+            message = f'{request.method} {request.path} ({view}) over budget: {details}'
+            if getattr(settings, 'VIEW_BUDGET_ACTION', 'log') == 'raise':
+                raise ViewBudgetExceeded(message)
+            logger.warning(message)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics(snapshot):
+    """Prometheus text exposition of a registry snapshot"""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+            lines.append(f'{name}{{{label_text}}} {value}')
+
+    views = sorted(snapshot.items())
+    metric('django_view_requests_total', 'counter', 'Requests handled, by view and status class', [
+        ({'view': view, 'status': status}, count)
+        for view, totals in views for status, count in sorted(totals['requests'].items())
+    ])
+    metric('django_view_queries_total', 'counter', 'SQL queries issued', [
+        ({'view': view}, totals['queries']) for view, totals in views
+    ])
+    metric('django_view_sql_seconds_total', 'counter', 'Time spent in SQL queries', [
+        ({'view': view}, f"{totals['sql_seconds']:.6f}") for view, totals in views
+    ])
+    metric('django_view_template_seconds_total', 'counter', 'Time spent rendering templates', [
+        ({'view': view}, f"{totals['template_seconds']:.6f}") for view, totals in views
+    ])
+    metric('django_view_response_bytes_total', 'counter', 'Response body bytes', [
+        ({'view': view}, totals['response_bytes']) for view, totals in views
+    ])
+    metric('django_view_over_budget_total', 'counter', 'Requests over their VIEW_BUDGETS limits', [
+        ({'view': view}, totals['over_budget']) for view, totals in views
+    ])
+
+    lines.append('# HELP django_view_duration_seconds Request duration')
+    lines.append('# TYPE django_view_duration_seconds histogram')
+    for view, totals in views:
+        label = _escape(view)
+        count = sum(totals['requests'].values())
+        for bound, bucket in zip(DURATION_BUCKETS, totals['buckets']):
+            lines.append(f'django_view_duration_seconds_bucket{{view="{label}",le="{bound}"}} {bucket}')
+        lines.append(f'django_view_duration_seconds_bucket{{view="{label}",le="+Inf"}} {count}')
+        lines.append(f'django_view_duration_seconds_sum{{view="{label}"}} {totals["duration_seconds"]:.6f}')
+        lines.append(f'django_view_duration_seconds_count{{view="{label}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, only answered for METRICS_ALLOWED_IPS"""
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        raise Http404
+    return HttpResponse(render_metrics(registry.snapshot()),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
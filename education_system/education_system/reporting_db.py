@@ -0,0 +1,226 @@
+"""
+Read-only reporting snapshot of the primary database.
+
+Report generation, report summaries, CSV exports and the dashboard
+statistics scan a lot of attendance and grade rows. Run against the primary
+SQLite file, those long reads hold locks that mark_attendance writes queue
+behind, so they read a periodically refreshed copy of it instead.
+
+refresh_snapshot() copies the primary with SQLite's online backup API into a
+temporary file next to the snapshot and renames it into place: readers never
+see a half-written copy, and connections already open keep reading the copy
+they opened until they are closed (at the end of each request, or between
+jobs in the report workers). The refresh_reporting_snapshot command runs it
+every REPORTING_SNAPSHOT_INTERVAL seconds.
+
+Code opts in with `with reporting_reads():` (or as a decorator). Inside it,
+ReportingRouter sends reads of the student and center tables to the
+REPORTING_DATABASE alias as long as the snapshot is at most
+REPORTING_SNAPSHOT_MAX_AGE seconds old. Without a usable snapshot (none
+taken yet, too old, the alias not configured, or mirroring the primary as in
+tests) reads stay on the primary. Results that are kept, such as cached
+report files, pass `not_before` (the last change to the data they cover):
+a snapshot taken before then would miss that change, so the primary is read
+instead. Writes always go to the primary, and
+queries through a related manager follow the object they start from, so a
+report created after the snapshot was taken still finds its centers.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import ContextDecorator
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+# Apps whose tables reporting reads take from the snapshot
+SNAPSHOT_APPS = {'students', 'centers'}
+
+_local = threading.local()
+
+
+class ReportingSource(NamedTuple):
+    """Where reporting reads go, and when the snapshot they read was taken (None on the primary)"""
+    alias: str
+    snapshot_at: Optional[datetime] = None
+
+
+PRIMARY = ReportingSource(DEFAULT_DB_ALIAS)
+
+
+def snapshot_path():
+    path = getattr(settings, 'REPORTING_SNAPSHOT_PATH', None)
+    return os.fspath(path) if path else None
+
+
+def snapshot_taken_at(path=None):
+    """When the snapshot on disk was taken, or None if there is none"""
+    path = path or snapshot_path()
+    if not path:
+        return None
+    try:
+        # refresh_snapshot() sets the file's mtime to the moment the copy started
+        return datetime.fromtimestamp(os.stat(path).st_mtime, tz=timezone.utc)
+    except OSError:
+        return None
+
+
+def _snapshot_alias():
+    alias = getattr(settings, 'REPORTING_DATABASE', None)
+    if not alias or alias == DEFAULT_DB_ALIAS or alias not in connections:
+        return None
+    # Test databases mirror the primary: there is no separate copy to read
+    if connections[alias].settings_dict['NAME'] == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']:
+        return None
+    return alias
+
+
+def choose_source(not_before=None):
+    """The ReportingSource a reporting_reads(not_before) block starting now would use"""
+    alias = _snapshot_alias()
+    if alias is None:
+        return PRIMARY
+    taken_at = snapshot_taken_at()
+    if taken_at is None:
+        logger.debug("No reporting snapshot yet; reading from the primary")
+        return PRIMARY
+    age = time.time() - taken_at.timestamp()
+    if age > getattr(settings, 'REPORTING_SNAPSHOT_MAX_AGE', 15 * 60):
+        logger.warning("Reporting snapshot is %.0fs old; reading from the primary", age)
+        return PRIMARY
+    if not_before is not None and taken_at <= not_before:
+        logger.debug("Reporting snapshot predates a change to the data read; reading from the primary")
+        return PRIMARY
+    return ReportingSource(alias, taken_at)
+
+
+def _sources():
+    if not hasattr(_local, 'sources'):
+        _local.sources = []
+    return _local.sources
+
+
+def current_source():
+    """The ReportingSource of the innermost reporting_reads() block, or None outside one"""
+    sources = _sources()
+    return sources[-1] if sources else None
+
+
+class reporting_reads(ContextDecorator):
+    """
+    Read the student and center tables from the reporting snapshot in this
+    block, when it is fresh enough and (given `not_before`) was taken after
+    that time; `as` gives the ReportingSource. Nested blocks keep the source
+    the outermost one chose, so one report never mixes the snapshot and the
+    primary.
+    """
+
+    def __init__(self, not_before=None):
+        self.not_before = not_before
+
+    def __enter__(self):
+        sources = _sources()
+        source = sources[-1] if sources else choose_source(self.not_before)
+        sources.append(source)
+        return source
+
+    def __exit__(self, *exc_info):
+        _sources().pop()
+        return False
+
+
+class ReportingRouter:
+    """Routes reads inside reporting_reads() blocks to the snapshot; see the module docstring"""
+
+    def db_for_read(self, model, **hints):
+        source = current_source()
+        if source is None or source.alias == DEFAULT_DB_ALIAS:
+            return None
+        if model._meta.app_label not in SNAPSHOT_APPS or 'instance' in hints:
+            return None
+        return source.alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The snapshot holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == getattr(settings, 'REPORTING_DATABASE', None) and db != DEFAULT_DB_ALIAS:
+            return False
+        return None
+
+
+def refresh_snapshot(path=None, pages=None):
+    """
+    Copy the primary database to the snapshot file; returns
+    {'path': ..., 'taken_at': datetime, 'bytes': n, 'seconds': s}.
+
+    `pages` is the number of pages copied per backup step (default
+    REPORTING_SNAPSHOT_STEP_PAGES); -1 copies everything in one step.
+    """
+    path = path or snapshot_path()
+    if not path:
+        raise ImproperlyConfigured('REPORTING_SNAPSHOT_PATH is not set')
+    source = connections[DEFAULT_DB_ALIAS]
+    if source.vendor != 'sqlite':
+        raise ImproperlyConfigured('The reporting snapshot copies a SQLite primary database')
+    if source.in_atomic_block:
+        # The backup would wait forever on the transaction's own lock
+        raise RuntimeError('refresh_snapshot() cannot run inside a transaction')
+    if pages is None:
+        pages = getattr(settings, 'REPORTING_SNAPSHOT_STEP_PAGES', -1)
+
+    started = time.time()
+    temporary = f'{path}.tmp'
+    if os.path.exists(temporary):
+        os.remove(temporary)  # left behind by an interrupted refresh
+    source.ensure_connection()
+    target = sqlite3.connect(temporary)
+    try:
+        source.connection.backup(target, pages=pages)
+        # The copy inherits a WAL primary's journal mode; read-only openers would
+        # then need -wal/-shm files beside it, which the rename would strand
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+    # The copy reflects the primary as of when it started; readers measure its age from the mtime
+    os.utime(temporary, (started, started))
+    os.replace(temporary, path)
+    return {
+        'path': path,
+        'taken_at': datetime.fromtimestamp(started, tz=timezone.utc),
+        'bytes': os.path.getsize(path),
+        'seconds': time.time() - started,
+    }
+
+
+def run_snapshot_refresher(interval=None):
+    """Refresh the snapshot every `interval` seconds until interrupted; returns the number of refreshes"""
+    if interval is None:
+        interval = getattr(settings, 'REPORTING_SNAPSHOT_INTERVAL', 5 * 60)
+
+    refreshed = 0
+    while True:
+        close_old_connections()
+        try:
+            result = refresh_snapshot()
+        except (DatabaseError, OSError, sqlite3.Error):
+            # Try again next time; readers fall back to the primary once the old copy is too old
+            logger.exception("Reporting snapshot refresh failed")
+        else:
+            refreshed += 1
+            logger.info("Reporting snapshot refreshed: %s bytes in %.1fs", result['bytes'], result['seconds'])
+        try:
+            time.sleep(interval)
+        except KeyboardInterrupt:
+            return refreshed
@@ -40,12 +40,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'education_system',
     'students',
     'centers',
     'reports',
 ]
 
 MIDDLEWARE = [
+    'education_system.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,7 +61,7 @@ ROOT_URLCONF = 'education_system.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'education_system.instrumentation.InstrumentedDjangoTemplates',  # DjangoTemplates + render timing
         'DIRS': [BASE_DIR / 'templates'],  # Make sure this line exists
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,11 +83,47 @@ WSGI_APPLICATION = 'education_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Read-only copy of the primary that reporting reads use (see education_system.reporting_db)
+REPORTING_SNAPSHOT_PATH = BASE_DIR / 'reporting.sqlite3'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 60,  # seconds a connection is reused across requests
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock when a transaction starts: a read lock upgraded
+            # later fails at once with "database is locked" instead of waiting
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    'reporting': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'{REPORTING_SNAPSHOT_PATH.as_uri()}?mode=ro',
+        # Reopened per request, so a refreshed snapshot is picked up at once
+        'CONN_MAX_AGE': 0,
+        'PRAGMAS': {'journal_mode': None},  # read-only: the file's mode cannot be changed
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['education_system.reporting_db.ReportingRouter']
+
+# Reporting snapshot, refreshed by the refresh_reporting_snapshot command
+REPORTING_DATABASE = 'reporting'  # None keeps reporting reads on the primary
+REPORTING_SNAPSHOT_INTERVAL = 5 * 60  # seconds between refreshes
+REPORTING_SNAPSHOT_MAX_AGE = 15 * 60  # seconds; older snapshots are ignored in favour of the primary
+REPORTING_SNAPSHOT_STEP_PAGES = -1  # pages copied per backup step; -1 copies in one step
+
+# PRAGMAs applied to every new SQLite connection (see education_system.sqlite);
+# a DATABASES entry's own 'PRAGMAS' override these
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,  # milliseconds to wait for a lock
+    'cache_size': -64000,  # negative: KiB per connection
+    'mmap_size': 256 * 1024 * 1024,  # bytes
+    'temp_store': 'memory',
 }
 
 
@@ -140,3 +178,94 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Report generation queue (see reports.jobs)
+REPORT_QUEUE_EAGER = False  # generate inside the request instead of queueing
+REPORT_WORKERS = 2
+REPORT_WORKER_POLL_INTERVAL = 2  # seconds between queue polls when idle
+REPORT_JOB_TIMEOUT = 30 * 60  # seconds before a stuck 'generating' report is requeued
+REPORT_JOB_MAX_ATTEMPTS = 3  # claims before a report that keeps getting stuck is failed
+REPORT_RENDER_WORKERS = 1  # processes used to render multi-center PDF chunks (merging needs pypdf)
+RISK_REPORT_LIMIT = 500  # most at-risk students listed in a risk report PDF (see reports.risk)
+
+# Generated report file cache (see reports.artifacts)
+REPORT_CACHE_ENABLED = True
+REPORT_CACHE_VERSION = 1  # bump to retire every cached report file
+REPORT_CACHE_MAX_BYTES = 500 * 1024 * 1024
+REPORT_CACHE_MAX_ENTRIES = 1000
+
+# Report downloads (see reports.downloads): None serves files from Django;
+# 'x-sendfile' or 'x-accel-redirect' hands them to the fronting proxy
+REPORT_DOWNLOAD_OFFLOAD = None
+REPORT_DOWNLOAD_ACCEL_PREFIX = '/protected/'  # internal nginx location aliased to MEDIA_ROOT
+
+# Report scheduler (see reports.scheduler)
+REPORT_SCHEDULER_CONCURRENCY = 2  # schedules generated and delivered at once
+REPORT_SCHEDULER_POLL_INTERVAL = 60  # seconds between checks for due schedules
+REPORT_SCHEDULE_LOCK_TIMEOUT = 60 * 60  # seconds before a crashed scheduler's claim is released
+REPORT_SCHEDULE_RETRY_DELAY = 15 * 60  # seconds before a failed schedule is tried again
+
+# Scheduled report email delivery (see reports.delivery)
+REPORT_EMAIL_BATCH_SIZE = 100  # messages sent over one connection
+REPORT_EMAIL_MAX_RETRIES = 3
+REPORT_EMAIL_RETRY_BACKOFF = 2  # seconds, doubled on each retry
+
+# Outgoing email; the console backend prints messages until SMTP is configured
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'reports@ngo-education.local')
+
+# Caches. Dashboard statistics (see students.stats) use the 'stats' alias;
+# STATS_CACHE_BACKEND selects local memory, files shared between processes,
+# or a local Redis-compatible server at STATS_CACHE_URL (needs the redis
+# package, see requirements.txt).
+STATS_CACHE_BACKEND = os.environ.get('STATS_CACHE_BACKEND', 'locmem')
+STATS_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'stats',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('STATS_CACHE_LOCATION', BASE_DIR / 'cache' / 'stats'),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('STATS_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'stats': STATS_CACHE_BACKENDS[STATS_CACHE_BACKEND],
+}
+STATS_CACHE_ALIAS = 'stats'
+STATS_CACHE_TTLS = {  # seconds per statistic
+    'active_students': 300,
+    'active_centers': 3600,
+    'attendance_rate': 300,
+    'center_student_counts': 300,
+}
+
+# Per-view request instrumentation (see education_system.instrumentation).
+# Limits per request by URL name; 'namespace:*' covers a namespace and
+# 'default' everything else. None (or leaving a field out) means no limit.
+VIEW_BUDGETS = {
+    'default': {'queries': 20, 'sql_ms': 200, 'template_ms': 300, 'duration_ms': 1000},
+    'admin:*': {'queries': 50, 'duration_ms': 2000},
+    'dashboard': {'queries': 6},
+    'student_list': {'queries': 10, 'template_ms': 500},
+    'student_detail': {'queries': 3},
+    # Prefix, substring and two fuzzy lookups when few students match, then the students themselves
+    'student_autocomplete': {'queries': 5, 'duration_ms': 200},
+    'center_list': {'queries': 5, 'template_ms': 500},
+    'report_list': {'queries': 5},
+    'report_status': {'queries': 2, 'duration_ms': 100},
+    'generate_report': {'queries': 20, 'duration_ms': 30000},  # renders inline with REPORT_QUEUE_EAGER
+    'download_report': {'queries': 3},
+    'export_report_csv': {'queries': 5, 'duration_ms': 30000},
+    'risk_assessment': {'queries': 6, 'duration_ms': 10000},  # scores every student in range
+}
+VIEW_BUDGET_ACTION = 'log'  # 'log' a warning, or 'raise' ViewBudgetExceeded
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # clients allowed to scrape /metrics/
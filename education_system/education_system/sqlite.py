@@ -0,0 +1,56 @@
+"""
+SQLite connection tuning.
+
+Every new SQLite connection gets the PRAGMAs in settings.SQLITE_PRAGMAS,
+applied from the connection_created signal (connected when the project's
+own app, education_system.apps, is ready) so web requests, report workers,
+management commands and tests are all configured alike. A database's own
+'PRAGMAS' entry in DATABASES overrides them key by key; None leaves a
+PRAGMA alone.
+
+- journal_mode=WAL: readers no longer block a committing writer (nor it
+  them). It is stored in the database file, so it stays set.
+- synchronous=NORMAL: with WAL, commits no longer wait for an fsync (only
+  checkpoints do); a power cut may lose the last commits but cannot corrupt
+  the file.
+- busy_timeout (milliseconds): how long a connection waits for another
+  writer before failing with "database is locked".
+- cache_size (negative: KiB per connection), mmap_size (bytes read through a
+  memory map) and temp_store (sorts and temporary tables in memory).
+
+Applying them costs a few statements per connection, so connections are
+kept between requests (CONN_MAX_AGE) rather than reopened for every one.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def connection_pragmas(settings_dict):
+    """The PRAGMAs for a connection with these DATABASES settings, in the order they are applied"""
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    pragmas.update(settings_dict.get('PRAGMAS') or {})
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def apply_pragmas(connection):
+    # On the DB-API connection: these are not the request's queries, and must not count against its budget
+    for name, value in connection_pragmas(connection.settings_dict).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def current_pragmas(connection):
+    """{name: value} the database reports for each configured PRAGMA (None where it reports nothing)"""
+    connection.ensure_connection()
+    pragmas = {}
+    for name in connection_pragmas(connection.settings_dict):
+        # mmap_size, for one, returns no row for an in-memory database
+        row = connection.connection.execute(f'PRAGMA {name}').fetchone()
+        pragmas[name] = row[0] if row else None
+    return pragmas
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        apply_pragmas(connection)
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from . import views
+from . import instrumentation, views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,6 +10,7 @@ urlpatterns = [
     path('students/', include('students.urls')),
     path('centers/', include('centers.urls')),
     path('reports/', include('reports.urls')),  # Make sure this line exists
+    path('metrics/', instrumentation.metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
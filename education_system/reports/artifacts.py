@@ -0,0 +1,150 @@
+import hashlib
+import json
+import logging
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import ReportArtifact
+from .pdf import STAMPING
+
+logger = logging.getLogger(__name__)
+
+
+def cache_enabled():
+    # Without stamping, a cached file would carry the generation time of the report that rendered it
+    return STAMPING and getattr(settings, 'REPORT_CACHE_ENABLED', True)
+
+
+def report_cache_key(report):
+    """
+    Content address for a report's output.
+
+    Covers everything the rendered PDF depends on: type, date range and the
+    sorted selected centers. The title and generation time are not part of
+    the cached file: they are stamped onto each report's copy. REPORT_CACHE_VERSION
+    is the data/layout version; bump it to retire every cached file at once.
+
+    Files are only rendered from a reporting snapshot taken after the last
+    change to their period (see reports.views.generate_report_file), so a
+    cached file never predates the invalidation that change triggered.
+    """
+    params = [
+        getattr(settings, 'REPORT_CACHE_VERSION', 1),
+        report.report_type,
+        report.date_from.isoformat(),
+        report.date_to.isoformat(),
+        sorted(report.centers.values_list('id', flat=True)),
+    ]
+    return hashlib.sha256(json.dumps(params).encode('utf-8')).hexdigest()
+
+
+def get_cached_artifact(cache_key):
+    """Return the artifact for a key if its file is still on disk"""
+    artifact = ReportArtifact.objects.filter(cache_key=cache_key).first()
+    if artifact is None:
+        return None
+    if not artifact.file or not artifact.file.storage.exists(artifact.file.name):
+        artifact.delete()
+        return None
+
+    ReportArtifact.objects.filter(id=artifact.id).update(
+        hits=F('hits') + 1,
+        last_used_at=timezone.now(),
+    )
+    return artifact
+
+
+def read_artifact(artifact):
+    with artifact.file.open('rb') as cached:
+        return cached.read()
+
+
+def store_artifact(report, cache_key, content):
+    """Keep a freshly rendered report (before stamping) under its cache key"""
+    artifact = ReportArtifact(
+        cache_key=cache_key,
+        report_type=report.report_type,
+        date_from=report.date_from,
+        date_to=report.date_to,
+        size=len(content),
+    )
+    artifact.file.save(f"{cache_key}.pdf", ContentFile(content), save=False)
+    try:
+        artifact.save()
+    except IntegrityError:
+        # Another worker cached the same parameters first
+        artifact.file.delete(save=False)
+        return None
+    artifact.centers.set(report.centers.values_list('id', flat=True))
+
+    evict_artifacts()
+    return artifact
+
+
+def _delete_artifacts(artifacts):
+    deleted = 0
+    for artifact in artifacts:
+        if artifact.file:
+            artifact.file.delete(save=False)
+        artifact.delete()
+        deleted += 1
+    return deleted
+
+
+def invalidate_artifacts(dates=None, centers=None):
+    """
+    Drop cached reports whose date range overlaps the span of `dates` and
+    that include any of the `centers` ids (selected, or all centers when
+    none were); None matches every date or center.
+
+    Matching on the span keeps the query one condition however many dates
+    a batch touches, at the cost of also dropping reports that fall in a
+    gap between them.
+    """
+    artifacts = ReportArtifact.objects.all()
+    if dates is not None:
+        dates = set(dates)
+        if not dates:
+            return 0
+        artifacts = artifacts.filter(date_from__lte=max(dates), date_to__gte=min(dates))
+    if centers is not None:
+        centers = set(centers)
+        if not centers:
+            return 0
+        artifacts = artifacts.filter(Q(centers__in=centers) | Q(centers__isnull=True)).distinct()
+    return _delete_artifacts(artifacts)
+
+
+def invalidate_report_type(report_type, date_from, date_to):
+    """Drop cached reports of one type whose date range overlaps date_from..date_to"""
+    return _delete_artifacts(ReportArtifact.objects.filter(
+        report_type=report_type, date_from__lte=date_to, date_to__gte=date_from,
+    ))
+
+
+def evict_artifacts(max_bytes=None, max_entries=None):
+    """Evict least recently used artifacts until the cache fits its size and entry limits"""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'REPORT_CACHE_MAX_BYTES', 500 * 1024 * 1024)
+    if max_entries is None:
+        max_entries = getattr(settings, 'REPORT_CACHE_MAX_ENTRIES', 1000)
+
+    total_bytes = ReportArtifact.objects.aggregate(total=Sum('size'))['total'] or 0
+    total_entries = ReportArtifact.objects.count()
+    if total_bytes <= max_bytes and total_entries <= max_entries:
+        return 0
+
+    victims = []
+    for artifact in ReportArtifact.objects.order_by('last_used_at', 'id').iterator():
+        if total_bytes <= max_bytes and total_entries <= max_entries:
+            break
+        victims.append(artifact)
+        total_bytes -= artifact.size
+        total_entries -= 1
+
+    evicted = _delete_artifacts(victims)
+    logger.info("Evicted %s cached report files", evicted)
+    return evicted
@@ -0,0 +1,504 @@
+"""
+Benchmark harness for the hot paths.
+
+For each dataset size a fresh database is created (the test database, so
+real data is never touched), filled by students.synthetic.generate_dataset
+with a fixed seed, and each benchmark is run `repeat` times. Results record
+min/median/mean/max wall time and the query count of the last run, and are
+written as JSON so runs from different commits can be compared with
+compare_results().
+
+run_concurrency() measures write throughput instead: several threads post
+mark_attendance at once (each for its own center and days) while another
+streams an attendance CSV export, once with Django's bare SQLite setup and
+once with the project's connection tuning (see education_system.sqlite).
+"""
+import logging
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.db.models import Count, Q
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from django.urls import reverse
+from django.utils import timezone
+
+from centers.models import Center
+from education_system.instrumentation import registry
+from education_system.sqlite import current_pragmas
+from students.bitmaps import attendance_by_student, student_attendance
+from students.models import Attendance, Student
+from students.stats import stats_cache
+from students.synthetic import LAST_NAMES, generate_dataset
+
+from .cohorts import refresh_cohort_tables
+from .models import Report
+from .views import generate_report_file
+
+SIZES = {
+    'small': {'centers': 5, 'students': 500, 'days': 20, 'grades_per_student': 5},
+    'medium': {'centers': 20, 'students': 5000, 'days': 40, 'grades_per_student': 8},
+    'large': {'centers': 50, 'students': 20000, 'days': 60, 'grades_per_student': 10},
+    # 10M attendance rows; slow to generate, so only run on request
+    'xlarge': {'centers': 100, 'students': 100000, 'days': 100, 'grades_per_student': 5},
+}
+
+CSV_EXPORT_TYPES = ['attendance', 'academic', 'center']
+
+# Connection setups compared by run_concurrency(): SQLITE_PRAGMAS and DATABASES
+# entries overriding the project's own; 'tuned' is the project as configured
+CONNECTION_SETUPS = {
+    # Django's defaults: rollback journal, a connection per request, deferred transactions
+    'untuned': {'SQLITE_PRAGMAS': {'journal_mode': 'delete'}, 'CONN_MAX_AGE': 0, 'OPTIONS': {}},
+    'tuned': {},
+}
+CONCURRENCY_WRITERS = [1, 4, 8]
+CONCURRENCY_SECONDS = 10
+
+# Datasets end yesterday, so "last 30 days" figures cover them; the rows
+# themselves depend only on the seed and size
+END_DATE_OFFSET_DAYS = 1
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _time(run, setup=None, repeat=5):
+    durations = []
+    queries = 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            run()
+            durations.append((time.perf_counter() - started) * 1000)
+        queries = len(captured)
+    return {
+        'runs': repeat,
+        'min_ms': round(min(durations), 3),
+        'median_ms': round(statistics.median(durations), 3),
+        'mean_ms': round(statistics.fmean(durations), 3),
+        'max_ms': round(max(durations), 3),
+        'queries': queries,
+    }
+
+
+def _orm_attendance_rates(date_from, date_to, centers=None):
+    """Per-student attendance counts by counting Attendance rows, for comparison with the bitmaps"""
+    attendance = Attendance.objects.filter(date__range=(date_from, date_to))
+    if centers is not None:
+        attendance = attendance.filter(center__in=centers)
+    return list(attendance.values('student_id').annotate(
+        total=Count('id'), present=Count('id', filter=Q(is_present=True)),
+    ).order_by())
+
+
+def _orm_streaks(date_from, date_to, centers):
+    """Current absence runs from ordered Attendance rows, for comparison with the bitmaps"""
+    streaks = {}
+    for student_id, is_present in Attendance.objects.filter(
+        date__range=(date_from, date_to), center__in=centers,
+    ).order_by('student_id', 'date').values_list('student_id', 'is_present').iterator(chunk_size=10000):
+        streaks[student_id] = 0 if is_present else streaks.get(student_id, 0) + 1
+    return streaks
+
+
+def _get(client, url, check=None, **params):
+    def run():
+        response = client.get(url, params)
+        if response.status_code != 200:
+            raise AssertionError(f'GET {url} returned {response.status_code}')
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        if check:
+            check(response)
+    return run
+
+
+class _Benchmarks:
+    """The hot paths, run against the current (benchmark) database"""
+
+    def __init__(self, end_date, repeat):
+        self.end_date = end_date
+        self.repeat = repeat
+        self.user = User.objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.largest_center = Center.objects.annotate(
+            active_students=Count('student', filter=Q(student__is_active=True)),
+        ).order_by('-active_students', 'id').first()
+        self.date_from = end_date - timedelta(days=30)
+        self.year_from = end_date - timedelta(days=365)
+        self.sample_student = Student.objects.filter(center=self.largest_center).order_by('id').first()
+        self.attendance_runs = 0
+
+    def report(self, report_type):
+        return Report.objects.create(
+            title=f'Benchmark {report_type}', report_type=report_type, generated_by=self.user,
+            date_from=self.date_from, date_to=self.end_date, status='generating',
+        )
+
+    def search_results(self, query):
+        """Check that a student list search was narrowed to students matching `query`"""
+        active = Student.objects.filter(is_active=True).count()
+
+        def check(response):
+            shown = re.search(rb'class="stat-value">(\d+)<', response.content)
+            first = re.search(rb'class="student-name">([^<]*)<', response.content)
+            if not shown or int(shown.group(1)) >= active or not first or query.encode() not in first.group(1).lower():
+                raise AssertionError(f'student_list search for "{query}" did not filter the list')
+        return check
+
+    def mark_attendance(self):
+        # A new day per run, so every run writes the same number of rows
+        self.attendance_runs += 1
+        day = self.end_date + timedelta(days=self.attendance_runs)
+        students = Student.objects.filter(center=self.largest_center, is_active=True).values_list('id', flat=True)
+        data = {'attendance_date': day.isoformat()}
+        for n, student_id in enumerate(students):
+            data[f'student_{student_id}'] = 'present' if n % 5 else 'absent'
+        url = reverse('mark_attendance') + f'?center={self.largest_center.id}'
+
+        def run():
+            response = self.client.post(url, data)
+            if response.status_code != 302:
+                raise AssertionError(f'POST mark_attendance returned {response.status_code}')
+        return run
+
+    def run(self, progress=None, only=None):
+        results = {}
+
+        def bench(name, run, setup=None):
+            if only and not name.startswith(tuple(only)):
+                return
+            if progress:
+                progress(name)
+            results[name] = _time(run, setup, self.repeat)
+
+        bench('dashboard', _get(self.client, reverse('dashboard')), setup=stats_cache().clear)
+        bench('dashboard_cached', _get(self.client, reverse('dashboard')))
+        bench('student_list', _get(self.client, reverse('student_list')))
+        query = LAST_NAMES[0][:3].lower()
+        bench('student_list_search', _get(self.client, reverse('student_list'), check=self.search_results(query),
+                                          search=query))
+        bench('student_autocomplete', _get(self.client, reverse('student_autocomplete'), q=LAST_NAMES[1][:2]))
+        bench('center_list', _get(self.client, reverse('center_list')))
+        bench('center_detail', _get(self.client, reverse('center_detail', args=[self.largest_center.id])))
+        bench('mark_attendance_get', _get(self.client, reverse('mark_attendance'),
+                                          center=self.largest_center.id, date=self.end_date.isoformat()))
+
+        post = {}
+        bench('mark_attendance_post', lambda: post['run'](), setup=lambda: post.update(run=self.mark_attendance()))
+
+        for report_type, _ in Report.REPORT_TYPES:
+            reports = []
+            bench(f'generate_{report_type}_report', lambda: generate_report_file(reports[-1]),
+                  setup=lambda report_type=report_type: reports.append(self.report(report_type)))
+
+        for report_type in CSV_EXPORT_TYPES:
+            report = self.report(report_type)
+            bench(f'export_{report_type}_csv', _get(self.client, reverse('export_report_csv', args=[report.id])))
+
+        # Row counting against the monthly attendance bitmaps, for the same answers
+        centers = [self.largest_center]
+        bench('attendance_rates_orm', lambda: _orm_attendance_rates(self.date_from, self.end_date))
+        bench('attendance_rates_bitmap', lambda: attendance_by_student(self.date_from, self.end_date))
+        bench('center_streaks_orm', lambda: _orm_streaks(self.date_from, self.end_date, centers))
+        bench('center_streaks_bitmap', lambda: attendance_by_student(self.date_from, self.end_date, centers=centers))
+        bench('student_year_orm', lambda: Attendance.objects.filter(
+            student=self.sample_student, date__range=(self.year_from, self.end_date),
+        ).aggregate(total=Count('id'), present=Count('id', filter=Q(is_present=True))))
+        bench('student_year_bitmap', lambda: student_attendance(self.sample_student.id, self.year_from, self.end_date))
+        return results
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else None
+
+
+def _connection_setup(setup):
+    """Point new connections at one of CONNECTION_SETUPS; returns a function undoing it"""
+    settings_dict = connection.settings_dict
+    database = {key: value for key, value in setup.items() if key != 'SQLITE_PRAGMAS'}
+    previous = {key: settings_dict[key] for key in database}
+    overrides = override_settings(**{key: value for key, value in setup.items() if key == 'SQLITE_PRAGMAS'})
+    overrides.enable()
+    settings_dict.update(database)
+    # Reconnect so the journal mode is switched while no other connection is open
+    connection.close()
+
+    def undo():
+        connection.close()
+        overrides.disable()
+        settings_dict.update(previous)
+    return undo
+
+
+class _Concurrency:
+    """Parallel mark_attendance writers plus one reporting reader, against the current database"""
+
+    def __init__(self, end_date, user):
+        # Log in once: threads share the session rather than each writing their own
+        client = Client()
+        client.force_login(user)
+        self.cookies = client.cookies
+        self.centers = list(Center.objects.annotate(
+            active_students=Count('student', filter=Q(student__is_active=True)),
+        ).filter(active_students__gt=0).order_by('-active_students', 'id'))
+        self.students = {
+            center.id: list(Student.objects.filter(center=center, is_active=True).values_list('id', flat=True))
+            for center in self.centers
+        }
+        self.export = Report.objects.create(
+            title='Concurrency export', report_type='attendance', generated_by=user,
+            date_from=end_date - timedelta(days=365), date_to=end_date, status='completed',
+        )
+        # Each run writes days no earlier run used
+        self.next_day = end_date + timedelta(days=1000)
+
+    def _client(self):
+        client = Client()
+        client.cookies.load({name: morsel.value for name, morsel in self.cookies.items()})
+        return client
+
+    def _writer(self, index, writers, stop, latencies, errors):
+        client = self._client()
+        center = self.centers[index % len(self.centers)]
+        data = {
+            f'student_{student_id}': 'present' if n % 5 else 'absent'
+            for n, student_id in enumerate(self.students[center.id])
+        }
+        url = reverse('mark_attendance') + f'?center={center.id}'
+        first_day = self.next_day
+        posted = 0
+        try:
+            while not stop.is_set():
+                day = first_day + timedelta(days=posted * writers + index)
+                posted += 1
+                started = time.perf_counter()
+                try:
+                    response = client.post(url, dict(data, attendance_date=day.isoformat()))
+                except OperationalError:
+                    errors.append(time.perf_counter() - started)
+                    continue
+                if response.status_code != 302:
+                    raise AssertionError(f'POST mark_attendance returned {response.status_code}')
+                latencies.append((time.perf_counter() - started, len(data)))
+        finally:
+            connection.close()
+
+    def _reader(self, stop, exports):
+        client = self._client()
+        url = reverse('export_report_csv', args=[self.export.id])
+        try:
+            while not stop.is_set():
+                response = client.get(url)
+                try:
+                    for _ in response.streaming_content:
+                        if stop.is_set():
+                            break
+                    else:
+                        exports.append(1)
+                finally:
+                    # Closes the export's cursor here, not on another thread at garbage collection
+                    response.close()
+        finally:
+            connection.close()
+
+    def run(self, writers, seconds):
+        stop = threading.Event()
+        latencies, errors, exports = [], [], []
+        threads = [threading.Thread(target=self._reader, args=(stop, exports))] + [
+            threading.Thread(target=self._writer, args=(index, writers, stop, latencies, errors))
+            for index in range(writers)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        self.next_day += timedelta(days=(len(latencies) + len(errors) + writers) * writers + 1)
+
+        durations = sorted(duration * 1000 for duration, _ in latencies)
+        return {
+            'writers': writers,
+            'seconds': round(elapsed, 3),
+            'requests': len(latencies),
+            'locked': len(errors),
+            'requests_per_second': round(len(latencies) / elapsed, 2),
+            'rows_per_second': round(sum(rows for _, rows in latencies) / elapsed, 1),
+            'p50_ms': round(_percentile(durations, 0.5), 1) if durations else None,
+            'p95_ms': round(_percentile(durations, 0.95), 1) if durations else None,
+            'max_ms': round(durations[-1], 1) if durations else None,
+            'exports_completed': len(exports),
+        }
+
+
+def run_concurrency(end_date, writer_counts=None, seconds=CONCURRENCY_SECONDS, progress=None):
+    """
+    Write throughput under parallel writers for each of CONNECTION_SETUPS, as
+    {setup: {'pragmas': {...}, 'runs': [...]}}. Needs an on-disk database:
+    an in-memory one has neither journal modes nor files to lock.
+    """
+    user = User.objects.filter(username='benchmark').first() or User.objects.create_superuser(
+        'benchmark', 'benchmark@example.com', 'benchmark')
+    workload = _Concurrency(end_date, user)
+    # Locked writes are counted in the results rather than logged as server errors
+    request_logger = logging.getLogger('django.request')
+    previous_level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    results = {}
+    try:
+        for name, setup in CONNECTION_SETUPS.items():
+            undo = _connection_setup(setup)
+            try:
+                results[name] = {'pragmas': current_pragmas(connection), 'runs': []}
+                for writers in writer_counts or CONCURRENCY_WRITERS:
+                    if progress:
+                        progress(f'concurrency {name} x{writers}')
+                    results[name]['runs'].append(workload.run(writers, seconds))
+            finally:
+                undo()
+    finally:
+        request_logger.setLevel(previous_level)
+    return results
+
+
+def run_size(name, params, seed=1, repeat=5, progress=None, only=None, concurrency=None,
+             concurrency_seconds=CONCURRENCY_SECONDS):
+    """Generate one dataset size in the current database and benchmark it"""
+    end_date = timezone.localdate() - timedelta(days=END_DATE_OFFSET_DAYS)
+    started = time.perf_counter()
+    counts = generate_dataset(seed=seed, end_date=end_date, **params)
+    generate_seconds = time.perf_counter() - started
+    # The donor report reads the cohort tables, which the refresh_cohorts command keeps up to date
+    started = time.perf_counter()
+    refresh_cohort_tables()
+    cohort_refresh_seconds = time.perf_counter() - started
+
+    registry.reset()
+    results = _Benchmarks(end_date, repeat).run(progress, only)
+    # Run last: it writes attendance for days after the dataset
+    concurrency_results = run_concurrency(end_date, concurrency, concurrency_seconds, progress) if concurrency else None
+    return {
+        'name': name,
+        'params': params,
+        'counts': counts,
+        'generate_seconds': round(generate_seconds, 3),
+        'cohort_refresh_seconds': round(cohort_refresh_seconds, 3),
+        'benchmarks': results,
+        'concurrency': concurrency_results,
+        'over_budget': {
+            view: totals['over_budget'] for view, totals in registry.snapshot().items() if totals['over_budget']
+        },
+    }
+
+
+def run_benchmarks(sizes, seed=1, repeat=5, progress=None, only=None, concurrency=None,
+                   concurrency_seconds=CONCURRENCY_SECONDS):
+    """
+    Benchmark each named size (keys of SIZES, or (name, params) pairs) in its
+    own fresh database; returns the JSON-serialisable results. `only` limits
+    the run to benchmarks whose names start with one of its prefixes;
+    `concurrency` (writer counts) adds a run_concurrency() pass per size.
+    """
+    results = {
+        'created_at': timezone.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'seed': seed,
+        'repeat': repeat,
+        'sizes': [],
+    }
+    media_root = tempfile.mkdtemp(prefix='benchmark-media-')
+    database_dir = tempfile.mkdtemp(prefix='benchmark-db-')
+    overrides = override_settings(
+        MEDIA_ROOT=media_root,
+        ALLOWED_HOSTS=['testserver'],
+        REPORT_CACHE_ENABLED=False,
+        REPORT_RENDER_WORKERS=1,
+        VIEW_BUDGET_ACTION='log',
+        # Read the benchmark database, not a snapshot of the real one
+        REPORTING_DATABASE=None,
+        # Keep benchmark statistics out of a shared (file or Redis) stats cache
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'stats': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-stats'},
+        },
+    )
+    # Over-budget requests are expected at the larger sizes; they are counted in the results instead
+    instrumentation_logger = logging.getLogger('education_system.instrumentation')
+    previous_level = instrumentation_logger.level
+    instrumentation_logger.setLevel(logging.ERROR)
+
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    previous_test_name = test_settings.get('NAME')
+    if connection.vendor == 'sqlite':
+        # An on-disk database, so timings include real I/O
+        test_settings['NAME'] = os.path.join(database_dir, 'benchmark.sqlite3')
+
+    try:
+        with overrides:
+            for size in sizes:
+                name, params = (size, SIZES[size]) if isinstance(size, str) else size
+                databases = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+                try:
+                    results['sizes'].append(run_size(
+                        name, params, seed=seed, repeat=repeat, only=only,
+                        concurrency=concurrency, concurrency_seconds=concurrency_seconds,
+                        progress=(lambda benchmark: progress(name, benchmark)) if progress else None,
+                    ))
+                finally:
+                    teardown_databases(databases, verbosity=0)
+    finally:
+        test_settings['NAME'] = previous_test_name
+        instrumentation_logger.setLevel(previous_level)
+        shutil.rmtree(media_root, ignore_errors=True)
+        shutil.rmtree(database_dir, ignore_errors=True)
+    return results
+
+
+def compare_results(baseline, current, threshold=1.25, min_ms=1.0):
+    """
+    Benchmarks whose median got more than `threshold` times slower (or that
+    issue more queries) than in the baseline results, as
+    (size, benchmark, what, before, after) tuples.
+    """
+    regressions = []
+    previous = {size['name']: size['benchmarks'] for size in baseline.get('sizes', [])}
+    for size in current.get('sizes', []):
+        for benchmark, result in size['benchmarks'].items():
+            before = previous.get(size['name'], {}).get(benchmark)
+            if before is None:
+                continue
+            if result['median_ms'] > max(before['median_ms'], min_ms) * threshold:
+                regressions.append((size['name'], benchmark, 'median_ms', before['median_ms'], result['median_ms']))
+            if result['queries'] > before['queries']:
+                regressions.append((size['name'], benchmark, 'queries', before['queries'], result['queries']))
+    return regressions
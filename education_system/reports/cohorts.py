@@ -0,0 +1,274 @@
+"""
+Longitudinal cohort analytics for the donor impact report.
+
+Students are grouped into cohorts by the quarter they enrolled in, and for
+every month CohortSummary holds one row per (cohort, center) with that
+month's attendance and grade totals. Reading those few thousand rows is all
+the donor report and the cohort page need, however much raw attendance
+there is.
+
+The table is filled by refresh_cohort_tables() (the refresh_cohorts command),
+which only recomputes months that need it: months never refreshed, months
+that were still open when last refreshed, and months marked stale because
+attendance or grades in them changed afterwards, or a student with records
+in them was transferred, re-enrolled in another quarter or deleted
+(mark_periods_stale, called from reports.signals). Each month is replaced in one transaction, so readers
+see either the old or the new rows.
+
+Cohort sizes are not stored: they are counted from Student when read, so
+enrolments show up immediately.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from students.models import Attendance, Grade, Student
+
+from .models import CohortPeriod, CohortSummary
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    """First day of the month after `day`"""
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def quarter_start(day):
+    return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+
+
+def quarter_label(day):
+    return f"{day.year} Q{(day.month - 1) // 3 + 1}"
+
+
+def months_between(first, last):
+    """First days of the months from `first` to `last`, inclusive"""
+    months = []
+    month = month_start(first)
+    while month <= last:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def _data_range():
+    attendance = Attendance.objects.aggregate(first=Min('date'), last=Max('date'))
+    grades = Grade.objects.aggregate(first=Min('assessment_date'), last=Max('assessment_date'))
+    firsts = [day for day in (attendance['first'], grades['first']) if day]
+    lasts = [day for day in (attendance['last'], grades['last']) if day]
+    if not firsts:
+        return None, None
+    return min(firsts), max(lasts)
+
+
+def periods_to_refresh(full=False):
+    """The months refresh_cohort_tables() would recompute, oldest first"""
+    first, last = _data_range()
+    # Months with state but no data left (e.g. everything deleted) still need emptying
+    states = {state.period: state for state in CohortPeriod.objects.all()}
+    months = set(months_between(first, last)) if first else set()
+    months.update(states)
+    if full:
+        return sorted(months)
+
+    due = []
+    for month in sorted(months):
+        state = states.get(month)
+        if (state is None or state.stale_since is not None
+                or timezone.localdate(state.refreshed_at) < next_month(month)):
+            due.append(month)
+    return due
+
+
+def _cohorts_by_student():
+    return {
+        student_id: quarter_start(enrolled)
+        for student_id, enrolled in Student.objects.values_list('id', 'enrollment_date').iterator(chunk_size=10000)
+    }
+
+
+def refresh_period(month, cohorts=None):
+    """Recompute one month of CohortSummary rows; returns the number of rows written"""
+    cohorts = cohorts if cohorts is not None else _cohorts_by_student()
+    started = timezone.now()
+    last_day = next_month(month) - timedelta(days=1)
+
+    rows = defaultdict(lambda: {
+        'active_students': 0, 'present_count': 0, 'attendance_count': 0,
+        'graded_students': 0, 'grade_count': 0, 'marks_obtained': 0, 'total_marks': 0,
+    })
+    attendance = Attendance.objects.filter(date__range=(month, last_day)).values(
+        'student_id', 'center_id'
+    ).annotate(
+        total=Count('id'), present=Count('id', filter=Q(is_present=True)),
+    ).order_by()
+    for entry in attendance.iterator(chunk_size=10000):
+        if entry['student_id'] not in cohorts:
+            continue  # enrolled after the refresh started; picked up next time
+        row = rows[(cohorts[entry['student_id']], entry['center_id'])]
+        row['active_students'] += 1
+        row['present_count'] += entry['present']
+        row['attendance_count'] += entry['total']
+
+    grades = Grade.objects.filter(assessment_date__range=(month, last_day)).values(
+        'student_id', 'center_id'
+    ).annotate(
+        count=Count('id'), marks=Sum('marks_obtained'), total=Sum('total_marks'),
+    ).order_by()
+    for entry in grades.iterator(chunk_size=10000):
+        if entry['student_id'] not in cohorts:
+            continue
+        row = rows[(cohorts[entry['student_id']], entry['center_id'])]
+        row['graded_students'] += 1
+        row['grade_count'] += entry['count']
+        row['marks_obtained'] += entry['marks']
+        row['total_marks'] += entry['total']
+
+    with transaction.atomic():
+        CohortSummary.objects.filter(period=month).delete()
+        CohortSummary.objects.bulk_create([
+            CohortSummary(cohort=cohort, center_id=center_id, period=month, **totals)
+            for (cohort, center_id), totals in rows.items()
+        ], batch_size=1000)
+        CohortPeriod.objects.update_or_create(period=month, defaults={'refreshed_at': started})
+        # Changes that arrived while this month was being computed keep it stale
+        CohortPeriod.objects.filter(period=month, stale_since__lte=started).update(stale_since=None)
+    return len(rows)
+
+
+def refresh_cohort_tables(full=False):
+    """
+    Bring CohortSummary up to date; returns {'periods': [...], 'rows': n}.
+
+    Donor report files and summaries covering a refreshed month are retired
+    so they are rebuilt from the new figures.
+    """
+    months = periods_to_refresh(full)
+    if not months:
+        return {'periods': [], 'rows': 0}
+
+    cohorts = _cohorts_by_student()
+    rows = sum(refresh_period(month, cohorts) for month in months)
+
+    # Imported here: reports.signals imports this module
+    from .signals import donor_data_changed
+    donor_data_changed(months[0], next_month(months[-1]) - timedelta(days=1))
+    return {'periods': months, 'rows': rows}
+
+
+def mark_periods_stale(dates):
+    """Flag the months containing `dates` for the next refresh"""
+    months = {month_start(day) for day in dates if day}
+    if months:
+        CohortPeriod.objects.filter(period__in=months, stale_since__isnull=True).update(stale_since=timezone.now())
+
+
+def _rate(numerator, denominator):
+    return round(numerator / denominator * 100, 1) if denominator else None
+
+
+def _change(first, last):
+    return round(last - first, 1) if first is not None and last is not None else None
+
+
+def cohort_outcomes(date_from, date_to, centers=None):
+    """
+    Per-cohort progression over the months between two dates, from the
+    cohort tables; the result is JSON-serialisable.
+
+    Cohorts are the enrollment quarters up to date_to. For each, the months
+    give active students (with any attendance that month) and retention
+    against the current cohort size, attendance rate and grade average, and
+    the cohort totals compare the first month of the period with the last.
+    """
+    months = months_between(date_from, date_to)
+    summaries = CohortSummary.objects.filter(period__gte=month_start(date_from), period__lte=date_to)
+    students = Student.objects.filter(enrollment_date__lte=date_to)
+    if centers is not None:
+        summaries = summaries.filter(center__in=centers)
+        students = students.filter(center__in=centers)
+
+    enrolled = defaultdict(int)
+    for entry in students.values('enrollment_date').annotate(count=Count('id')).order_by():
+        enrolled[quarter_start(entry['enrollment_date'])] += entry['count']
+
+    progress = defaultdict(dict)
+    for entry in summaries.values('cohort', 'period').annotate(
+        active=Sum('active_students'), present=Sum('present_count'), attendance=Sum('attendance_count'),
+        marks=Sum('marks_obtained'), total=Sum('total_marks'),
+    ).order_by():
+        progress[entry['cohort']][entry['period']] = entry
+
+    cohorts = []
+    totals = {'present': 0, 'attendance': 0, 'marks': 0, 'total': 0}
+    for cohort in sorted(set(enrolled) | set(progress)):
+        size = enrolled.get(cohort, 0)
+        periods = []
+        cohort_totals = {'present': 0, 'attendance': 0, 'marks': 0, 'total': 0}
+        for month in months:
+            entry = progress[cohort].get(month)
+            if entry is None:
+                # Months before the cohort enrolled are left blank rather than shown as 0%
+                periods.append({'period': month.isoformat(), 'active_students': 0, 'retention': None,
+                                'attendance_rate': None, 'grade_average': None})
+                continue
+            for key in cohort_totals:
+                cohort_totals[key] += entry[key] or 0
+            periods.append({
+                'period': month.isoformat(),
+                'active_students': entry['active'],
+                'retention': _rate(entry['active'], size),
+                'attendance_rate': _rate(entry['present'], entry['attendance']),
+                'grade_average': _rate(entry['marks'] or 0, entry['total']),
+            })
+        for key in totals:
+            totals[key] += cohort_totals[key]
+
+        measured = [period for period in periods if period['attendance_rate'] is not None]
+        graded = [period for period in periods if period['grade_average'] is not None]
+        cohorts.append({
+            'cohort': cohort.isoformat(),
+            'label': quarter_label(cohort),
+            'enrolled': size,
+            'active_students': periods[-1]['active_students'] if periods else 0,
+            'retention': periods[-1]['retention'] if periods else None,
+            'attendance_rate': _rate(cohort_totals['present'], cohort_totals['attendance']),
+            'grade_average': _rate(cohort_totals['marks'], cohort_totals['total']),
+            'attendance_change': _change(measured[0]['attendance_rate'], measured[-1]['attendance_rate'])
+            if measured else None,
+            'grade_change': _change(graded[0]['grade_average'], graded[-1]['grade_average']) if graded else None,
+            'periods': periods,
+        })
+
+    states = {
+        state.period: state
+        for state in CohortPeriod.objects.filter(period__gte=month_start(date_from), period__lte=date_to)
+    }
+    refreshed = [state.refreshed_at for state in states.values()]
+    return {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'periods': [month.isoformat() for month in months],
+        'period_labels': [month.strftime('%b %Y') for month in months],
+        'cohorts': cohorts,
+        'totals': {
+            'cohorts': len(cohorts),
+            'enrolled': sum(cohort['enrolled'] for cohort in cohorts),
+            'active_students': sum(cohort['active_students'] for cohort in cohorts),
+            'attendance_rate': _rate(totals['present'], totals['attendance']),
+            'grade_average': _rate(totals['marks'], totals['total']),
+        },
+        'refreshed_at': max(refreshed).isoformat() if refreshed else None,
+        # Months whose figures may lag behind the raw data until the next refresh
+        'pending_periods': [
+            month.isoformat() for month in months
+            if month not in states or states[month].stale_since is not None
+            or timezone.localdate(states[month].refreshed_at) < next_month(month)
+        ],
+    }
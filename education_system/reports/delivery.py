@@ -0,0 +1,124 @@
+"""
+Email delivery of rendered reports.
+
+Recipients are parsed and deduplicated once per run. Messages go out in
+batches of REPORT_EMAIL_BATCH_SIZE, each batch over a single backend
+connection, and every message shares the PDF bytes read once from storage.
+A transient failure (dropped connection, 4xx SMTP reply) reopens the
+connection after an exponential backoff and resumes with the message that
+failed, giving up on the batch after REPORT_EMAIL_MAX_RETRIES. Permanent
+failures are not retried: a refused recipient or rejected message (5xx) is
+recorded and skipped, and any other permanent error (authentication, sender
+refused) fails the rest of the batch at once.
+"""
+import logging
+import re
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMessage, get_connection
+from django.core.validators import validate_email
+
+logger = logging.getLogger(__name__)
+
+RECIPIENT_SEPARATORS = re.compile(r'[,;\s]+')
+
+
+def parse_recipients(text):
+    """Split a recipients blob into (valid addresses, invalid entries), dropping duplicates"""
+    valid = []
+    invalid = []
+    seen = set()
+    for address in RECIPIENT_SEPARATORS.split(text or ''):
+        if not address or address.lower() in seen:
+            continue
+        seen.add(address.lower())
+        try:
+            validate_email(address)
+        except ValidationError:
+            invalid.append(address)
+        else:
+            valid.append(address)
+    return valid, invalid
+
+
+def _is_transient(error):
+    """Whether a send error may succeed on retry: connection problems and 4xx replies"""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # SMTPException subclasses OSError; other SMTP errors are client-side and permanent
+    return isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(error, smtplib.SMTPException)
+
+
+def _send_batch(messages, result, max_retries, backoff):
+    connection = get_connection(fail_silently=False)
+    position = 0
+    attempt = 0
+    while position < len(messages):
+        message = messages[position]
+        try:
+            connection.open()
+            connection.send_messages([message])
+        except smtplib.SMTPRecipientsRefused as e:
+            result['failed'] += 1
+            result['errors'].append((message.to[0], str(e)))
+        except OSError as e:
+            connection.close()
+            transient = _is_transient(e)
+            if not transient and isinstance(e, smtplib.SMTPDataError):
+                # The server rejected this message; the others may still be accepted
+                logger.error("Email to %s rejected (%s)", message.to[0], e)
+                result['failed'] += 1
+                result['errors'].append((message.to[0], str(e)))
+            elif not transient or attempt >= max_retries:
+                # The server refuses every message or stayed unreachable; give up on the rest of this batch
+                logger.error("Email to %s failed (%s); giving up on %s messages",
+                             message.to[0], e, len(messages) - position)
+                for unsent in messages[position:]:
+                    result['failed'] += 1
+                    result['errors'].append((unsent.to[0], str(e)))
+                break
+            else:
+                delay = backoff * (2 ** attempt)
+                attempt += 1
+                logger.warning("Email to %s failed (%s); retrying in %ss", message.to[0], e, delay)
+                time.sleep(delay)
+                continue
+        else:
+            result['sent'] += 1
+        position += 1
+        attempt = 0
+    connection.close()
+
+
+def deliver_report(report, recipients, subject, body, batch_size=None, max_retries=None, backoff=None):
+    """
+    Email a completed report's PDF to each recipient in its own message.
+
+    Returns counts of sent and failed messages plus (recipient, error) pairs.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'REPORT_EMAIL_BATCH_SIZE', 100)
+    if max_retries is None:
+        max_retries = getattr(settings, 'REPORT_EMAIL_MAX_RETRIES', 3)
+    if backoff is None:
+        backoff = getattr(settings, 'REPORT_EMAIL_RETRY_BACKOFF', 2)
+
+    result = {'sent': 0, 'failed': 0, 'errors': []}
+    if not recipients:
+        return result
+
+    with report.file_path.open('rb') as generated:
+        content = generated.read()
+    filename = f"{report.title}.pdf"
+
+    for start in range(0, len(recipients), batch_size):
+        messages = []
+        for recipient in recipients[start:start + batch_size]:
+            message = EmailMessage(subject=subject, body=body, to=[recipient])
+            message.attach(filename, content, 'application/pdf')
+            messages.append(message)
+        _send_batch(messages, result, max_retries, backoff)
+    return result
@@ -0,0 +1,140 @@
+"""
+Serving generated report files.
+
+Files are never read into memory whole: full downloads go through
+FileResponse (so the WSGI server can use sendfile), and byte ranges are
+streamed in chunks from a memory map of the file. Every response carries
+ETag and Last-Modified, so conditional requests get a 304 and resumed
+downloads can use If-Range.
+
+Behind a proxy that can read MEDIA_ROOT, set REPORT_DOWNLOAD_OFFLOAD to
+'x-sendfile' (Apache, lighttpd) or 'x-accel-redirect' (nginx, with
+REPORT_DOWNLOAD_ACCEL_PREFIX an internal location aliased to MEDIA_ROOT) and
+the proxy sends the bytes instead.
+"""
+import mimetypes
+import mmap
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parse_range(header, size):
+    """
+    (start, end) inclusive for a single-range Range header, None to serve the
+    whole file, or False when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Malformed or multi-range requests get the full file
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    # A date only validates the range if it is exactly the file's modification time
+    return last_modified is not None and parse_http_date_safe(if_range) == last_modified
+
+
+def _mmap_chunks(field_file, start, end):
+    """Yield bytes start..end (inclusive) of a stored file, memory-mapping it when it is local"""
+    with field_file.storage.open(field_file.name, 'rb') as handle:
+        try:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            # Remote storage or an empty file: plain seek-and-read
+            handle.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = handle.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+            return
+        with mapped:
+            for offset in range(start, end + 1, CHUNK_SIZE):
+                yield mapped[offset:min(offset + CHUNK_SIZE, end + 1)]
+
+
+def _offload_response(field_file, mode, content_type):
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-sendfile':
+        response['X-Sendfile'] = field_file.path
+    else:
+        prefix = getattr(settings, 'REPORT_DOWNLOAD_ACCEL_PREFIX', '/protected/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + field_file.name
+    return response
+
+
+def serve_file(request, field_file, filename):
+    """Response for downloading a stored file, honouring conditional and Range requests"""
+    storage = field_file.storage
+    size = field_file.size
+    try:
+        last_modified = int(storage.get_modified_time(field_file.name).timestamp())
+    except NotImplementedError:
+        last_modified = None
+    etag = quote_etag(f'{size:x}-{last_modified or 0:x}')
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    mode = getattr(settings, 'REPORT_DOWNLOAD_OFFLOAD', None)
+
+    if mode in ('x-sendfile', 'x-accel-redirect'):
+        response = _offload_response(field_file, mode, content_type)
+    else:
+        byte_range = None
+        range_header = request.META.get('HTTP_RANGE')
+        if range_header and _if_range_matches(request, etag, last_modified):
+            byte_range = _parse_range(range_header, size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(_mmap_chunks(field_file, start, end), status=206,
+                                             content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(storage.open(field_file.name, 'rb'), content_type=content_type)
+            response.block_size = CHUNK_SIZE
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Report, ReportSchedule
+from .delivery import parse_recipients
 from centers.models import Center
 from datetime import date, timedelta
 
@@ -44,3 +45,11 @@ class ReportScheduleForm(forms.ModelForm):
             }),
             'centers': forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
         }
+
+    def clean_recipients(self):
+        recipients, invalid = parse_recipients(self.cleaned_data['recipients'])
+        if invalid:
+            raise forms.ValidationError(f"Invalid email addresses: {', '.join(invalid)}")
+        if not recipients:
+            raise forms.ValidationError("Enter at least one email address.")
+        return ', '.join(recipients)
@@ -0,0 +1,133 @@
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Report
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_report(report):
+    """Put a report on the generation queue (or generate it now in eager mode)"""
+    report.status = 'pending'
+    report.worker_id = ''
+    report.started_at = None
+    report.error_message = ''
+    report.attempts = 0
+    report.save(update_fields=['status', 'worker_id', 'started_at', 'error_message', 'attempts', 'updated_at'])
+
+    if getattr(settings, 'REPORT_QUEUE_EAGER', False):
+        report.status = 'generating'
+        report.started_at = timezone.now()
+        report.attempts = 1
+        report.save(update_fields=['status', 'started_at', 'attempts', 'updated_at'])
+        run_report_job(report)
+
+
+def claim_next_report(worker_id):
+    """
+    Atomically move the oldest pending report to 'generating' for this worker.
+
+    The claim is a conditional UPDATE on status, so when several workers race
+    for the same row only one of them sees an updated row count of 1.
+    """
+    candidates = Report.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)[:10]
+    for report_id in candidates:
+        now = timezone.now()
+        claimed = Report.objects.filter(id=report_id, status='pending').update(
+            status='generating',
+            worker_id=worker_id,
+            started_at=now,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if claimed:
+            return Report.objects.get(id=report_id)
+    return None
+
+
+def run_report_job(report):
+    """Render a claimed report, recording the failure reason if it does not complete"""
+    from .views import generate_report_file
+
+    try:
+        generate_report_file(report)
+    except Exception as e:
+        logger.exception("Report %s failed", report.id)
+        # On the instance too: in eager mode the request shows it straight away
+        report.status = 'failed'
+        report.error_message = str(e)
+        Report.objects.filter(id=report.id).update(
+            status='failed',
+            error_message=report.error_message,
+            updated_at=timezone.now(),
+        )
+        return False
+    return True
+
+
+def requeue_stale_reports(timeout=None, max_attempts=None):
+    """
+    Return reports stuck in 'generating' (e.g. after a worker crash) to the
+    queue. Reports that have already been claimed `max_attempts` times
+    (REPORT_JOB_MAX_ATTEMPTS) are failed instead, so one that keeps crashing
+    its worker is not retried forever. Returns (requeued, failed) counts.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'REPORT_JOB_TIMEOUT', 30 * 60)
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'REPORT_JOB_MAX_ATTEMPTS', 3)
+    now = timezone.now()
+    stale = Report.objects.filter(status='generating', started_at__lt=now - timedelta(seconds=timeout))
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status='failed',
+        error_message=f'Generation did not finish in {max_attempts} attempts',
+        updated_at=now,
+    )
+    if failed:
+        logger.error("Failed %s reports that did not finish in %s attempts", failed, max_attempts)
+    requeued = stale.filter(attempts__lt=max_attempts).update(
+        status='pending',
+        worker_id='',
+        started_at=None,
+        updated_at=now,
+    )
+    return requeued, failed
+
+
+def run_worker(worker_id=None, poll_interval=None, once=False):
+    """
+    Claim and render reports until stopped.
+
+    With `once`, the worker exits as soon as the queue is empty instead of
+    polling. Returns the number of reports processed.
+    """
+    worker_id = worker_id or default_worker_id()
+    if poll_interval is None:
+        poll_interval = getattr(settings, 'REPORT_WORKER_POLL_INTERVAL', 2)
+
+    processed = 0
+    while True:
+        close_old_connections()
+        requeue_stale_reports()
+        report = claim_next_report(worker_id)
+        if report is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        logger.info("Worker %s generating report %s", worker_id, report.id)
+        run_report_job(report)
+        processed += 1
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from reports.artifacts import evict_artifacts, invalidate_artifacts
+
+
+class Command(BaseCommand):
+    help = 'Evict least recently used cached report files, or clear the cache entirely'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='Remove every cached report file')
+        parser.add_argument('--max-bytes', type=int, help='Override REPORT_CACHE_MAX_BYTES')
+        parser.add_argument('--max-entries', type=int, help='Override REPORT_CACHE_MAX_ENTRIES')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            removed = invalidate_artifacts()
+        else:
+            removed = evict_artifacts(options['max_bytes'], options['max_entries'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} cached report files'))
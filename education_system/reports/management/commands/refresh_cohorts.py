@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.cohorts import refresh_cohort_tables
+
+
+class Command(BaseCommand):
+    help = 'Recompute the cohort tables for new, still-open and changed months'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every month')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = refresh_cohort_tables(full=options['full'])
+        months = ', '.join(month.strftime('%Y-%m') for month in result['periods']) or 'none'
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {len(result['periods'])} months ({months}): {result['rows']} rows "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
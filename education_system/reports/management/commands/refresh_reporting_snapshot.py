@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary database to the read-only reporting snapshot, periodically or once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            default=getattr(settings, 'REPORTING_SNAPSHOT_INTERVAL', 5 * 60),
+                            help='Seconds between refreshes')
+        parser.add_argument('--once', action='store_true', help='Refresh once and exit')
+
+    def handle(self, *args, **options):
+        from education_system.reporting_db import refresh_snapshot, run_snapshot_refresher
+
+        if options['once']:
+            result = refresh_snapshot()
+            self.stdout.write(self.style.SUCCESS(
+                f"Copied {result['bytes']} bytes to {result['path']} in {result['seconds']:.1f}s"
+            ))
+            return
+        refreshed = run_snapshot_refresher(interval=options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed the reporting snapshot {refreshed} times'))
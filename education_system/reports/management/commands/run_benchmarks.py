@@ -0,0 +1,77 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.benchmarks import CONCURRENCY_SECONDS, SIZES, compare_results, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Time the hot paths against synthetic datasets of several sizes (in a throwaway database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='small,medium',
+                            help=f"Comma-separated dataset sizes: {', '.join(SIZES)}")
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per benchmark')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Write the JSON results to this file ("-" for stdout)')
+        parser.add_argument('--compare', help='Earlier JSON results to check for regressions')
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help='Slowdown ratio of the median counted as a regression')
+        parser.add_argument('--only', help='Comma-separated benchmark name prefixes to run (default all)')
+        parser.add_argument('--concurrency',
+                            help='Comma-separated parallel writer counts to measure write throughput with (e.g. 1,4,8)')
+        parser.add_argument('--concurrency-seconds', type=float, default=CONCURRENCY_SECONDS,
+                            help='Duration of each concurrency run')
+
+    def handle(self, *args, **options):
+        sizes = [size.strip() for size in options['sizes'].split(',') if size.strip()]
+        unknown = [size for size in sizes if size not in SIZES]
+        if unknown:
+            raise CommandError(f"Unknown sizes: {', '.join(unknown)} (choose from {', '.join(SIZES)})")
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {options['compare']}: {e}")
+
+        def progress(size, benchmark):
+            self.stderr.write(f'[{size}] {benchmark}')
+
+        only = [prefix.strip() for prefix in options['only'].split(',') if prefix.strip()] if options['only'] else None
+        try:
+            concurrency = [int(count) for count in options['concurrency'].split(',')] if options['concurrency'] else None
+        except ValueError:
+            raise CommandError('--concurrency takes comma-separated writer counts')
+        results = run_benchmarks(sizes, seed=options['seed'], repeat=options['repeat'], progress=progress, only=only,
+                                 concurrency=concurrency, concurrency_seconds=options['concurrency_seconds'])
+
+        for size in results['sizes']:
+            self.stderr.write(f"\n{size['name']}: {size['counts']} generated in {size['generate_seconds']:.1f}s")
+            for name, result in size['benchmarks'].items():
+                self.stderr.write(f"  {name:32} median {result['median_ms']:10.1f} ms  {result['queries']:4} queries")
+            for setup, result in (size['concurrency'] or {}).items():
+                self.stderr.write(f"  concurrency, {setup} (journal_mode={result['pragmas'].get('journal_mode')}):")
+                for run in result['runs']:
+                    self.stderr.write(
+                        f"    {run['writers']:3} writers  {run['requests_per_second']:8.1f} writes/s"
+                        f"  {run['rows_per_second']:10.1f} rows/s  p95 {run['p95_ms'] or 0:8.1f} ms"
+                        f"  {run['locked']:4} locked  {run['exports_completed']:3} exports"
+                    )
+
+        if options['output'] == '-':
+            json.dump(results, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        elif options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if baseline is not None:
+            regressions = compare_results(baseline, results, options['threshold'])
+            for size, benchmark, what, before, after in regressions:
+                self.stderr.write(self.style.ERROR(f'{size} {benchmark}: {what} {before} -> {after}'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["compare"]}'))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Run scheduled reports as they fall due and email them to their recipients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            default=getattr(settings, 'REPORT_SCHEDULER_CONCURRENCY', 2),
+                            help='Schedules generated and delivered at the same time')
+        parser.add_argument('--poll-interval', type=float,
+                            default=getattr(settings, 'REPORT_SCHEDULER_POLL_INTERVAL', 60))
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once nothing is due instead of polling')
+
+    def handle(self, *args, **options):
+        from reports.scheduler import run_scheduler
+
+        processed = run_scheduler(
+            poll_interval=options['poll_interval'],
+            concurrency=options['concurrency'],
+            once=options['once'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Ran {processed} scheduled reports'))
@@ -0,0 +1,58 @@
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _worker_process(worker_id, poll_interval, once):
+    # Spawned children start with a fresh interpreter and need Django set up
+    import django
+    django.setup()
+
+    from reports.jobs import run_worker
+    run_worker(worker_id=worker_id, poll_interval=poll_interval, once=once)
+
+
+class Command(BaseCommand):
+    help = 'Start worker processes that claim and generate queued reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'REPORT_WORKERS', 2))
+        parser.add_argument('--poll-interval', type=float,
+                            default=getattr(settings, 'REPORT_WORKER_POLL_INTERVAL', 2))
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling for new reports')
+
+    def handle(self, *args, **options):
+        from reports.jobs import default_worker_id, run_worker
+
+        workers = max(1, options['workers'])
+        base_id = default_worker_id()
+
+        if workers == 1:
+            processed = run_worker(base_id, options['poll_interval'], options['once'])
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} reports'))
+            return
+
+        # Children must not inherit the parent's open database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=_worker_process,
+                args=(f'{base_id}-{n}', options['poll_interval'], options['once']),
+                daemon=False,
+            )
+            for n in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Started {workers} report workers')
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+        self.stdout.write(self.style.SUCCESS('Report workers stopped'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_report_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('report_type', models.CharField(choices=[('attendance', 'Attendance Report'), ('academic', 'Academic Performance Report'), ('center', 'Center Performance Report'), ('financial', 'Financial Report'), ('donor', 'Donor Impact Report'), ('risk', 'Risk Assessment Report')], max_length=20)),
+                ('date_from', models.DateField()),
+                ('date_to', models.DateField()),
+                ('file', models.FileField(upload_to='reports/cache/')),
+                ('size', models.IntegerField(default=0)),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_reportartifact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='summary_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='summary_generated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='summary_stale',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centers', '0001_initial'),
+        ('reports', '0004_report_summary_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['generated_by', 'created_at'], name='report_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['status', 'created_at'], name='report_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['date_from', 'date_to'], name='report_date_range_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reportartifact',
+            index=models.Index(fields=['last_used_at'], name='artifact_last_used_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reportartifact',
+            index=models.Index(fields=['date_from', 'date_to'], name='artifact_date_range_idx'),
+        ),
+    ]
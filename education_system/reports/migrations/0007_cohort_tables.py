@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centers', '0001_initial'),
+        ('reports', '0006_report_schedule_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(unique=True)),
+                ('refreshed_at', models.DateTimeField()),
+                ('stale_since', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CohortSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cohort', models.DateField(help_text='First day of the enrollment quarter')),
+                ('period', models.DateField(help_text='First day of the month')),
+                ('active_students', models.IntegerField(default=0)),
+                ('present_count', models.IntegerField(default=0)),
+                ('attendance_count', models.IntegerField(default=0)),
+                ('graded_students', models.IntegerField(default=0)),
+                ('grade_count', models.IntegerField(default=0)),
+                ('marks_obtained', models.IntegerField(default=0)),
+                ('total_marks', models.IntegerField(default=0)),
+                ('center', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='centers.center')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'center'], name='cohort_period_center_idx')],
+                'unique_together': {('cohort', 'center', 'period')},
+            },
+        ),
+    ]
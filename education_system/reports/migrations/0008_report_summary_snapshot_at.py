@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0007_cohort_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='summary_snapshot_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centers', '0001_initial'),
+        ('reports', '0009_report_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportartifact',
+            name='centers',
+            field=models.ManyToManyField(blank=True, to='centers.center'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0010_reportartifact_centers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month', unique=True)),
+                ('changed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='report',
+            name='summary_snapshot_at',
+        ),
+    ]
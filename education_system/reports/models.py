@@ -1,5 +1,8 @@
+from datetime import date
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from students.models import Student
 from centers.models import Center
 
@@ -31,8 +34,24 @@ class Report(models.Model):
     centers = models.ManyToManyField(Center, blank=True)
     file_path = models.FileField(upload_to='reports/', blank=True, null=True)
     
+    # Job queue bookkeeping (see reports.jobs)
+    worker_id = models.CharField(max_length=100, blank=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    error_message = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)  # times a worker claimed it since it was queued
+    
+    # Summary shown on the detail page, captured when generation completes
+    summary_data = models.JSONField(blank=True, null=True)
+    summary_generated_at = models.DateTimeField(blank=True, null=True)
+    summary_stale = models.BooleanField(default=False)
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['generated_by', 'created_at'], name='report_user_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='report_status_created_idx'),
+            models.Index(fields=['date_from', 'date_to'], name='report_date_range_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.get_report_type_display()}"
@@ -55,5 +74,82 @@ class ReportSchedule(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     last_run = models.DateTimeField(blank=True, null=True)
     
+    # Scheduler bookkeeping (see reports.scheduler); set when the schedule is
+    # created, and a null next_run_at (rows saved before that) is due now
+    next_run_at = models.DateTimeField(blank=True, null=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_run_at'], condition=models.Q(is_active=True), name='schedule_due_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.name} - {self.get_frequency_display()}"
+
+class ReportArtifact(models.Model):
+    """Cached PDF for one set of report parameters, reused by identical requests"""
+    cache_key = models.CharField(max_length=64, unique=True)
+    report_type = models.CharField(max_length=20, choices=Report.REPORT_TYPES)
+    date_from = models.DateField()
+    date_to = models.DateField()
+    centers = models.ManyToManyField(Center, blank=True)  # the report's selection; empty means every center
+    file = models.FileField(upload_to='reports/cache/')
+    size = models.IntegerField(default=0)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_used_at'], name='artifact_last_used_idx'),
+            models.Index(fields=['date_from', 'date_to'], name='artifact_date_range_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_report_type_display()} {self.date_from} - {self.date_to} ({self.cache_key[:12]})"
+
+class DataChange(models.Model):
+    """When report data in one month last changed (see reports.signals.record_data_change)"""
+    # The month of changes that touch every date, such as a renamed center
+    ALL_DATES = date.min
+    
+    month = models.DateField(unique=True, help_text="First day of the month")
+    changed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.month:%Y-%m} changed at {self.changed_at}"
+
+class CohortSummary(models.Model):
+    """One month of outcomes for the students of one enrollment cohort at one center (see reports.cohorts)"""
+    cohort = models.DateField(help_text="First day of the enrollment quarter")
+    center = models.ForeignKey(Center, on_delete=models.CASCADE)
+    period = models.DateField(help_text="First day of the month")
+    active_students = models.IntegerField(default=0)  # students with any attendance record in the month
+    present_count = models.IntegerField(default=0)
+    attendance_count = models.IntegerField(default=0)
+    graded_students = models.IntegerField(default=0)
+    grade_count = models.IntegerField(default=0)
+    marks_obtained = models.IntegerField(default=0)
+    total_marks = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['cohort', 'center', 'period']
+        indexes = [
+            models.Index(fields=['period', 'center'], name='cohort_period_center_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Cohort {self.cohort} at {self.center_id}, {self.period:%Y-%m}"
+
+class CohortPeriod(models.Model):
+    """Refresh state of one month of CohortSummary rows"""
+    period = models.DateField(unique=True)
+    refreshed_at = models.DateTimeField()
+    # Set when attendance or grades in the month change after it was refreshed
+    stale_since = models.DateTimeField(blank=True, null=True)
+    
+    def __str__(self):
+        return f"{self.period:%Y-%m} refreshed {self.refreshed_at}"
@@ -0,0 +1,447 @@
+"""
+Chunked PDF rendering for multi-center reports.
+
+Report generators collect their data in the main process and describe the
+document as an ordered list of chunks: (renderer name, plain-data payload).
+Each chunk is drawn on its own invariant ReportLab canvas, optionally in a
+process pool, and the parts are merged in chunk order. Nothing here touches
+the database, so pool workers never need a Django setup.
+
+Merging needs pypdf. Without it the chunks are drawn one after another on a
+single canvas in the calling process.
+
+Rendered reports leave out their title and "Generated on" lines, so reports
+with identical parameters can share one cached file; stamp_report() overlays
+both on each report's own copy. That needs pypdf too: without it, STAMPING
+is False and the lines are drawn while rendering.
+"""
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
+STAMPING = PdfWriter is not None
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+
+# Rows that fit on the first page of a table (below the report header) and on continuation pages
+FIRST_PAGE_ROWS = 31
+PAGE_ROWS = 43
+
+# The risk table takes two lines per student and has a summary box on its first page
+RISK_FIRST_PAGE_ROWS = 15
+RISK_PAGE_ROWS = 27
+
+# The donor report has an impact summary box above its cohort table, and a title and column
+# headings on every cohort progression page
+DONOR_FIRST_PAGE_ROWS = 25
+DONOR_PROGRESS_PAGE_ROWS = 40
+
+
+def draw_generated_on(p, generated_on):
+    """The generation time line of every report's header"""
+    p.setFont("Helvetica", 12)
+    p.drawString(50, PAGE_HEIGHT - 130, f"Generated on: {generated_on}")
+
+
+def draw_report_title(p, title):
+    """The report's own title, below the report type heading"""
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, PAGE_HEIGHT - 80, title)
+
+
+def draw_report_header(p, header):
+    """Title block shared by the report types"""
+    p.setFont("Helvetica-Bold", 20)
+    p.drawString(50, PAGE_HEIGHT - 50, header['title'])
+
+    if header.get('subtitle'):
+        draw_report_title(p, header['subtitle'])
+
+    p.setFont("Helvetica", 12)
+    p.drawString(50, PAGE_HEIGHT - 110, f"Period: {header['period']}")
+    if header.get('generated_on'):
+        draw_generated_on(p, header['generated_on'])
+    if header.get('centers'):
+        p.drawString(50, PAGE_HEIGHT - 150, f"Centers: {header['centers']}")
+
+
+def draw_attendance_summary(p, payload):
+    """First section of the attendance report: totals and the first detail rows"""
+    height = PAGE_HEIGHT
+    draw_report_header(p, payload['header'])
+    summary = payload['summary']
+
+    # Draw summary box
+    y_position = height - 200
+    p.rect(50, y_position - 80, 500, 80)
+
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(60, y_position - 20, "SUMMARY STATISTICS")
+
+    p.setFont("Helvetica", 12)
+    p.drawString(60, y_position - 40, f"Total Attendance Records: {summary['total_records']}")
+    p.drawString(300, y_position - 40, f"Present: {summary['present_records']}")
+    p.drawString(60, y_position - 60, f"Absent: {summary['absent_records']}")
+    p.drawString(300, y_position - 60, f"Attendance Rate: {summary['attendance_rate']:.1f}%")
+
+    # Detailed data
+    y_position -= 120
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y_position, "DETAILED ATTENDANCE DATA")
+
+    y_position -= 30
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(50, y_position, "Student Name")
+    p.drawString(200, y_position, "Center")
+    p.drawString(350, y_position, "Date")
+    p.drawString(450, y_position, "Status")
+
+    # Draw line
+    p.line(50, y_position - 5, 550, y_position - 5)
+    y_position -= 20
+
+    p.setFont("Helvetica", 9)
+
+    for student_name, center_name, date_str, status in payload['records']:
+        if y_position < 100:  # Start new page if needed
+            p.showPage()
+            y_position = height - 50
+            p.setFont("Helvetica", 9)
+
+        p.drawString(50, y_position, student_name[:20])
+        p.drawString(200, y_position, center_name[:15])
+        p.drawString(350, y_position, date_str)
+        p.drawString(450, y_position, status)
+
+        y_position -= 15
+
+    if payload['more_records'] > 0:
+        y_position -= 20
+        p.drawString(50, y_position, f"... and {payload['more_records']} more records")
+
+
+def draw_attendance_center(p, payload):
+    """One center's daily attendance breakdown, starting on a fresh page"""
+    height = PAGE_HEIGHT
+    totals = payload['totals']
+
+    y_position = height - 50
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, y_position, payload['name'][:50])
+    y_position -= 20
+    p.setFont("Helvetica", 11)
+    p.drawString(50, y_position, payload['location'][:70])
+    y_position -= 20
+    p.drawString(50, y_position, f"Records: {totals['total_records']}")
+    p.drawString(200, y_position, f"Present: {totals['present_records']}")
+    p.drawString(320, y_position, f"Absent: {totals['absent_records']}")
+    p.drawString(440, y_position, f"Rate: {totals['attendance_rate']:.1f}%")
+
+    y_position -= 30
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(50, y_position, "Date")
+    p.drawString(200, y_position, "Present")
+    p.drawString(300, y_position, "Absent")
+    p.drawString(400, y_position, "Total")
+    p.drawString(480, y_position, "Rate")
+    p.line(50, y_position - 5, 550, y_position - 5)
+    y_position -= 20
+
+    p.setFont("Helvetica", 9)
+    for date_str, present, absent, total in payload['days']:
+        if y_position < 100:
+            p.showPage()
+            y_position = height - 50
+            p.setFont("Helvetica", 9)
+
+        rate = (present / total * 100) if total > 0 else 0
+        p.drawString(50, y_position, date_str)
+        p.drawString(200, y_position, str(present))
+        p.drawString(300, y_position, str(absent))
+        p.drawString(400, y_position, str(total))
+        p.drawString(480, y_position, f"{rate:.1f}%")
+        y_position -= 15
+
+
+def draw_center_table(p, payload):
+    """One page of the center performance table; the first carries the header, the last the totals"""
+    height = PAGE_HEIGHT
+
+    if payload.get('header'):
+        draw_report_header(p, payload['header'])
+
+        y_position = height - 180
+        p.setFont("Helvetica-Bold", 14)
+        p.drawString(50, y_position, "CENTER PERFORMANCE SUMMARY")
+        y_position -= 30
+
+        # Headers
+        p.setFont("Helvetica-Bold", 10)
+        p.drawString(50, y_position, "Center Name")
+        p.drawString(180, y_position, "Location")
+        p.drawString(320, y_position, "Students")
+        p.drawString(380, y_position, "Capacity")
+        p.drawString(440, y_position, "Utilization")
+        p.drawString(500, y_position, "Attendance")
+
+        # Draw line
+        p.line(50, y_position - 5, 580, y_position - 5)
+        y_position -= 20
+    else:
+        y_position = height - 50
+
+    p.setFont("Helvetica", 9)
+
+    for name, location, students, capacity, utilization, attendance_rate in payload['rows']:
+        p.drawString(50, y_position, name[:18])  # Truncate long names
+        p.drawString(180, y_position, location[:18])
+        p.drawString(320, y_position, str(students))
+        p.drawString(380, y_position, str(capacity))
+        p.drawString(440, y_position, f"{utilization:.1f}%")
+        p.drawString(500, y_position, f"{attendance_rate:.1f}%")
+        y_position -= 15
+
+    totals = payload.get('totals')
+    if not totals:
+        return
+
+    if y_position < 160:
+        p.showPage()
+        y_position = height - 50
+
+    # Summary statistics
+    y_position -= 20
+    p.line(50, y_position, 580, y_position)
+    y_position -= 20
+
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y_position, "TOTALS:")
+    y_position -= 20
+    p.setFont("Helvetica", 11)
+    p.drawString(50, y_position, f"Total Centers: {totals['total_centers']}")
+    p.drawString(200, y_position, f"Total Students: {totals['total_students']}")
+    y_position -= 15
+    p.drawString(50, y_position, f"Total Capacity: {totals['total_capacity']}")
+    p.drawString(200, y_position, f"Overall Utilization: {totals['overall_utilization']:.1f}%")
+
+
+def draw_risk_table(p, payload):
+    """One page of ranked at-risk students; the first carries the header and level totals"""
+    height = PAGE_HEIGHT
+
+    if payload.get('header'):
+        draw_report_header(p, payload['header'])
+        summary = payload['summary']
+
+        y_position = height - 180
+        p.rect(50, y_position - 80, 500, 80)
+        p.setFont("Helvetica-Bold", 14)
+        p.drawString(60, y_position - 20, "RISK SUMMARY")
+        p.setFont("Helvetica", 12)
+        p.drawString(60, y_position - 40, f"Students Assessed: {summary['students_assessed']}")
+        p.drawString(60, y_position - 60, f"Average Score: {summary['average_score']:.1f} / 100")
+        p.drawString(300, y_position - 40, f"High Risk: {summary['levels']['high']}")
+        p.drawString(300, y_position - 60, f"Medium Risk: {summary['levels']['medium']}")
+
+        y_position -= 110
+        p.setFont("Helvetica-Bold", 10)
+        p.drawString(50, y_position, "#")
+        p.drawString(75, y_position, "Student")
+        p.drawString(260, y_position, "Center")
+        p.drawString(390, y_position, "Score")
+        p.drawString(440, y_position, "Attendance")
+        p.drawString(510, y_position, "Absent Run")
+        p.line(50, y_position - 5, 580, y_position - 5)
+        y_position -= 20
+        if not payload['rows']:
+            p.setFont("Helvetica", 10)
+            p.drawString(50, y_position, "No students at risk in this period.")
+    else:
+        y_position = height - 50
+
+    for rank, student_id, name, center, score, level, attendance_rate, absence_streak, factors in payload['rows']:
+        p.setFont("Helvetica", 9)
+        p.drawString(50, y_position, str(rank))
+        p.drawString(75, y_position, f"{name} ({student_id})"[:34])
+        p.drawString(260, y_position, center[:24])
+        p.drawString(390, y_position, f"{score:.1f} {level}")
+        p.drawString(440, y_position, "-" if attendance_rate is None else f"{attendance_rate:.1f}%")
+        p.drawString(510, y_position, str(absence_streak))
+        p.setFont("Helvetica-Oblique", 7)
+        p.drawString(75, y_position - 10, factors[:120])
+        y_position -= 25
+
+
+def _percent(value, signed=False):
+    if value is None:
+        return "-"
+    return f"{value:+.1f}" if signed else f"{value:.1f}%"
+
+
+def draw_donor_cohorts(p, payload):
+    """One page of the cohort summary table; the first carries the header and the impact summary"""
+    height = PAGE_HEIGHT
+
+    if payload.get('header'):
+        draw_report_header(p, payload['header'])
+        totals = payload['totals']
+
+        y_position = height - 180
+        p.rect(50, y_position - 80, 500, 80)
+        p.setFont("Helvetica-Bold", 14)
+        p.drawString(60, y_position - 20, "PROGRAM IMPACT SUMMARY")
+        p.setFont("Helvetica", 12)
+        p.drawString(60, y_position - 40, f"Students Enrolled: {totals['enrolled']} in {totals['cohorts']} cohorts")
+        p.drawString(60, y_position - 60, f"Active in Last Month: {totals['active_students']}")
+        p.drawString(330, y_position - 40, f"Attendance Rate: {_percent(totals['attendance_rate'])}")
+        p.drawString(330, y_position - 60, f"Grade Average: {_percent(totals['grade_average'])}")
+
+        y_position -= 110
+        p.setFont("Helvetica-Bold", 10)
+        p.drawString(50, y_position, "Cohort")
+        p.drawString(120, y_position, "Enrolled")
+        p.drawString(180, y_position, "Active")
+        p.drawString(235, y_position, "Retention")
+        p.drawString(305, y_position, "Attendance")
+        p.drawString(380, y_position, "Change")
+        p.drawString(440, y_position, "Grades")
+        p.drawString(500, y_position, "Change")
+        p.line(50, y_position - 5, 580, y_position - 5)
+        y_position -= 20
+        if not payload['rows']:
+            p.setFont("Helvetica", 10)
+            p.drawString(50, y_position, "No enrolment cohorts in this period.")
+    else:
+        y_position = height - 50
+
+    p.setFont("Helvetica", 9)
+    for (label, enrolled, active, retention, attendance_rate, attendance_change,
+         grade_average, grade_change) in payload['rows']:
+        p.drawString(50, y_position, label)
+        p.drawString(120, y_position, str(enrolled))
+        p.drawString(180, y_position, str(active))
+        p.drawString(235, y_position, _percent(retention))
+        p.drawString(305, y_position, _percent(attendance_rate))
+        p.drawString(380, y_position, _percent(attendance_change, signed=True))
+        p.drawString(440, y_position, _percent(grade_average))
+        p.drawString(500, y_position, _percent(grade_change, signed=True))
+        y_position -= 15
+
+
+def draw_donor_progress(p, payload):
+    """One page of month-by-month cohort progression"""
+    y_position = PAGE_HEIGHT - 50
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(50, y_position, "COHORT PROGRESSION")
+    y_position -= 30
+
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(50, y_position, "Cohort")
+    p.drawString(130, y_position, "Month")
+    p.drawString(220, y_position, "Active")
+    p.drawString(290, y_position, "Retention")
+    p.drawString(380, y_position, "Attendance")
+    p.drawString(470, y_position, "Grades")
+    p.line(50, y_position - 5, 580, y_position - 5)
+    y_position -= 20
+
+    p.setFont("Helvetica", 9)
+    for label, month, active, retention, attendance_rate, grade_average in payload['rows']:
+        p.drawString(50, y_position, label)
+        p.drawString(130, y_position, month)
+        p.drawString(220, y_position, str(active))
+        p.drawString(290, y_position, _percent(retention))
+        p.drawString(380, y_position, _percent(attendance_rate))
+        p.drawString(470, y_position, _percent(grade_average))
+        y_position -= 15
+
+
+RENDERERS = {
+    'attendance_summary': draw_attendance_summary,
+    'attendance_center': draw_attendance_center,
+    'center_table': draw_center_table,
+    'risk_table': draw_risk_table,
+    'donor_cohorts': draw_donor_cohorts,
+    'donor_progress': draw_donor_progress,
+}
+
+
+def paginate_rows(rows, first_page_rows=FIRST_PAGE_ROWS, page_rows=PAGE_ROWS):
+    """Split table rows into page-sized slices, the first page being shorter"""
+    pages = [rows[:first_page_rows]]
+    for start in range(first_page_rows, len(rows), page_rows):
+        pages.append(rows[start:start + page_rows])
+    return pages
+
+
+def _new_canvas(buffer):
+    # invariant=1 drops timestamps and random document ids so output is reproducible
+    return canvas.Canvas(buffer, pagesize=letter, invariant=1)
+
+
+def render_chunk(chunk):
+    """Render one (renderer, payload) chunk to standalone PDF bytes; runs in pool workers"""
+    renderer, payload = chunk
+    buffer = io.BytesIO()
+    p = _new_canvas(buffer)
+    RENDERERS[renderer](p, payload)
+    p.save()
+    return buffer.getvalue()
+
+
+def merge_pdfs(parts):
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(PdfReader(io.BytesIO(part)))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def stamp_report(content, title, generated_on):
+    """Overlay the title and "Generated on" lines on the first page of a report rendered without them"""
+    overlay = io.BytesIO()
+    p = _new_canvas(overlay)
+    draw_report_title(p, title)
+    draw_generated_on(p, generated_on)
+    p.save()
+
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(content)))
+    writer.pages[0].merge_page(PdfReader(overlay).pages[0])
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def render_report_pdf(chunks, workers=1):
+    """
+    Render chunks in order and return the final PDF bytes.
+
+    The chunks are always rendered and merged the same way, so the output is
+    identical whatever the worker count; `workers` only decides whether the
+    chunks are drawn in a process pool or in this process.
+    """
+    if PdfWriter is None:
+        buffer = io.BytesIO()
+        p = _new_canvas(buffer)
+        for index, (renderer, payload) in enumerate(chunks):
+            if index:
+                p.showPage()
+            RENDERERS[renderer](p, payload)
+        p.save()
+        return buffer.getvalue()
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            parts = list(executor.map(render_chunk, chunks))
+    else:
+        parts = [render_chunk(chunk) for chunk in chunks]
+
+    return merge_pdfs(parts)
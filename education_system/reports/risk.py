@@ -0,0 +1,441 @@
+"""
+Risk assessment: which students are drifting away.
+
+Attendance (as the monthly bitmaps of students.bitmaps, a few rows per
+student rather than one per day) and grades for the active students of the
+selected centers are pulled with one query per table for the report period
+and turned into per-student signals:
+
+- attendance rate over the last 30, 60 and 90 days of the period
+- attendance trend: least-squares slope of daily presence in each of those
+  windows, in percentage points per week
+- current and longest run of absences (days without a record don't break a run)
+- grade average and trend (slope of grade percentage over time, points per 30 days)
+- subjects whose average is below PASS_PERCENTAGE
+
+Each signal is normalised to 0..1, weighted by RISK_WEIGHTS into a 0-100
+score and bucketed by RISK_LEVELS. Windows longer than the period are
+clipped to it, so a report only depends on data inside its own date range
+(which is what the report cache and stale-summary tracking assume).
+
+With NumPy installed (it is in requirements.txt) attendance is laid out as
+a students x days matrix and every signal is computed with array operations,
+which handles 100k+ students in seconds. Without it the same signals are
+computed student by student in plain Python, which is much slower.
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import CharField
+from django.db.models.functions import Cast
+
+from centers.models import Center, Subject
+from students.bitmaps import month_start
+from students.models import AttendanceBitmap, Grade, Student
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+WINDOWS = (30, 60, 90)
+
+PASS_PERCENTAGE = 40
+
+# Points of the 0-100 score each signal can contribute
+RISK_WEIGHTS = {
+    'attendance': 35,
+    'absence_streak': 20,
+    'attendance_trend': 15,
+    'grade_trend': 15,
+    'subject_failures': 15,
+}
+
+# Signal values that count as the full weight
+ABSENCE_STREAK_CAP = 10  # days absent running
+ATTENDANCE_TREND_CAP = 10  # percentage points lost per week
+GRADE_TREND_CAP = 15  # percentage points lost per 30 days
+SUBJECT_FAILURES_CAP = 3
+
+# (minimum score, level), highest first
+RISK_LEVELS = [(50, 'high'), (25, 'medium'), (0, 'low')]
+
+FETCH_SIZE = 50000
+
+
+def risk_level(score):
+    for minimum, level in RISK_LEVELS:
+        if score >= minimum:
+            return level
+    return RISK_LEVELS[-1][1]
+
+
+def _clip(value, cap):
+    return min(max(value, 0.0), cap) / cap
+
+
+def risk_score(attendance_rate, absence_streak, attendance_trend, grade_trend, failing_subjects):
+    """Weighted 0-100 score from one student's signals (None for a signal without data)"""
+    return (
+        RISK_WEIGHTS['attendance'] * (0 if attendance_rate is None else _clip(100 - attendance_rate, 100))
+        + RISK_WEIGHTS['absence_streak'] * _clip(absence_streak, ABSENCE_STREAK_CAP)
+        + RISK_WEIGHTS['attendance_trend'] * (0 if attendance_trend is None else _clip(-attendance_trend, ATTENDANCE_TREND_CAP))
+        + RISK_WEIGHTS['grade_trend'] * (0 if grade_trend is None else _clip(-grade_trend, GRADE_TREND_CAP))
+        + RISK_WEIGHTS['subject_failures'] * _clip(failing_subjects, SUBJECT_FAILURES_CAP)
+    )
+
+
+def _querysets(date_from, date_to, centers):
+    students = Student.objects.filter(is_active=True)
+    attendance = AttendanceBitmap.objects.filter(month__gte=month_start(date_from), month__lte=date_to)
+    grades = Grade.objects.filter(assessment_date__range=(date_from, date_to))
+    if centers is not None:
+        students = students.filter(center__in=centers)
+        attendance = attendance.filter(center__in=centers)
+        grades = grades.filter(center__in=centers)
+    return (
+        students.order_by('id').values_list('id', 'student_id', 'first_name', 'last_name', 'center_id'),
+        attendance.order_by(),
+        grades.order_by(),
+    )
+
+
+def _slope(n, sx, sy, sxx, sxy):
+    denominator = n * sxx - sx * sx
+    if n < 2 or denominator <= 0:
+        return None
+    return (n * sxy - sx * sy) / denominator
+
+
+# NumPy engine
+
+def _columns(queryset, dtypes):
+    """
+    Run a values_list() queryset on a raw cursor and return one array per column.
+
+    Date columns should be cast to text in the query: NumPy parses ISO date
+    strings far faster than the database adapter builds date objects.
+    """
+    sql, params = queryset.query.sql_with_params()
+    # A structured array converts each fetched chunk of row tuples in one call
+    row_type = numpy.dtype([(f'f{index}', dtype) for index, dtype in enumerate(dtypes)])
+    chunks = []
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            chunks.append(numpy.array(rows, dtype=row_type))
+    table = numpy.concatenate(chunks) if chunks else numpy.empty(0, dtype=row_type)
+    return [table[name] for name in row_type.names]
+
+
+def _numpy_signals(student_ids, attendance, grades, date_from, date_to):
+    """Signals for every student as arrays aligned with the sorted `student_ids`"""
+    count = len(student_ids)
+    days = (date_to - date_from).days + 1
+    start = numpy.datetime64(date_from, 'D')
+    signals = {}
+
+    # Attendance as a students x days matrix: 1 present, 0 absent, -1 no record
+    bitmap_students, bitmap_months, recorded_masks, present_masks = _columns(
+        attendance.values_list('student_id', Cast('month', CharField()), 'recorded', 'present'),
+        ['int64', 'datetime64[D]', 'int64', 'int64'],
+    )
+    rows = numpy.searchsorted(student_ids, bitmap_students)
+    known = (rows < count) & (student_ids[numpy.minimum(rows, count - 1)] == bitmap_students)
+    rows, recorded_masks, present_masks = rows[known], recorded_masks[known], present_masks[known]
+    first_columns = (bitmap_months[known] - start).astype(numpy.int64)
+    matrix = numpy.full((count, days), -1, dtype=numpy.int8)
+    bits = numpy.arange(31, dtype=numpy.int64)
+    # Each month row expands to 31 (row, column, present) cells; in slices to bound memory
+    for first in range(0, len(rows), FETCH_SIZE):
+        chunk = slice(first, first + FETCH_SIZE)
+        columns = first_columns[chunk, None] + bits
+        recorded_cells = ((recorded_masks[chunk, None] >> bits) & 1).astype(bool)
+        valid = recorded_cells & (columns >= 0) & (columns < days)
+        cell_rows = numpy.broadcast_to(rows[chunk, None], columns.shape)[valid]
+        matrix[cell_rows, columns[valid]] = ((present_masks[chunk, None] >> bits) & 1)[valid]
+
+    recorded = matrix >= 0
+    present = matrix == 1
+    day_index = numpy.arange(days, dtype=numpy.float64)
+    for window in WINDOWS:
+        first = max(0, days - window)
+        window_recorded = recorded[:, first:].astype(numpy.float64)
+        window_present = present[:, first:].astype(numpy.float64)
+        x = day_index[first:]
+        n = window_recorded.sum(axis=1)
+        present_days = window_present.sum(axis=1)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            signals[f'attendance_rate_{window}'] = numpy.where(n > 0, present_days / n * 100, numpy.nan)
+            sx = window_recorded @ x
+            sxx = window_recorded @ (x * x)
+            sxy = (window_present @ x) * 100
+            denominator = n * sxx - sx * sx
+            slope = (n * sxy - sx * present_days * 100) / denominator
+        signals[f'attendance_trend_{window}'] = numpy.where((n >= 2) & (denominator > 0), slope * 7, numpy.nan)
+
+    current = numpy.zeros(count, dtype=numpy.int64)
+    longest = numpy.zeros(count, dtype=numpy.int64)
+    for day in range(days):
+        column = matrix[:, day]
+        current = numpy.where(column == 0, current + 1, numpy.where(column == 1, 0, current))
+        numpy.maximum(longest, current, out=longest)
+    signals['absence_streak'] = current
+    signals['longest_absence_streak'] = longest
+
+    # Grades: per-student sums with bincount, per (student, subject) averages for failures
+    grade_students, grade_subjects, grade_dates, marks, totals = _columns(
+        grades.values_list('student_id', 'subject_id', Cast('assessment_date', CharField()),
+                           'marks_obtained', 'total_marks'),
+        ['int64', 'int64', 'datetime64[D]', 'float64', 'float64'],
+    )
+    rows = numpy.searchsorted(student_ids, grade_students)
+    known = (rows < count) & (student_ids[numpy.minimum(rows, count - 1)] == grade_students) & (totals > 0)
+    rows = rows[known]
+    percentage = marks[known] / totals[known] * 100
+    t = (grade_dates[known] - start).astype(numpy.float64)
+
+    n = numpy.bincount(rows, minlength=count).astype(numpy.float64)
+    sy = numpy.bincount(rows, weights=percentage, minlength=count)
+    sx = numpy.bincount(rows, weights=t, minlength=count)
+    sxx = numpy.bincount(rows, weights=t * t, minlength=count)
+    sxy = numpy.bincount(rows, weights=t * percentage, minlength=count)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        signals['grade_average'] = numpy.where(n > 0, sy / n, numpy.nan)
+        denominator = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / denominator
+    signals['grade_trend'] = numpy.where((n >= 2) & (denominator > 0), slope * 30, numpy.nan)
+
+    subject_ids, subject_index = numpy.unique(grade_subjects[known], return_inverse=True)
+    subject_count = max(len(subject_ids), 1)
+    keys = rows * subject_count + subject_index
+    key_counts = numpy.bincount(keys, minlength=count * subject_count)
+    key_sums = numpy.bincount(keys, weights=percentage, minlength=count * subject_count)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        failing = ((key_counts > 0) & (key_sums / key_counts < PASS_PERCENTAGE)).reshape(count, subject_count)
+    signals['failing_subjects'] = failing.sum(axis=1)
+    signals['_failing'] = (failing, subject_ids)
+
+    worst_trend = numpy.fmin.reduce([signals[f'attendance_trend_{window}'] for window in WINDOWS])
+    rate = numpy.nan_to_num(signals['attendance_rate_30'], nan=100.0)
+    signals['score'] = (
+        RISK_WEIGHTS['attendance'] * numpy.clip(100 - rate, 0, 100) / 100
+        + RISK_WEIGHTS['absence_streak'] * numpy.clip(current, 0, ABSENCE_STREAK_CAP) / ABSENCE_STREAK_CAP
+        + RISK_WEIGHTS['attendance_trend'] * numpy.clip(-numpy.nan_to_num(worst_trend), 0, ATTENDANCE_TREND_CAP) / ATTENDANCE_TREND_CAP
+        + RISK_WEIGHTS['grade_trend'] * numpy.clip(-numpy.nan_to_num(signals['grade_trend']), 0, GRADE_TREND_CAP) / GRADE_TREND_CAP
+        + RISK_WEIGHTS['subject_failures'] * numpy.clip(signals['failing_subjects'], 0, SUBJECT_FAILURES_CAP) / SUBJECT_FAILURES_CAP
+    )
+    return signals
+
+
+def _numpy_assessment(students, attendance, grades, date_from, date_to):
+    """(ranked row indexes, per-row signal lookup) using the NumPy engine"""
+    student_ids = numpy.array([row[0] for row in students], dtype=numpy.int64)
+    signals = _numpy_signals(student_ids, attendance, grades, date_from, date_to)
+    # Highest score first, ties by student id (ascending, as the rows are sorted by id)
+    order = numpy.lexsort((numpy.arange(len(students)), -numpy.round(signals['score'], 6)))
+    failing, subject_ids = signals.pop('_failing')
+
+    def row_signals(row):
+        values = {}
+        for name, array in signals.items():
+            value = array[row].item()
+            values[name] = None if isinstance(value, float) and math.isnan(value) else value
+        values['failing_subject_ids'] = [int(subject_ids[i]) for i in numpy.flatnonzero(failing[row])]
+        return values
+
+    return order.tolist(), signals['score'], row_signals
+
+
+# Plain Python engine
+
+def _python_signals(attendance_days, grade_rows, date_from, date_to):
+    days = (date_to - date_from).days + 1
+    signals = {}
+    for window in WINDOWS:
+        first = max(0, days - window)
+        points = [(offset, present) for offset, present in attendance_days if offset >= first]
+        n = len(points)
+        present_days = sum(present for _, present in points)
+        signals[f'attendance_rate_{window}'] = present_days / n * 100 if n else None
+        slope = _slope(
+            n,
+            sum(offset for offset, _ in points),
+            present_days * 100,
+            sum(offset * offset for offset, _ in points),
+            sum(offset * 100 for offset, present in points if present),
+        )
+        signals[f'attendance_trend_{window}'] = None if slope is None else slope * 7
+
+    current = longest = 0
+    for _, present in sorted(attendance_days):
+        current = 0 if present else current + 1
+        longest = max(longest, current)
+    signals['absence_streak'] = current
+    signals['longest_absence_streak'] = longest
+
+    n = len(grade_rows)
+    signals['grade_average'] = sum(percentage for _, _, percentage in grade_rows) / n if n else None
+    slope = _slope(
+        n,
+        sum(t for _, t, _ in grade_rows),
+        sum(percentage for _, _, percentage in grade_rows),
+        sum(t * t for _, t, _ in grade_rows),
+        sum(t * percentage for _, t, percentage in grade_rows),
+    )
+    signals['grade_trend'] = None if slope is None else slope * 30
+
+    by_subject = defaultdict(list)
+    for subject_id, _, percentage in grade_rows:
+        by_subject[subject_id].append(percentage)
+    signals['failing_subject_ids'] = sorted(
+        subject_id for subject_id, values in by_subject.items() if sum(values) / len(values) < PASS_PERCENTAGE
+    )
+    signals['failing_subjects'] = len(signals['failing_subject_ids'])
+
+    trends = [signals[f'attendance_trend_{window}'] for window in WINDOWS
+              if signals[f'attendance_trend_{window}'] is not None]
+    signals['score'] = risk_score(
+        signals['attendance_rate_30'], current, min(trends) if trends else None,
+        signals['grade_trend'], signals['failing_subjects'],
+    )
+    return signals
+
+
+def _python_assessment(students, attendance, grades, date_from, date_to):
+    days = (date_to - date_from).days + 1
+    attendance_days = defaultdict(list)
+    for student_id, month, recorded, present in attendance.values_list(
+        'student_id', 'month', 'recorded', 'present'
+    ).iterator(chunk_size=FETCH_SIZE):
+        first = (month - date_from).days
+        while recorded:
+            low = recorded & -recorded
+            recorded ^= low
+            offset = first + low.bit_length() - 1
+            if 0 <= offset < days:
+                attendance_days[student_id].append((offset, bool(present & low)))
+    grade_rows = defaultdict(list)
+    for student_id, subject_id, day, marks, total in grades.values_list(
+        'student_id', 'subject_id', 'assessment_date', 'marks_obtained', 'total_marks'
+    ).iterator(chunk_size=FETCH_SIZE):
+        if total > 0:
+            grade_rows[student_id].append((subject_id, (day - date_from).days, marks / total * 100))
+
+    signals = [
+        _python_signals(attendance_days.get(row[0], []), grade_rows.get(row[0], []), date_from, date_to)
+        for row in students
+    ]
+    scores = [values['score'] for values in signals]
+    order = sorted(range(len(students)), key=lambda row: (-round(scores[row], 6), row))
+    return order, scores, signals.__getitem__
+
+
+def _factors(values, subject_names):
+    """Short human-readable reasons behind a student's score"""
+    factors = []
+    if values['absence_streak'] >= 3:
+        factors.append(f"Absent {values['absence_streak']} days running")
+    rate = values['attendance_rate_30']
+    if rate is not None and rate < 75:
+        factors.append(f"Attendance {rate:.0f}% (last 30 days)")
+    trends = [values[f'attendance_trend_{window}'] for window in WINDOWS
+              if values[f'attendance_trend_{window}'] is not None]
+    if trends and min(trends) <= -2:
+        factors.append(f"Attendance falling {-min(trends):.1f} pts/week")
+    if values['grade_trend'] is not None and values['grade_trend'] <= -5:
+        factors.append(f"Grades falling {-values['grade_trend']:.1f} pts/month")
+    if values['failing_subject_ids']:
+        factors.append("Failing " + ", ".join(subject_names.get(i, str(i)) for i in values['failing_subject_ids']))
+    return factors
+
+
+def _round(value, digits=1):
+    return None if value is None else round(value, digits)
+
+
+def assess_risk(date_from, date_to, centers=None, levels=('high', 'medium'), limit=None, engine=None):
+    """
+    Score every active student of `centers` (all centers when None) over date_from..date_to.
+
+    Returns JSON-serialisable totals plus the ranked students whose level is in
+    `levels` (at most `limit` of them). `engine` forces 'numpy' or 'python';
+    by default NumPy is used when it is installed.
+    """
+    engine = engine or ('numpy' if numpy is not None else 'python')
+    if engine == 'numpy' and numpy is None:
+        raise RuntimeError('The numpy risk engine needs NumPy installed')
+    if centers is not None:
+        centers = list(centers)
+
+    students_query, attendance, grades = _querysets(date_from, date_to, centers)
+    students = list(students_query)
+    result = {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'engine': engine,
+        'students_assessed': len(students),
+        'levels': {level: 0 for _, level in RISK_LEVELS},
+        'average_score': 0.0,
+        'students': [],
+    }
+    if not students:
+        return result
+
+    assess = _numpy_assessment if engine == 'numpy' else _python_assessment
+    order, scores, row_signals = assess(students, attendance, grades, date_from, date_to)
+
+    for score in scores:
+        result['levels'][risk_level(round(float(score), 1))] += 1
+    result['average_score'] = round(float(sum(scores)) / len(students), 1)
+
+    selected = []
+    for row in order:
+        if limit is not None and len(selected) >= limit:
+            break
+        if risk_level(round(float(scores[row]), 1)) in levels:
+            selected.append(row)
+    if not selected:
+        return result
+
+    center_names = dict(Center.objects.filter(id__in={students[row][4] for row in selected}).values_list('id', 'name'))
+    signals = [row_signals(row) for row in selected]
+    subject_names = dict(Subject.objects.filter(
+        id__in={i for values in signals for i in values['failing_subject_ids']}
+    ).values_list('id', 'name'))
+
+    for rank, (row, values) in enumerate(zip(selected, signals), start=1):
+        student_pk, code, first_name, last_name, center_id = students[row]
+        score = round(float(values['score']), 1)
+        entry = {
+            'rank': rank,
+            'id': student_pk,
+            'student_id': code,
+            'name': f'{first_name} {last_name}',
+            'center': center_names.get(center_id, ''),
+            'score': score,
+            'level': risk_level(score),
+        }
+        for window in WINDOWS:
+            entry[f'attendance_rate_{window}'] = _round(values[f'attendance_rate_{window}'])
+            entry[f'attendance_trend_{window}'] = _round(values[f'attendance_trend_{window}'])
+        entry.update({
+            'absence_streak': int(values['absence_streak']),
+            'longest_absence_streak': int(values['longest_absence_streak']),
+            'grade_average': _round(values['grade_average']),
+            'grade_trend': _round(values['grade_trend']),
+            'failing_subjects': [subject_names.get(i, str(i)) for i in values['failing_subject_ids']],
+            'factors': _factors(values, subject_names),
+        })
+        result['students'].append(entry)
+    return result
+
+
+def default_period(date_to, days=90):
+    """The `days`-long period ending on date_to, the longest trend window by default"""
+    return date_to - timedelta(days=days - 1), date_to
@@ -0,0 +1,211 @@
+"""
+Runs ReportSchedule entries when they fall due.
+
+Runs fall on calendar boundaries: midnight starting each day, Monday, month
+or quarter. A new schedule first runs at the next boundary, and each run
+reports on the calendar period before the one it runs in (a monthly run on
+March 1st covers February). After a run, next_run_at moves to the boundary
+after that run's period, so a late run does not push later ones back; a
+failed run is retried after REPORT_SCHEDULE_RETRY_DELAY. Several scheduler
+processes can poll at once: due rows are selected FOR UPDATE SKIP LOCKED where
+the database supports it, and each claim is a conditional UPDATE on the lock
+columns so only one instance wins a schedule even on SQLite.
+"""
+import calendar
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .delivery import deliver_report, parse_recipients
+from .jobs import default_worker_id, run_report_job
+from .models import Report, ReportSchedule
+
+logger = logging.getLogger(__name__)
+
+FREQUENCY_DAYS = {'daily': 1, 'weekly': 7}
+FREQUENCY_MONTHS = {'monthly': 1, 'quarterly': 3}
+
+
+def add_months(value, months):
+    """Shift a date or datetime by whole months, clamping to the end of shorter months"""
+    month_index = value.month - 1 + months
+    year = value.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def shift(value, frequency, periods=1):
+    if frequency in FREQUENCY_DAYS:
+        return value + timedelta(days=FREQUENCY_DAYS[frequency] * periods)
+    return add_months(value, FREQUENCY_MONTHS[frequency] * periods)
+
+
+def period_start(frequency, day):
+    """The first day of the calendar period (day, week from Monday, month or quarter) containing `day`"""
+    if frequency == 'weekly':
+        return day - timedelta(days=day.weekday())
+    if frequency in FREQUENCY_MONTHS:
+        return day.replace(month=day.month - (day.month - 1) % FREQUENCY_MONTHS[frequency], day=1)
+    return day
+
+
+def next_due(schedule, after):
+    """Midnight starting the schedule's next calendar period after `after`"""
+    start = shift(period_start(schedule.frequency, timezone.localdate(after)), schedule.frequency)
+    return timezone.make_aware(datetime.combine(start, dt_time()))
+
+
+def report_period(frequency, run_at):
+    """The calendar period before the one a run falls in, e.g. last month for a monthly schedule"""
+    start = period_start(frequency, timezone.localdate(run_at))
+    return shift(start, frequency, -1), start - timedelta(days=1)
+
+
+def _lock_available(now):
+    timeout = getattr(settings, 'REPORT_SCHEDULE_LOCK_TIMEOUT', 60 * 60)
+    return Q(locked_by='') | Q(locked_at__lt=now - timedelta(seconds=timeout))
+
+
+def claim_due_schedules(worker_id, limit, now=None):
+    """Lock up to `limit` due schedules for this scheduler instance and return them"""
+    now = now or timezone.now()
+    due = ReportSchedule.objects.filter(is_active=True).filter(
+        Q(next_run_at__isnull=True) | Q(next_run_at__lte=now)
+    ).filter(_lock_available(now))
+
+    claimed = []
+    with transaction.atomic():
+        candidates = list(due.select_for_update(skip_locked=True).order_by(
+            F('next_run_at').asc(nulls_first=True), 'id'
+        ).values_list('id', flat=True)[:limit])
+        for schedule_id in candidates:
+            if ReportSchedule.objects.filter(id=schedule_id).filter(_lock_available(now)).update(
+                locked_by=worker_id, locked_at=now,
+            ):
+                claimed.append(schedule_id)
+
+    return list(
+        ReportSchedule.objects.filter(id__in=claimed).select_related('created_by').prefetch_related('centers')
+    )
+
+
+def send_report_email(schedule, report):
+    """Email the rendered report to the schedule's recipients; returns the delivery result"""
+    recipients, invalid = parse_recipients(schedule.recipients)
+    result = deliver_report(
+        report,
+        recipients,
+        subject=report.title,
+        body=(
+            f"Attached is the {report.get_report_type_display()} for "
+            f"{report.date_from:%B %d, %Y} - {report.date_to:%B %d, %Y}, "
+            f"sent by the \"{schedule.name}\" schedule."
+        ),
+    )
+    result['failed'] += len(invalid)
+    result['errors'].extend((address, 'Invalid email address') for address in invalid)
+    return result
+
+
+def run_schedule(schedule, worker_id, run_at=None):
+    """Generate and deliver one claimed schedule's report, then release the claim"""
+    run_at = run_at or timezone.now()
+    date_from, date_to = report_period(schedule.frequency, run_at)
+    claim = ReportSchedule.objects.filter(id=schedule.id, locked_by=worker_id)
+
+    try:
+        report = Report.objects.create(
+            title=f"{schedule.name} ({date_from} to {date_to})",
+            report_type=schedule.report_type,
+            generated_by=schedule.created_by,
+            date_from=date_from,
+            date_to=date_to,
+            status='generating',
+            worker_id=worker_id,
+            started_at=run_at,
+        )
+        report.centers.set(schedule.centers.all())
+        if not run_report_job(report):
+            report.refresh_from_db()
+            raise RuntimeError(f"Report {report.id} failed: {report.error_message}")
+
+        report.refresh_from_db()
+        delivery = send_report_email(schedule, report)
+        if delivery['failed'] and not delivery['sent']:
+            raise RuntimeError(f"No recipient could be emailed: {delivery['errors'][0][1]}")
+    except Exception as e:
+        logger.exception("Schedule %s failed", schedule.id)
+        retry_delay = getattr(settings, 'REPORT_SCHEDULE_RETRY_DELAY', 15 * 60)
+        claim.update(
+            locked_by='',
+            locked_at=None,
+            last_error=str(e),
+            next_run_at=timezone.now() + timedelta(seconds=retry_delay),
+        )
+        return False
+
+    claim.update(
+        last_run=run_at,
+        next_run_at=next_due(schedule, run_at),
+        locked_by='',
+        locked_at=None,
+        last_error='; '.join(f"{recipient}: {error}" for recipient, error in delivery['errors']),
+    )
+    return True
+
+
+def _run_in_thread(schedule, worker_id):
+    try:
+        return run_schedule(schedule, worker_id)
+    finally:
+        # Pool threads each open their own connection
+        connection.close()
+
+
+def run_due_schedules(worker_id=None, concurrency=None):
+    """Claim and run due schedules, at most `concurrency` at a time. Returns the number run."""
+    worker_id = worker_id or default_worker_id()
+    if concurrency is None:
+        concurrency = getattr(settings, 'REPORT_SCHEDULER_CONCURRENCY', 2)
+    concurrency = max(1, concurrency)
+
+    schedules = claim_due_schedules(worker_id, limit=concurrency)
+    if not schedules:
+        return 0
+
+    if concurrency == 1:
+        for schedule in schedules:
+            run_schedule(schedule, worker_id)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda schedule: _run_in_thread(schedule, worker_id), schedules))
+    return len(schedules)
+
+
+def run_scheduler(worker_id=None, poll_interval=None, concurrency=None, once=False):
+    """
+    Run due schedules until stopped.
+
+    With `once`, returns as soon as nothing is due instead of polling.
+    Returns the number of schedules run.
+    """
+    worker_id = worker_id or default_worker_id()
+    if poll_interval is None:
+        poll_interval = getattr(settings, 'REPORT_SCHEDULER_POLL_INTERVAL', 60)
+
+    processed = 0
+    while True:
+        close_old_connections()
+        ran = run_due_schedules(worker_id, concurrency)
+        processed += ran
+        if not ran:
+            if once:
+                return processed
+            time.sleep(poll_interval)
@@ -0,0 +1,174 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from centers.models import Center
+from students.models import Attendance, Grade, Student
+from students.signals import (
+    attendance_bulk_written, grades_bulk_created, student_transferred, students_bulk_created,
+)
+
+from .artifacts import invalidate_artifacts, invalidate_report_type
+from .cohorts import mark_periods_stale, month_start, quarter_start
+from .models import DataChange, Report, ReportSchedule
+from .scheduler import next_due
+
+
+def record_data_change(dates=None):
+    """
+    Note when report data in the months of `dates` (None: every date)
+    changed, once the transaction commits: until then a reporting snapshot
+    would not include it.
+    """
+    if not getattr(settings, 'REPORTING_DATABASE', None):
+        return
+    months = {month_start(day) for day in dates} if dates is not None else {DataChange.ALL_DATES}
+
+    def record():
+        now = timezone.now()
+        changes = DataChange.objects.filter(month__in=months)
+        if changes.update(changed_at=now) < len(months):
+            missing = months - set(changes.values_list('month', flat=True))
+            DataChange.objects.bulk_create(
+                [DataChange(month=month, changed_at=now) for month in missing], ignore_conflicts=True,
+            )
+    transaction.on_commit(record)
+
+
+def last_data_change(date_from, date_to):
+    """When report data in date_from..date_to last changed, or None"""
+    return DataChange.objects.filter(
+        Q(month=DataChange.ALL_DATES) | Q(month__gte=month_start(date_from), month__lte=date_to),
+    ).aggregate(last=Max('changed_at'))['last']
+
+
+def data_changed(dates=None, centers=None):
+    """
+    Retire cached files and mark summaries stale for reports covering any of
+    `dates` and including any of the `centers` ids (None matches every date
+    or center), and mark the cohort months of `dates` stale.
+
+    The change is also noted, so reports regenerated from a reporting
+    snapshot taken before it read the primary instead (see last_data_change).
+    """
+    invalidate_artifacts(dates, centers)
+    if dates is not None:
+        dates = set(dates)
+        if not dates:
+            return
+    record_data_change(dates)
+
+    snapshots = Report.objects.filter(summary_stale=False, summary_data__isnull=False)
+    if dates is not None:
+        # One UPDATE for the whole span: a report between two of the dates is marked too
+        snapshots = snapshots.filter(date_from__lte=max(dates), date_to__gte=min(dates))
+        mark_periods_stale(dates)
+    if centers is not None:
+        snapshots = snapshots.filter(Q(centers__in=set(centers)) | Q(centers__isnull=True))
+    snapshots.update(summary_stale=True)
+
+
+def donor_data_changed(date_from, date_to):
+    """Donor reports read the cohort tables; retire those overlapping refreshed months"""
+    invalidate_report_type('donor', date_from, date_to)
+    Report.objects.filter(
+        report_type='donor', summary_stale=False, summary_data__isnull=False,
+        date_from__lte=date_to, date_to__gte=date_from,
+    ).update(summary_stale=True)
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def invalidate_on_attendance_change(sender, instance, raw=False, **kwargs):
+    """Reports covering the changed day no longer match the data"""
+    if raw:
+        return
+    dates = {instance.date}
+    previous = getattr(instance, '_loaded_state', None)
+    if previous:
+        dates.add(previous[1])
+    data_changed(dates)
+
+
+@receiver(attendance_bulk_written)
+def invalidate_on_bulk_attendance(sender, dates, **kwargs):
+    data_changed(dates)
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+def invalidate_on_grade_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    dates = {instance.assessment_date}
+    previous = getattr(instance, '_loaded_state', None)
+    if previous:
+        dates.add(previous[1])
+    data_changed(dates)
+
+
+@receiver(grades_bulk_created)
+def invalidate_on_grade_import(sender, grades, **kwargs):
+    data_changed({grade.assessment_date for grade in grades})
+
+
+@receiver(students_bulk_created)
+def invalidate_on_student_import(sender, students, **kwargs):
+    data_changed(centers={student.center_id for student in students})
+
+
+def _student_months(student):
+    """The months with any of the student's attendance or grades"""
+    return (list(Attendance.objects.filter(student=student).dates('date', 'month'))
+            + list(Grade.objects.filter(student=student).dates('assessment_date', 'month')))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_on_student_change(sender, instance, raw=False, **kwargs):
+    """Names and enrolment appear in every report type that includes the student's center"""
+    if raw:
+        return
+    data_changed(centers=[instance.center_id])
+
+
+@receiver(post_save, sender=Student)
+def restate_reenrolled_student(sender, instance, created, raw=False, **kwargs):
+    """A new enrollment quarter moves the student's months to another cohort's rows"""
+    previous = getattr(instance, '_loaded_enrollment_date', None)
+    if raw or created or previous is None:
+        return
+    if quarter_start(previous) != quarter_start(instance.enrollment_date):
+        mark_periods_stale(_student_months(instance))
+
+
+@receiver(pre_delete, sender=Student)
+def restate_deleted_student(sender, instance, **kwargs):
+    """The student's months lose their cohort rows; read them before attendance and grades cascade away"""
+    mark_periods_stale(_student_months(instance))
+
+
+@receiver(post_save, sender=Center)
+@receiver(post_delete, sender=Center)
+def invalidate_on_center_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    data_changed(centers=[instance.id])
+
+
+@receiver(student_transferred)
+def restate_transferred_cohort(sender, student, previous_center_id, **kwargs):
+    """The student's months now count toward another center's cohort rows"""
+    data_changed(centers=[previous_center_id])
+    mark_periods_stale(_student_months(student))
+
+
+@receiver(pre_save, sender=ReportSchedule)
+def schedule_first_run(sender, instance, raw=False, **kwargs):
+    """A new schedule first runs when its next calendar period starts"""
+    if raw or instance.next_run_at is not None:
+        return
+    instance.next_run_at = next_due(instance, timezone.now())
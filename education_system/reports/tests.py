@@ -1,3 +1,1018 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import random
+import shutil
+import smtplib
+import sqlite3
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.mail.backends import locmem
+from django.db import connection, router
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from centers.models import Center, Subject
+from education_system.reporting_db import (
+    PRIMARY, ReportingSource, _sources, choose_source, refresh_snapshot, reporting_reads, snapshot_taken_at,
+)
+from education_system.instrumentation import ViewBudgetExceeded, registry
+from education_system.sqlite import connection_pragmas, current_pragmas
+from students.imports import import_students, read_rows
+from students.models import Attendance, Grade, Student
+from students.signals import attendance_bulk_written
+from .cohorts import cohort_outcomes, periods_to_refresh, refresh_cohort_tables
+from .delivery import deliver_report, parse_recipients
+from .jobs import claim_next_report, enqueue_report, requeue_stale_reports, run_worker
+from .pdf import PdfReader, paginate_rows, render_report_pdf
+from .models import CohortPeriod, CohortSummary, DataChange, Report, ReportArtifact, ReportSchedule
+from .risk import assess_risk, numpy
+from .scheduler import claim_due_schedules, next_due, report_period, run_due_schedules
+from .signals import last_data_change
+from .views import generate_report_file
+
+# Tables that grow with usage; a plain "SCAN <table>" on any of them is a regression
+HOT_TABLES = [
+    'students_attendance',
+    'students_grade',
+    'students_student',
+    'students_dailyattendancesummary',
+    'reports_report',
+]
+
+
+TEST_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, REPORT_CACHE_ENABLED=False, REPORT_RENDER_WORKERS=1)
+class QueryPlanTests(TestCase):
+    """Hot queries must be answered through indexes rather than full table scans"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='coordinator')
+        cls.center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=cls.user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        cls.subject = Subject.objects.create(name='Mathematics', code='MATH')
+        today = date.today()
+        for n in range(5):
+            student = Student.objects.create(
+                student_id=f'S{n:03d}', first_name=f'First{n}', last_name=f'Last{n}',
+                date_of_birth=date(2012, 1, 1), gender='F', center=cls.center,
+                guardian_name='Guardian', guardian_phone='0000000000',
+            )
+            for offset in range(3):
+                Attendance.objects.create(student=student, date=today - timedelta(days=offset),
+                                          is_present=offset != 1)
+            Grade.objects.create(student=student, subject=cls.subject, assessment_date=today,
+                                 marks_obtained=70, total_marks=100, grade_letter='B')
+
+    def assertUsesIndexes(self, queries):
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                for table in HOT_TABLES:
+                    if step.startswith(f'SCAN {table}') and 'INDEX' not in step:
+                        self.fail(f'Full scan of {table}:\n{sql}\n' + '\n'.join(plan))
+
+    def assertViewUsesIndexes(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertUsesIndexes(context.captured_queries)
+
+    def test_dashboard(self):
+        self.assertViewUsesIndexes(reverse('dashboard'))
+
+    def test_reports_dashboard(self):
+        self.assertViewUsesIndexes(reverse('reports'))
+
+    def test_center_detail(self):
+        self.assertViewUsesIndexes(reverse('center_detail', args=[self.center.id]))
+
+    def test_student_list(self):
+        self.assertViewUsesIndexes(reverse('student_list'))
+        self.assertViewUsesIndexes(reverse('student_list') + f'?center={self.center.id}')
+
+    def test_grade_list(self):
+        self.assertViewUsesIndexes(reverse('grade_list'))
+        self.assertViewUsesIndexes(reverse('grade_list') + f'?center={self.center.id}&after={date.today().isoformat()}_99')
+        self.assertViewUsesIndexes(reverse('grade_list') + f'?subject={self.subject.id}&date_from=2020-01-01')
+        self.assertViewUsesIndexes(reverse('grade_list') + '?student=S001')
+
+    def test_report_list(self):
+        self.client.force_login(self.user)
+        self.assertViewUsesIndexes(reverse('report_list'))
+
+    def test_report_generators(self):
+        for report_type, _ in Report.REPORT_TYPES:
+            with self.subTest(report_type=report_type):
+                report = Report.objects.create(
+                    title=f'{report_type} report', report_type=report_type, generated_by=self.user,
+                    date_from=date.today() - timedelta(days=30), date_to=date.today(),
+                )
+                report.centers.add(self.center)
+                with CaptureQueriesContext(connection) as context:
+                    generate_report_file(report)
+                self.assertEqual(report.status, 'completed')
+                self.assertUsesIndexes(context.captured_queries)
+
+
+class ChunkedPdfTests(SimpleTestCase):
+    """Rendering chunks in a process pool gives the same document as rendering them in-process"""
+
+    def chunks(self):
+        header = {'title': 'NGO Education System', 'subtitle': 'Center Performance Report',
+                  'period': '2025-01-01 to 2025-01-31', 'generated_on': '2025-02-01 09:00'}
+        rows = [(f'Center {n}', 'Mumbai', n, 100, float(n), 90.0) for n in range(80)]
+        pages = paginate_rows(rows)
+        chunks = [('center_table', {'header': header if index == 0 else None, 'rows': page,
+                                    'totals': None}) for index, page in enumerate(pages)]
+        days = [(f'2025-01-{day:02}', 9, 1, 10) for day in range(1, 32)]
+        chunks += [('attendance_center', {'name': f'Center {n}', 'location': 'Mumbai', 'days': days, 'totals': {
+            'total_records': 310, 'present_records': 279, 'absent_records': 31, 'attendance_rate': 90.0,
+        }}) for n in range(3)]
+        return chunks
+
+    def pages(self, pdf):
+        return [page.extract_text() for page in PdfReader(io.BytesIO(pdf)).pages]
+
+    def test_pool_matches_in_process(self):
+        if PdfReader is None:
+            self.skipTest('pypdf is not installed')
+        chunks = self.chunks()
+        serial = render_report_pdf(chunks, workers=1)
+        pooled = render_report_pdf(chunks, workers=3)
+        self.assertEqual(len(self.pages(serial)), len(chunks))
+        self.assertEqual(self.pages(pooled), self.pages(serial))
+        self.assertIn('Center 79', self.pages(serial)[2])
+        self.assertEqual(pooled, serial)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, REPORT_CACHE_ENABLED=False, REPORT_RENDER_WORKERS=1)
+class ReportQueueTests(TestCase):
+    """Queued reports are claimed by one worker, rendered, and retried a bounded number of times"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='coordinator')
+        cls.center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=cls.user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+
+    def failing_render(self):
+        return mock.patch('reports.views.generate_report_file', side_effect=ValueError('No centers to report on'))
+
+    def queue(self, title='Centers'):
+        report = Report.objects.create(title=title, report_type='center', generated_by=self.user,
+                                       date_from=date(2025, 1, 1), date_to=date(2025, 1, 31))
+        enqueue_report(report)
+        return report
+
+    def test_claim_and_run(self):
+        first, second = self.queue('First'), self.queue('Second')
+        claimed = claim_next_report('worker-1')
+        self.assertEqual((claimed.id, claimed.status, claimed.worker_id, claimed.attempts),
+                         (first.id, 'generating', 'worker-1', 1))
+        # The next claim skips the report already taken
+        self.assertEqual(claim_next_report('worker-2').id, second.id)
+        self.assertIsNone(claim_next_report('worker-3'))
+
+        Report.objects.update(status='pending')
+        self.assertEqual(run_worker('worker-1', once=True), 2)
+        self.assertEqual(set(Report.objects.values_list('status', flat=True)), {'completed'})
+
+    def test_failure_is_recorded(self):
+        report = self.queue()
+        with self.failing_render(), self.assertLogs('reports.jobs', 'ERROR'):
+            self.assertEqual(run_worker('worker-1', once=True), 1)
+        report.refresh_from_db()
+        self.assertEqual((report.status, report.error_message), ('failed', 'No centers to report on'))
+
+    @override_settings(REPORT_QUEUE_EAGER=True)
+    def test_eager_failure_message(self):
+        self.client.force_login(self.user)
+        with self.failing_render(), self.assertLogs('reports.jobs', 'ERROR'):
+            response = self.client.post(reverse('generate_report'), {
+                'title': 'Centers', 'report_type': 'center', 'date_from': '2025-01-01', 'date_to': '2025-01-31',
+            })
+        messages = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertEqual(messages, ['❌ Error generating report: No centers to report on'])
+        self.assertEqual(Report.objects.get().attempts, 1)
+
+    def test_stale_reports_are_requeued_then_failed(self):
+        report = self.queue()
+        for attempt in range(1, 4):
+            self.assertEqual(claim_next_report('crashed').attempts, attempt)
+            Report.objects.filter(id=report.id).update(started_at=timezone.now() - timedelta(hours=1))
+            # Not stale yet with a longer timeout
+            self.assertEqual(requeue_stale_reports(timeout=2 * 60 * 60, max_attempts=3), (0, 0))
+            if attempt < 3:
+                self.assertEqual(requeue_stale_reports(timeout=60, max_attempts=3), (1, 0))
+        with self.assertLogs('reports.jobs', 'ERROR'):
+            self.assertEqual(requeue_stale_reports(timeout=60, max_attempts=3), (0, 1))
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'failed')
+        self.assertIn('3 attempts', report.error_message)
+
+        # Queueing it again starts the count afresh
+        enqueue_report(report)
+        self.assertEqual(claim_next_report('worker-1').attempts, 1)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, REPORT_CACHE_ENABLED=False, REPORT_RENDER_WORKERS=1)
+class SchedulerTests(TestCase):
+    """Due schedules are claimed once, generated and emailed, then moved to their next period"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='coordinator')
+        cls.center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=cls.user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        cls.schedule = ReportSchedule.objects.create(
+            name='Monthly attendance', report_type='attendance', frequency='monthly',
+            recipients='a@example.com, b@example.com', created_by=cls.user,
+        )
+        cls.schedule.centers.add(cls.center)
+
+    def make_due(self):
+        ReportSchedule.objects.filter(id=self.schedule.id).update(next_run_at=timezone.now() - timedelta(hours=1))
+
+    def test_new_schedule_waits_for_next_period(self):
+        today = timezone.localdate()
+        first = date(today.year + today.month // 12, today.month % 12 + 1, 1)
+        self.assertEqual(timezone.localdate(self.schedule.next_run_at), first)
+        self.assertEqual(run_due_schedules(worker_id='test', concurrency=1), 0)
+
+    def test_due_schedule_is_generated_and_emailed(self):
+        self.make_due()
+        self.assertEqual(run_due_schedules(worker_id='test', concurrency=1), 1)
+
+        self.schedule.refresh_from_db()
+        self.assertIsNotNone(self.schedule.last_run)
+        self.assertEqual(self.schedule.next_run_at, next_due(self.schedule, self.schedule.last_run))
+        self.assertEqual(self.schedule.locked_by, '')
+        report = Report.objects.get(generated_by=self.user)
+        self.assertEqual(report.status, 'completed')
+        self.assertEqual((report.date_from, report.date_to), report_period('monthly', self.schedule.last_run))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['a@example.com', 'b@example.com'])
+        self.assertEqual(mail.outbox[0].attachments[0][2], 'application/pdf')
+
+        # Not due again until next month
+        self.assertEqual(run_due_schedules(worker_id='test', concurrency=1), 0)
+
+    def test_runs_follow_calendar_periods(self):
+        def at(*args):
+            return datetime(*args, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(report_period('monthly', at(2025, 3, 1, 0, 5)), (date(2025, 2, 1), date(2025, 2, 28)))
+        self.assertEqual(report_period('quarterly', at(2025, 5, 20)), (date(2025, 1, 1), date(2025, 3, 31)))
+        self.assertEqual(report_period('weekly', at(2025, 3, 5)), (date(2025, 2, 24), date(2025, 3, 2)))
+        self.assertEqual(report_period('daily', at(2025, 3, 5, 23)), (date(2025, 3, 4), date(2025, 3, 4)))
+
+        # A late run does not move the next one off the period boundary
+        self.assertEqual(next_due(self.schedule, at(2025, 3, 4, 10)), at(2025, 4, 1))
+        self.schedule.frequency = 'weekly'
+        self.assertEqual(next_due(self.schedule, at(2025, 3, 5, 10)), at(2025, 3, 10))
+
+    def test_claimed_schedule_is_not_claimed_twice(self):
+        self.make_due()
+        self.assertEqual(len(claim_due_schedules('first', limit=5)), 1)
+        self.assertEqual(claim_due_schedules('second', limit=5), [])
+
+    def test_stale_claim_is_released(self):
+        self.make_due()
+        ReportSchedule.objects.filter(id=self.schedule.id).update(
+            locked_by='crashed', locked_at=timezone.now() - timedelta(days=1),
+        )
+        self.assertEqual(len(claim_due_schedules('second', limit=5)), 1)
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """locmem backend that counts connections and fails the first `failures` sends with `error`"""
+    connections = 0
+    failures = 0
+    error = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        FlakyEmailBackend.connections += 1
+
+    def send_messages(self, messages):
+        if FlakyEmailBackend.failures:
+            FlakyEmailBackend.failures -= 1
+            raise FlakyEmailBackend.error or smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        return super().send_messages(messages)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, EMAIL_BACKEND='reports.tests.FlakyEmailBackend',
+                   REPORT_EMAIL_RETRY_BACKOFF=0)
+class DeliveryTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        FlakyEmailBackend.connections = 0
+        FlakyEmailBackend.failures = 0
+        FlakyEmailBackend.error = None
+        self.report = Report.objects.create(
+            title='Monthly attendance', report_type='attendance',
+            generated_by=User.objects.create(username='coordinator'),
+            date_from=date(2025, 1, 1), date_to=date(2025, 1, 31), status='completed',
+        )
+        self.report.file_path.save('monthly.pdf', ContentFile(b'%PDF-1.4 test'), save=True)
+
+    def test_parse_recipients_dedupes_and_rejects_invalid(self):
+        valid, invalid = parse_recipients('a@example.com, B@example.com;b@example.com\nnot-an-email,, a@EXAMPLE.com')
+        self.assertEqual(valid, ['a@example.com', 'B@example.com'])
+        self.assertEqual(invalid, ['not-an-email'])
+
+    def test_one_connection_per_batch(self):
+        recipients = [f'user{n}@example.com' for n in range(5)]
+        result = deliver_report(self.report, recipients, 'Subject', 'Body', batch_size=2)
+
+        self.assertEqual(result, {'sent': 5, 'failed': 0, 'errors': []})
+        self.assertEqual(FlakyEmailBackend.connections, 3)
+        self.assertEqual([message.to for message in mail.outbox], [[recipient] for recipient in recipients])
+        self.assertTrue(all(message.attachments[0][1] == b'%PDF-1.4 test' for message in mail.outbox))
+
+    def test_transient_failure_is_retried(self):
+        FlakyEmailBackend.failures = 2
+        result = deliver_report(self.report, ['a@example.com', 'b@example.com'], 'Subject', 'Body')
+        self.assertEqual(result['sent'], 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_gives_up_after_max_retries(self):
+        FlakyEmailBackend.failures = 10
+        result = deliver_report(self.report, ['a@example.com'], 'Subject', 'Body', max_retries=2)
+        self.assertEqual(result['sent'], 0)
+        self.assertEqual(result['failed'], 1)
+        self.assertEqual(mail.outbox, [])
+
+    def deliver_with_error(self, error):
+        FlakyEmailBackend.failures = 1
+        FlakyEmailBackend.error = error
+        with mock.patch('reports.delivery.time.sleep') as sleep:
+            result = deliver_report(self.report, ['a@example.com', 'b@example.com'], 'Subject', 'Body')
+        return result, sleep.call_count
+
+    def test_temporary_reply_is_retried(self):
+        result, sleeps = self.deliver_with_error(smtplib.SMTPSenderRefused(451, b'Try again later', 'reports@x'))
+        self.assertEqual((result['sent'], result['failed'], sleeps), (2, 0, 1))
+
+    def test_rejected_message_is_skipped(self):
+        with self.assertLogs('reports.delivery', 'ERROR'):
+            result, sleeps = self.deliver_with_error(smtplib.SMTPDataError(554, b'Message rejected'))
+        self.assertEqual((result['sent'], result['failed'], sleeps), (1, 1, 0))
+        self.assertEqual(result['errors'][0][0], 'a@example.com')
+        self.assertEqual([message.to for message in mail.outbox], [['b@example.com']])
+
+    def test_permanent_error_fails_batch_at_once(self):
+        with self.assertLogs('reports.delivery', 'ERROR'):
+            result, sleeps = self.deliver_with_error(smtplib.SMTPAuthenticationError(535, b'Bad credentials'))
+        self.assertEqual((result['sent'], result['failed'], sleeps), (0, 2, 0))
+        self.assertEqual(mail.outbox, [])
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, REPORT_CACHE_ENABLED=True, REPORT_RENDER_WORKERS=1)
+class ReportCacheTests(TestCase):
+    """Identical reports share a cached file but keep their own generation time; changes retire it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='coordinator')
+        cls.center, cls.other_center = [
+            Center.objects.create(name=name, location='Mumbai', coordinator=cls.user,
+                                  established_date=date(2020, 1, 1), capacity=100)
+            for name in ('Central Learning Hub', 'North Learning Hub')
+        ]
+        cls.student = Student.objects.create(
+            student_id='S1', first_name='Asha', last_name='Rao', date_of_birth=date(2012, 1, 1),
+            gender='F', center=cls.center, guardian_name='Guardian', guardian_phone='0000000000',
+        )
+        cls.subject = Subject.objects.create(name='Mathematics', code='MATH')
+
+    def setUp(self):
+        if PdfReader is None:
+            self.skipTest('pypdf is not installed')
+
+    def generate(self, report_type='center', generated_at=None, title='January'):
+        report = Report.objects.create(title=title, report_type=report_type, generated_by=self.user,
+                                       date_from=date(2025, 1, 1), date_to=date(2025, 1, 31))
+        report.centers.add(self.center)
+        with mock.patch('django.utils.timezone.now', return_value=generated_at or timezone.now()):
+            generate_report_file(report)
+        with report.file_path.open('rb') as f:
+            return PdfReader(f).pages[0].extract_text()
+
+    def test_cache_hit_keeps_its_own_generation_time(self):
+        first = self.generate(generated_at=datetime(2025, 2, 1, 9, 0, tzinfo=dt_timezone.utc))
+        second = self.generate(generated_at=datetime(2025, 2, 3, 17, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(ReportArtifact.objects.get().hits, 1)
+        self.assertIn('Generated on: February 01, 2025 at 09:00 AM', first)
+        self.assertIn('Generated on: February 03, 2025 at 05:30 PM', second)
+        self.assertEqual(first.replace('February 01, 2025 at 09:00 AM', ''),
+                         second.replace('February 03, 2025 at 05:30 PM', ''))
+
+    def test_cache_hit_keeps_its_own_title(self):
+        first = self.generate(title='January centers')
+        second = self.generate(title='Board pack: centers')
+        self.assertEqual(ReportArtifact.objects.get().hits, 1)
+        self.assertIn('January centers', first)
+        self.assertNotIn('January centers', second)
+        self.assertIn('Board pack: centers', second)
+
+    def test_long_date_batches_use_their_span(self):
+        self.generate()
+        self.generate(report_type='attendance')
+        days = [date(2022, 1, 1) + timedelta(days=n) for n in range(1500)]
+        attendance_bulk_written.send(sender=Attendance, dates=days[:800])
+        self.assertEqual(ReportArtifact.objects.count(), 2)
+        attendance_bulk_written.send(sender=Attendance, dates=days)
+        self.assertFalse(ReportArtifact.objects.exists())
+
+    def test_grade_date_change_retires_the_old_date(self):
+        grade = Grade.objects.create(student=self.student, subject=self.subject, assessment_date=date(2025, 1, 10),
+                                     marks_obtained=80, total_marks=100, grade_letter='A')
+        self.generate('academic')
+        grade = Grade.objects.get(id=grade.id)
+        grade.assessment_date = date(2025, 3, 10)
+        grade.save()
+        self.assertFalse(ReportArtifact.objects.exists())
+
+    def test_roster_change_retires_only_its_centers(self):
+        self.generate()
+        Student.objects.create(
+            student_id='S2', first_name='Ravi', last_name='Kumar', date_of_birth=date(2012, 1, 1),
+            gender='M', center=self.other_center, guardian_name='Guardian', guardian_phone='0000000000',
+        )
+        self.other_center.save()
+        self.assertTrue(ReportArtifact.objects.exists())
+
+        self.student.first_name = 'Asha K.'
+        self.student.save()
+        self.assertFalse(ReportArtifact.objects.exists())
+
+
+class SummaryStalenessTests(TestCase):
+    """Data changes mark only the summaries of reports covering their dates and centers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='coordinator')
+        cls.center, cls.other_center = [
+            Center.objects.create(name=name, location='Mumbai', coordinator=cls.user,
+                                  established_date=date(2020, 1, 1), capacity=100)
+            for name in ('Central Learning Hub', 'North Learning Hub')
+        ]
+        cls.reports = {}
+        for name, month, center in [('january', 1, cls.center), ('february', 2, None),
+                                    ('january_other', 1, cls.other_center), ('april', 4, cls.center)]:
+            report = Report.objects.create(
+                title=name, report_type='center', generated_by=cls.user, status='completed',
+                date_from=date(2025, month, 1), date_to=date(2025, month, 28), summary_data={'total_centers': 1},
+            )
+            if center:
+                report.centers.add(center)
+            cls.reports[name] = report
+
+    def stale(self):
+        return set(Report.objects.filter(summary_stale=True).values_list('title', flat=True))
+
+    def test_dates_are_marked_in_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            attendance_bulk_written.send(sender=Attendance, dates=[date(2025, 1, 6), date(2025, 1, 7), date(2025, 2, 3)])
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "reports_report"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.stale(), {'january', 'february', 'january_other'})
+
+    def test_roster_change_marks_its_centers(self):
+        Student.objects.create(
+            student_id='S1', first_name='Asha', last_name='Rao', date_of_birth=date(2012, 1, 1),
+            gender='F', center=self.center, guardian_name='Guardian', guardian_phone='0000000000',
+        )
+        self.assertEqual(self.stale(), {'january', 'february', 'april'})
+
+    def test_import_marks_its_centers(self):
+        result = import_students(read_rows(io.StringIO(
+            'student_id,first_name,last_name,date_of_birth,gender,center,guardian_name,guardian_phone\n'
+            'S1,Asha,Rao,2012-01-01,F,North Learning Hub,Guardian,0000000000\n'
+        )))
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(self.stale(), {'february', 'january_other'})
+
+
+@override_settings(VIEW_BUDGET_ACTION='raise')
+class CsvExportTests(TestCase):
+    """CSV exports stream their rows, and the queries producing them count against the view's budget"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='coordinator')
+        center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        student = Student.objects.create(
+            student_id='S1', first_name='Asha', last_name='Rao', date_of_birth=date(2012, 1, 1),
+            gender='F', center=center, guardian_name='Guardian', guardian_phone='0000000000',
+        )
+        other = Center.objects.create(
+            name='North Learning Hub', location='Pune', coordinator=user,
+            established_date=date(2020, 1, 1), capacity=50,
+        )
+        Attendance.objects.create(student=student, date=date(2025, 1, 6), is_present=True)
+        Attendance.objects.create(student=student, date=date(2025, 1, 7), is_present=False, remarks='Ill, at home')
+        Attendance.objects.create(student=student, date=date(2025, 2, 3), is_present=True)
+        Grade.objects.create(student=student, subject=Subject.objects.create(name='Mathematics', code='MATH'),
+                             assessment_date=date(2025, 1, 10), marks_obtained=45, total_marks=60, grade_letter='B')
+        cls.reports = {
+            report_type: Report.objects.create(
+                title=f'January {report_type}', report_type=report_type, generated_by=user, status='completed',
+                date_from=date(2025, 1, 1), date_to=date(2025, 1, 31),
+            )
+            for report_type in ('attendance', 'academic', 'center')
+        }
+        cls.reports['center'].centers.set([center, other])
+        cls.report = cls.reports['attendance']
+
+    def setUp(self):
+        registry.reset()
+
+    def test_streamed_queries_are_measured(self):
+        response = self.client.get(reverse('export_report_csv', args=[self.report.id]))
+        # Nothing is recorded until the body has been sent
+        self.assertNotIn('export_report_csv', registry.snapshot())
+        with CaptureQueriesContext(connection) as streamed:
+            body = b''.join(response.streaming_content)
+        self.assertIn(b'Central Learning Hub', body)
+
+        totals = registry.snapshot()['export_report_csv']
+        self.assertGreater(len(streamed), 0)
+        self.assertGreater(totals['queries'], len(streamed))
+        self.assertEqual(totals['response_bytes'], len(body))
+        self.assertEqual(totals['over_budget'], 0)
+
+    def export(self, report_type):
+        response = self.client.get(reverse('export_report_csv', args=[self.reports[report_type].id]))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_csv_content(self):
+        self.assertEqual(self.export('attendance'), [
+            ['Student Name', 'Center', 'Date', 'Status', 'Remarks'],
+            ['Asha Rao', 'Central Learning Hub', '2025-01-06', 'Present', ''],
+            ['Asha Rao', 'Central Learning Hub', '2025-01-07', 'Absent', 'Ill, at home'],
+        ])
+        self.assertEqual(self.export('academic'), [
+            ['Student ID', 'Student Name', 'Center', 'Subject', 'Assessment Date',
+             'Marks Obtained', 'Total Marks', 'Percentage', 'Grade'],
+            ['S1', 'Asha Rao', 'Central Learning Hub', 'Mathematics', '2025-01-10', '45', '60', '75.0', 'B'],
+        ])
+        self.assertEqual(self.export('center'), [
+            ['Center Name', 'Location', 'Students', 'Capacity', 'Utilization (%)',
+             'Attendance Records', 'Present', 'Absent', 'Attendance Rate (%)'],
+            ['Central Learning Hub', 'Mumbai', '1', '100', '1.0', '2', '1', '1', '50.0'],
+            ['North Learning Hub', 'Pune', '0', '50', '0.0', '0', '0', '0', '0.0'],
+        ])
+
+    def test_streamed_queries_count_against_budget(self):
+        response = self.client.get(reverse('export_report_csv', args=[self.report.id]))
+        # The view itself only loads the report
+        with override_settings(VIEW_BUDGETS={'export_report_csv': {'queries': 1}}):
+            with self.assertRaisesMessage(ViewBudgetExceeded, 'queries'):
+                b''.join(response.streaming_content)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class DownloadTests(TestCase):
+    """Report downloads stream from storage with validators, conditional requests and ranges"""
+
+    content = bytes(range(256)) * 1024
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.report = Report.objects.create(
+            title='Monthly attendance', report_type='attendance',
+            generated_by=User.objects.create(username='coordinator'),
+            date_from=date(2025, 1, 1), date_to=date(2025, 1, 31), status='completed',
+        )
+        self.report.file_path.save('monthly.pdf', ContentFile(self.content), save=True)
+        self.url = reverse('download_report', args=[self.report.id])
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+
+    def test_conditional_request(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-70999')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-70999/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[1000:71000])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_stale_if_range_gets_full_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(REPORT_DOWNLOAD_OFFLOAD='x-accel-redirect', REPORT_DOWNLOAD_ACCEL_PREFIX='/protected/')
+    def test_accel_redirect_offload(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/{self.report.file_path.name}')
+        self.assertEqual(response.content, b'')
+
+
+class RiskTests(TestCase):
+    """The risk engine ranks students by their attendance and grade signals"""
+
+    date_from = date(2025, 3, 1)
+    date_to = date(2025, 3, 30)
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='coordinator')
+        center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        maths = Subject.objects.create(name='Mathematics', code='MATH')
+        science = Subject.objects.create(name='Science', code='SCI')
+
+        def student(code):
+            return Student.objects.create(
+                student_id=code, first_name=code, last_name='Student', date_of_birth=date(2012, 1, 1),
+                gender='F', center=center, guardian_name='Guardian', guardian_phone='0000000000',
+            )
+
+        cls.steady = student('STEADY')
+        cls.drifting = student('DRIFTING')
+        cls.struggling = student('STRUGGLING')
+        for offset in range(30):
+            day = cls.date_from + timedelta(days=offset)
+            Attendance.objects.create(student=cls.steady, date=day, is_present=True)
+            # Present for three weeks, then absent every day
+            Attendance.objects.create(student=cls.drifting, date=day, is_present=offset < 21)
+            Attendance.objects.create(student=cls.struggling, date=day, is_present=offset % 4 != 0)
+        for offset, marks in [(2, 80), (12, 60), (25, 35)]:
+            Grade.objects.create(student=cls.struggling, subject=maths, marks_obtained=marks, total_marks=100,
+                                 assessment_date=cls.date_from + timedelta(days=offset), grade_letter='C')
+        Grade.objects.create(student=cls.struggling, subject=science, marks_obtained=20, total_marks=100,
+                             assessment_date=cls.date_from + timedelta(days=20), grade_letter='F')
+        Grade.objects.create(student=cls.steady, subject=maths, marks_obtained=90, total_marks=100,
+                             assessment_date=cls.date_from + timedelta(days=10), grade_letter='A')
+
+    def test_ranking_and_signals(self):
+        result = assess_risk(self.date_from, self.date_to, levels=('high', 'medium', 'low'), engine='python')
+        self.assertEqual(result['students_assessed'], 3)
+        ranked = [student['student_id'] for student in result['students']]
+        self.assertEqual(ranked[-1], 'STEADY')
+
+        drifting = next(student for student in result['students'] if student['student_id'] == 'DRIFTING')
+        self.assertEqual(drifting['absence_streak'], 9)
+        self.assertEqual(drifting['attendance_rate_30'], 70.0)
+        self.assertLess(drifting['attendance_trend_30'], 0)
+        self.assertIn('Absent 9 days running', drifting['factors'])
+
+        struggling = next(student for student in result['students'] if student['student_id'] == 'STRUGGLING')
+        self.assertEqual(struggling['failing_subjects'], ['Science'])
+        self.assertLess(struggling['grade_trend'], 0)
+
+        steady = result['students'][-1]
+        self.assertEqual((steady['score'], steady['level'], steady['factors']), (0.0, 'low', []))
+
+    def test_engines_agree(self):
+        if numpy is None:
+            self.skipTest('NumPy is not installed')
+        for centers in (None, list(Center.objects.all())):
+            python = assess_risk(self.date_from, self.date_to, centers=centers, levels=('high', 'medium', 'low'),
+                                 engine='python')
+            vectorized = assess_risk(self.date_from, self.date_to, centers=centers,
+                                     levels=('high', 'medium', 'low'), engine='numpy')
+            self.assertEqual(vectorized, dict(python, engine='numpy'))
+
+    def test_engines_agree_on_gaps(self):
+        # Irregular records across a month boundary, a period longer than the shortest window and a
+        # student with no records at all: the cases where the two engines' bookkeeping differs most
+        if numpy is None:
+            self.skipTest('NumPy is not installed')
+        center = Center.objects.get()
+        subject = Subject.objects.get(code='MATH')
+        rng = random.Random(7)
+        for n in range(6):
+            student = Student.objects.create(
+                student_id=f'GAPS{n}', first_name='Gaps', last_name=str(n), date_of_birth=date(2012, 1, 1),
+                gender='M', center=center, guardian_name='Guardian', guardian_phone='0000000000',
+            )
+            for offset in range(0, 70, n + 1):
+                Attendance.objects.create(student=student, date=date(2025, 1, 25) + timedelta(days=offset),
+                                          is_present=rng.random() < 0.2 * n)
+            for offset in range(n):
+                Grade.objects.create(student=student, subject=subject, marks_obtained=rng.randint(0, 50),
+                                     total_marks=50, assessment_date=date(2025, 2, 12) + timedelta(days=9 * offset),
+                                     grade_letter='C')
+
+        levels = ('high', 'medium', 'low')
+        python = assess_risk(date(2025, 2, 10), self.date_to, levels=levels, engine='python')
+        vectorized = assess_risk(date(2025, 2, 10), self.date_to, levels=levels, engine='numpy')
+        self.assertEqual(python['students_assessed'], 9)
+        self.assertEqual({student['student_id']: student['score'] for student in vectorized['students']},
+                         {student['student_id']: student['score'] for student in python['students']})
+        self.assertEqual(vectorized, dict(python, engine='numpy'))
+
+    def test_json_endpoint(self):
+        response = self.client.get(reverse('risk_assessment'), {
+            'date_from': self.date_from.isoformat(), 'date_to': self.date_to.isoformat(), 'level': 'high',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['students_assessed'], 3)
+        self.assertTrue(all(student['level'] == 'high' for student in response.json()['students']))
+
+        self.assertEqual(self.client.get(reverse('risk_assessment'), {'date_to': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('risk_assessment'), {'level': 'severe'}).status_code, 400)
+
+
+@override_settings(REPORT_CACHE_ENABLED=False)
+class CohortTests(TestCase):
+    """Cohort tables are refreshed incrementally and feed the donor report"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='coordinator')
+        cls.center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=cls.user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        cls.other_center = Center.objects.create(
+            name='North Learning Hub', location='Pune', coordinator=cls.user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        subject = Subject.objects.create(name='Mathematics', code='MATH')
+
+        def student(code, enrolled):
+            created = Student.objects.create(
+                student_id=code, first_name=code, last_name='Student', date_of_birth=date(2012, 1, 1),
+                gender='F', center=cls.center, guardian_name='Guardian', guardian_phone='0000000000',
+            )
+            # enrollment_date is auto_now_add
+            Student.objects.filter(id=created.id).update(enrollment_date=enrolled)
+            return created
+
+        cls.early = student('EARLY', date(2024, 11, 20))
+        cls.late = student('LATE', date(2025, 1, 10))
+        student('NEVER', date(2024, 12, 1))
+        for day in (date(2025, 1, 15), date(2025, 1, 16), date(2025, 2, 3), date(2025, 2, 4)):
+            Attendance.objects.create(student=cls.early, date=day, is_present=day.day != 16)
+        Attendance.objects.create(student=cls.late, date=date(2025, 2, 3), is_present=True)
+        Grade.objects.create(student=cls.early, subject=subject, marks_obtained=30, total_marks=50,
+                             assessment_date=date(2025, 2, 10), grade_letter='C')
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_refresh_and_outcomes(self):
+        result = refresh_cohort_tables()
+        self.assertEqual(result['periods'], [date(2025, 1, 1), date(2025, 2, 1)])
+        self.assertEqual(CohortSummary.objects.count(), 3)
+
+        outcomes = cohort_outcomes(date(2025, 1, 1), date(2025, 2, 28))
+        self.assertEqual(outcomes['totals']['enrolled'], 3)
+        q4, q1 = outcomes['cohorts']
+        self.assertEqual((q4['label'], q4['enrolled'], q1['label'], q1['enrolled']), ('2024 Q4', 2, '2025 Q1', 1))
+        january, february = q4['periods']
+        self.assertEqual((january['active_students'], january['retention'], january['attendance_rate']),
+                         (1, 50.0, 50.0))
+        self.assertEqual((february['attendance_rate'], february['grade_average']), (100.0, 60.0))
+        self.assertEqual(q4['attendance_change'], 50.0)
+        self.assertIsNone(q1['periods'][0]['attendance_rate'])
+        self.assertEqual(q1['retention'], 100.0)
+
+        self.assertEqual(cohort_outcomes(date(2025, 1, 1), date(2025, 2, 28),
+                                         centers=[self.other_center])['cohorts'], [])
+
+    def test_incremental_refresh(self):
+        refresh_cohort_tables()
+        # Closed months refreshed after they ended are left alone
+        self.assertEqual(periods_to_refresh(), [])
+        self.assertEqual(len(periods_to_refresh(full=True)), 2)
+
+        Attendance.objects.create(student=self.late, date=date(2025, 2, 4), is_present=False)
+        self.assertEqual(periods_to_refresh(), [date(2025, 2, 1)])
+        self.assertEqual(refresh_cohort_tables()['periods'], [date(2025, 2, 1)])
+        self.assertIsNone(CohortPeriod.objects.get(period=date(2025, 2, 1)).stale_since)
+        q1 = cohort_outcomes(date(2025, 2, 1), date(2025, 2, 28))['cohorts'][1]
+        self.assertEqual(q1['attendance_rate'], 50.0)
+
+        # A transfer moves the student's months to the other center's rows
+        self.late.center = self.other_center
+        self.late.save()
+        self.assertEqual(periods_to_refresh(), [date(2025, 2, 1)])
+        refresh_cohort_tables()
+        self.assertTrue(CohortSummary.objects.filter(center=self.other_center, period=date(2025, 2, 1)).exists())
+
+    def test_reenrollment_and_delete_restate_cohorts(self):
+        refresh_cohort_tables()
+        early = Student.objects.get(id=self.early.id)
+        early.enrollment_date = date(2024, 12, 31)
+        early.save()
+        # Same quarter, same cohort
+        self.assertEqual(periods_to_refresh(), [])
+
+        early.enrollment_date = date(2025, 1, 2)
+        early.save()
+        self.assertEqual(periods_to_refresh(), [date(2025, 1, 1), date(2025, 2, 1)])
+        refresh_cohort_tables()
+        q4, q1 = cohort_outcomes(date(2025, 1, 1), date(2025, 2, 28))['cohorts']
+        self.assertEqual((q4['enrolled'], q1['enrolled']), (1, 2))
+        self.assertFalse(CohortSummary.objects.filter(cohort=date(2024, 10, 1)).exists())
+
+        Student.objects.get(id=self.late.id).delete()
+        self.assertEqual(periods_to_refresh(), [date(2025, 2, 1)])
+
+    def test_donor_report(self):
+        refresh_cohort_tables()
+        report = Report.objects.create(
+            title='Impact', report_type='donor', generated_by=self.user,
+            date_from=date(2025, 1, 1), date_to=date(2025, 2, 28),
+        )
+        generate_report_file(report)
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'completed')
+        with report.file_path.open('rb') as f:
+            self.assertTrue(f.read().startswith(b'%PDF'))
+        self.assertEqual([cohort['label'] for cohort in report.summary_data['cohorts']], ['2024 Q4', '2025 Q1'])
+        self.assertNotIn('periods', report.summary_data['cohorts'][0])
+
+        response = self.client.get(reverse('cohort_analytics'), {
+            'date_from': '2025-01-01', 'date_to': '2025-02-28', 'center': self.center.id,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '2024 Q4')
+
+
+class ReportingSnapshotTests(TransactionTestCase):
+    """Reporting reads use a fresh snapshot of the primary, and fall back to it otherwise"""
+
+    # The online backup cannot copy a database with a transaction open on it,
+    # so these tests commit their data instead of running inside TestCase's
+    def setUp(self):
+        self.user = User.objects.create(username='coordinator')
+        self.center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=self.user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        Student.objects.create(
+            student_id='S1', first_name='Asha', last_name='Rao', date_of_birth=date(2012, 1, 1),
+            gender='F', center=self.center, guardian_name='Guardian', guardian_phone='0000000000',
+        )
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'reporting.sqlite3')
+        override = override_settings(REPORTING_SNAPSHOT_PATH=self.path, MEDIA_ROOT=directory)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_refresh_copies_primary(self):
+        self.assertIsNone(snapshot_taken_at())
+        result = refresh_snapshot()
+        self.assertAlmostEqual(snapshot_taken_at().timestamp(), result['taken_at'].timestamp(), places=3)
+        self.assertFalse(os.path.exists(f'{self.path}.tmp'))
+        copy = sqlite3.connect(self.path)
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.execute('SELECT COUNT(*) FROM students_student').fetchone(), (1,))
+
+    def test_router(self):
+        report = Report.objects.create(title='Centers', report_type='center', generated_by=self.user,
+                                       date_from=date(2025, 1, 1), date_to=date(2025, 1, 31))
+        # Tests mirror the primary, so even a fresh snapshot is not read
+        refresh_snapshot()
+        with reporting_reads() as source:
+            self.assertEqual(source, PRIMARY)
+            self.assertEqual(router.db_for_read(Student), 'default')
+
+        _sources().append(ReportingSource('reporting', timezone.now()))
+        self.addCleanup(_sources().pop)
+        self.assertEqual(router.db_for_read(Student), 'reporting')
+        self.assertEqual(router.db_for_read(Center), 'reporting')
+        # Report bookkeeping and related-manager reads stay with their object; writes go to the primary
+        self.assertEqual(router.db_for_read(Report), 'default')
+        self.assertEqual(router.db_for_read(Center, instance=report), 'default')
+        self.assertEqual(router.db_for_write(Student), 'default')
+        self.assertFalse(router.allow_migrate('reporting', 'students'))
+
+    def test_snapshot_before_a_change_is_not_read(self):
+        taken_at = timezone.now() - timedelta(minutes=1)
+        DataChange.objects.update(changed_at=taken_at - timedelta(minutes=1))  # the fixture's own writes
+        with mock.patch('education_system.reporting_db._snapshot_alias', return_value='reporting'):
+            with mock.patch('education_system.reporting_db.snapshot_taken_at', return_value=taken_at):
+                self.assertEqual(choose_source(), ReportingSource('reporting', taken_at))
+                self.assertLess(last_data_change(date(2025, 1, 1), date(2025, 1, 31)), taken_at)
+
+                Attendance.objects.create(student=Student.objects.get(), date=date(2025, 1, 6), is_present=True)
+                changed_at = last_data_change(date(2025, 1, 1), date(2025, 1, 31))
+                self.assertGreater(changed_at, taken_at)
+                self.assertLess(last_data_change(date(2025, 2, 1), date(2025, 2, 28)), taken_at)
+                self.assertEqual(choose_source(not_before=changed_at), PRIMARY)
+                self.assertEqual(choose_source(not_before=taken_at - timedelta(seconds=1)).alias, 'reporting')
+
+    def test_changes_are_noted_per_month(self):
+        # The fixture's writes changed every date
+        self.assertEqual(list(DataChange.objects.values_list('month', flat=True)), [DataChange.ALL_DATES])
+        student = Student.objects.get()
+        for day in (date(2025, 1, 6), date(2025, 1, 7), date(2025, 3, 3)):
+            Attendance.objects.create(student=student, date=day, is_present=True)
+        months = dict(DataChange.objects.values_list('month', 'changed_at'))
+        self.assertEqual(set(months), {DataChange.ALL_DATES, date(2025, 1, 1), date(2025, 3, 1)})
+        self.assertEqual(last_data_change(date(2025, 1, 10), date(2025, 2, 20)), months[date(2025, 1, 1)])
+        self.assertEqual(last_data_change(date(2025, 2, 1), date(2025, 2, 28)), months[DataChange.ALL_DATES])
+
+    def test_fresh_summary_is_served_without_writes(self):
+        report = Report.objects.create(title='Centers', report_type='center', generated_by=self.user,
+                                       date_from=date(2025, 1, 1), date_to=date(2025, 1, 31), status='completed',
+                                       summary_data={'total_centers': 0})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('report_detail', args=[report.id]))
+        self.assertEqual(response.context['report_data'], {'total_centers': 0})
+        self.assertFalse([query['sql'] for query in queries
+                          if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+
+        # A change to the report's centers marks it stale; the next view recomputes and keeps it
+        self.center.save()
+        response = self.client.get(reverse('report_detail', args=[report.id]))
+        self.assertEqual(response.context['report_data']['total_centers'], 1)
+        report.refresh_from_db()
+        self.assertFalse(report.summary_stale)
+        self.assertEqual(report.summary_data['total_students'], 1)
+
+
+class ConnectionTuningTests(TestCase):
+    """New SQLite connections get SQLITE_PRAGMAS, with per-database overrides"""
+
+    def test_pragmas_applied(self):
+        pragmas = current_pragmas(connection)
+        self.assertEqual(pragmas['synchronous'], 1)  # NORMAL
+        self.assertEqual(pragmas['temp_store'], 2)  # MEMORY
+        self.assertEqual(pragmas['busy_timeout'], 5000)
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'wal', 'synchronous': 'normal'})
+    def test_database_overrides(self):
+        self.assertEqual(connection_pragmas({}), {'journal_mode': 'wal', 'synchronous': 'normal'})
+        self.assertEqual(
+            connection_pragmas({'PRAGMAS': {'journal_mode': None, 'cache_size': -2000}}),
+            {'synchronous': 'normal', 'cache_size': -2000},
+        )
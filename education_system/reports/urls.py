@@ -5,7 +5,12 @@ urlpatterns = [
     path('', views.reports_dashboard, name='reports'),
     path('generate/', views.generate_report, name='generate_report'),
     path('list/', views.report_list, name='report_list'),
+    path('risk/', views.risk_assessment, name='risk_assessment'),
+    path('cohorts/', views.cohort_analytics, name='cohort_analytics'),
     path('<int:report_id>/', views.report_detail, name='report_detail'),
+    path('<int:report_id>/refresh/', views.refresh_report_data, name='refresh_report_data'),
+    path('<int:report_id>/status/', views.report_status, name='report_status'),
     path('<int:report_id>/download/', views.download_report, name='download_report'),
+    path('<int:report_id>/export/', views.export_report_csv, name='export_report_csv'),
 ]
 
@@ -0,0 +1,237 @@
+"""
+Compact per-student attendance: one AttendanceBitmap row per student and
+month, holding two 31-bit day masks (`recorded` and `present`).
+
+Rates, day counts and streaks over any range are answered by reading a
+student's handful of month rows and counting bits (int.bit_count), instead
+of counting one Attendance row per day. The masks are kept in step with
+Attendance by apply_attendance_bits(), called wherever the daily rollup is
+updated; rebuild_attendance_bitmaps() recomputes them from the raw rows.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import CharField, F
+from django.db.models.functions import Cast
+
+from .models import Attendance, AttendanceBitmap, Student
+
+# Every day of a month; fits a signed 32-bit integer column
+ALL_DAYS = (1 << 31) - 1
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _month_end(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def day_bit(day):
+    return 1 << (day.day - 1)
+
+
+def range_mask(month, date_from, date_to):
+    """Bits of the days of `month` that fall within date_from..date_to"""
+    first = max(month, date_from)
+    last = min(_month_end(month), date_to)
+    if first > last:
+        return 0
+    return ((1 << last.day) - 1) ^ ((1 << (first.day - 1)) - 1)
+
+
+def _set_bits(day, students, is_present):
+    """Record one day for {student_id: center_id}, creating month rows as needed"""
+    month = month_start(day)
+    bit = day_bit(day)
+    existing = set(AttendanceBitmap.objects.filter(
+        month=month, student_id__in=list(students)
+    ).values_list('student_id', flat=True))
+    if existing:
+        AttendanceBitmap.objects.filter(month=month, student_id__in=existing).update(
+            recorded=F('recorded').bitor(bit),
+            present=F('present').bitor(bit) if is_present else F('present').bitand(ALL_DAYS ^ bit),
+        )
+    missing = {student_id: center_id for student_id, center_id in students.items() if student_id not in existing}
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            AttendanceBitmap.objects.bulk_create([
+                AttendanceBitmap(student_id=student_id, center_id=center_id, month=month,
+                                 recorded=bit, present=bit if is_present else 0)
+                for student_id, center_id in missing.items()
+            ])
+    except IntegrityError:
+        # Another writer created some of the rows in the meantime
+        _set_bits(day, missing, is_present)
+
+
+def _clear_bits(day, student_ids):
+    bit = day_bit(day)
+    AttendanceBitmap.objects.filter(month=month_start(day), student_id__in=list(student_ids)).update(
+        recorded=F('recorded').bitand(ALL_DAYS ^ bit),
+        present=F('present').bitand(ALL_DAYS ^ bit),
+    )
+
+
+def apply_attendance_bits(changes):
+    """
+    Apply attendance writes to the bitmaps.
+
+    `changes` are (student_id, center_id, old_date, new_date, is_present)
+    tuples; old_date is None for new rows and new_date is None for deleted
+    ones. One UPDATE (plus an INSERT for new months) is issued per distinct
+    day, however many students changed.
+    """
+    clears = defaultdict(set)
+    sets = defaultdict(dict)
+    for student_id, center_id, old_date, new_date, is_present in changes:
+        if old_date and old_date != new_date:
+            clears[old_date].add(student_id)
+        if new_date:
+            sets[(new_date, bool(is_present))][student_id] = center_id
+    with transaction.atomic():
+        for day, student_ids in clears.items():
+            _clear_bits(day, student_ids)
+        for (day, is_present), students in sets.items():
+            _set_bits(day, students, is_present)
+
+
+def rebuild_attendance_bitmaps(student_ids=None, batch_size=2000):
+    """Recompute bitmaps from the raw Attendance table (every student when ids are None)"""
+    students = Student.objects.order_by('id').values_list('id', flat=True)
+    if student_ids is not None:
+        students = students.filter(id__in=list(student_ids))
+    student_ids = list(students)
+
+    months = {}
+    written = 0
+    for start in range(0, len(student_ids), batch_size):
+        batch = student_ids[start:start + batch_size]
+        rows = {}
+        # Dates as ISO text: slicing strings is much cheaper than building date objects
+        for student_id, center_id, day, is_present in Attendance.objects.filter(
+            student_id__in=batch
+        ).order_by('student_id', 'date').values_list(
+            'student_id', 'center_id', Cast('date', CharField()), 'is_present'
+        ).iterator(chunk_size=10000):
+            month = months.get(day[:7])
+            if month is None:
+                month = months[day[:7]] = date(int(day[:4]), int(day[5:7]), 1)
+            row = rows.get((student_id, month))
+            if row is None:
+                row = rows[(student_id, month)] = AttendanceBitmap(
+                    student_id=student_id, center_id=center_id, month=month,
+                )
+            bit = 1 << (int(day[8:10]) - 1)
+            row.recorded |= bit
+            if is_present:
+                row.present |= bit
+            # The latest record's center wins, as after a transfer
+            row.center_id = center_id
+
+        with transaction.atomic():
+            AttendanceBitmap.objects.filter(student_id__in=batch).delete()
+            AttendanceBitmap.objects.bulk_create(rows.values(), batch_size=1000)
+        written += len(rows)
+    return written
+
+
+def load_bitmaps(date_from, date_to, students=None, centers=None):
+    """{student_id: [(month, recorded, present), ...]} for the months overlapping the range, masked to it"""
+    bitmaps = AttendanceBitmap.objects.filter(month__gte=month_start(date_from), month__lte=date_to)
+    if students is not None:
+        bitmaps = bitmaps.filter(student__in=students)
+    if centers is not None:
+        bitmaps = bitmaps.filter(center__in=centers)
+
+    months = {}
+    by_student = defaultdict(list)
+    for student_id, month_text, recorded, present in bitmaps.order_by('student_id', 'month').values_list(
+        'student_id', Cast('month', CharField()), 'recorded', 'present'
+    ).iterator(chunk_size=10000):
+        known = months.get(month_text)
+        if known is None:
+            month = date.fromisoformat(month_text)
+            known = months[month_text] = (month, range_mask(month, date_from, date_to))
+        month, mask = known
+        if recorded & mask:
+            by_student[student_id].append((month, recorded & mask, present & mask))
+    return by_student
+
+
+def restrict(months, date_from, date_to):
+    """Masked months (see load_bitmaps) cut down to a range within the one they were loaded for"""
+    restricted = []
+    for month, recorded, present in months:
+        mask = range_mask(month, date_from, date_to)
+        if recorded & mask:
+            restricted.append((month, recorded & mask, present & mask))
+    return restricted
+
+
+def attendance_days(months):
+    """(date, is_present) for every recorded day of a student's masked months, oldest first"""
+    days = []
+    for month, recorded, present in months:
+        while recorded:
+            low = recorded & -recorded
+            days.append((month.replace(day=low.bit_length()), bool(present & low)))
+            recorded ^= low
+    return days
+
+
+def _current_run(months, ends_run):
+    """
+    Recorded days since the last day matching `ends_run(recorded, present)`,
+    counting back from the most recent month; days without a record
+    (weekends, holidays) neither extend nor break a run.
+    """
+    run = 0
+    for _, recorded, present in reversed(months):
+        stop = ends_run(recorded, present)
+        if stop:
+            return run + (recorded >> stop.bit_length()).bit_count()
+        run += recorded.bit_count()
+    return run
+
+
+def longest_present_streak(months):
+    """Most recorded days present in a row within a student's masked months"""
+    longest = current = 0
+    for _, recorded, present in months:
+        while recorded:
+            low = recorded & -recorded
+            recorded ^= low
+            current = current + 1 if present & low else 0
+            longest = max(longest, current)
+    return longest
+
+
+def summarize(months):
+    """Day counts, rate and current streaks for one student's masked months (see load_bitmaps)"""
+    recorded_days = sum(recorded.bit_count() for _, recorded, _ in months)
+    present_days = sum(present.bit_count() for _, _, present in months)
+    return {
+        'recorded_days': recorded_days,
+        'present_days': present_days,
+        'attendance_rate': present_days / recorded_days * 100 if recorded_days else 0,
+        'present_streak': _current_run(months, lambda recorded, present: recorded & ~present),
+        'absence_streak': _current_run(months, lambda recorded, present: present),
+    }
+
+
+def student_attendance(student_id, date_from, date_to):
+    """summarize() for one student over a date range"""
+    return summarize(load_bitmaps(date_from, date_to, students=[student_id]).get(student_id, []))
+
+
+def attendance_by_student(date_from, date_to, students=None, centers=None):
+    """{student_id: summarize()} for every student with attendance in the range"""
+    return {
+        student_id: summarize(months)
+        for student_id, months in load_bitmaps(date_from, date_to, students, centers).items()
+    }
@@ -0,0 +1,114 @@
+from collections import defaultdict
+
+from django.db import DatabaseError, IntegrityError, transaction
+
+from .bitmaps import apply_attendance_bits
+from .models import Attendance
+from .rollups import apply_attendance_deltas
+from .signals import attendance_bulk_written
+
+ATTENDANCE_STATUSES = {'present': True, 'absent': False}
+
+
+def parse_attendance_form(data):
+    """Collect {student_id: (status, remarks)} from POST data in one pass over its keys"""
+    entries = {}
+    for key, status in data.items():
+        if not key.startswith('student_') or not status:
+            continue
+        try:
+            student_id = int(key[len('student_'):])
+        except ValueError:
+            continue
+        entries[student_id] = (status, data.get(f'remarks_{student_id}', ''))
+    return entries
+
+
+def bulk_mark_attendance(entries, attendance_date, student_centers, batch_size=500):
+    """
+    Write attendance for many students at once.
+
+    `entries` maps student id to (status, remarks) and `student_centers` maps
+    student id to center id for every student allowed to be marked. Existing
+    rows for the date are diffed so only new or changed rows are written, using
+    batched bulk_create/bulk_update inside a single transaction. Returns per-row
+    counts plus the errors for rows that could not be written.
+    """
+    result = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'errors': []}
+
+    valid = {}
+    for student_id, (status, remarks) in entries.items():
+        if student_id not in student_centers:
+            result['failed'] += 1
+            result['errors'].append((student_id, 'Student is not active in the selected center'))
+        elif status not in ATTENDANCE_STATUSES:
+            result['failed'] += 1
+            result['errors'].append((student_id, f'Invalid attendance status "{status}"'))
+        else:
+            valid[student_id] = (ATTENDANCE_STATUSES[status], remarks or '')
+
+    if not valid:
+        return result
+
+    existing = {}
+    student_ids = list(valid)
+    for start in range(0, len(student_ids), batch_size):
+        for row in Attendance.objects.filter(
+            date=attendance_date, student_id__in=student_ids[start:start + batch_size]
+        ).only('id', 'student_id', 'center_id', 'date', 'is_present', 'remarks'):
+            existing[row.student_id] = row
+
+    to_create = []
+    to_update = []
+    deltas = defaultdict(lambda: [0, 0])
+    for student_id, (is_present, remarks) in valid.items():
+        key = (student_centers[student_id], attendance_date)
+        row = existing.get(student_id)
+        if row is None:
+            to_create.append(Attendance(
+                student_id=student_id, center_id=student_centers[student_id], date=attendance_date,
+                is_present=is_present, remarks=remarks,
+            ))
+            deltas[key][0 if is_present else 1] += 1
+        elif row.is_present != is_present or row.remarks != remarks:
+            if row.is_present != is_present:
+                deltas[key][0 if row.is_present else 1] -= 1
+                deltas[key][0 if is_present else 1] += 1
+            row.is_present = is_present
+            row.remarks = remarks
+            to_update.append(row)
+        else:
+            result['unchanged'] += 1
+
+    try:
+        with transaction.atomic():
+            Attendance.objects.bulk_create(to_create, batch_size=batch_size)
+            Attendance.objects.bulk_update(to_update, ['is_present', 'remarks'], batch_size=batch_size)
+            apply_attendance_deltas(deltas)
+            apply_attendance_bits(
+                (row.student_id, row.center_id, None, row.date, row.is_present) for row in to_create + to_update
+            )
+        result['created'] += len(to_create)
+        result['updated'] += len(to_update)
+        if to_create or to_update:
+            attendance_bulk_written.send(sender=Attendance, dates=[attendance_date])
+    except IntegrityError:
+        # A concurrent writer got in first; fall back to row-by-row upserts
+        _write_rows_individually(to_create + to_update, result)
+
+    return result
+
+
+def _write_rows_individually(rows, result):
+    for row in rows:
+        try:
+            with transaction.atomic():
+                _, created = Attendance.objects.update_or_create(
+                    student_id=row.student_id,
+                    date=row.date,
+                    defaults={'is_present': row.is_present, 'remarks': row.remarks},
+                )
+            result['created' if created else 'updated'] += 1
+        except DatabaseError as e:
+            result['failed'] += 1
+            result['errors'].append((row.student_id, str(e)))
@@ -68,4 +68,14 @@ class BulkAttendanceForm(forms.Form):
         queryset=Center.objects.filter(is_active=True),
         widget=forms.Select(attrs={'class': 'form-control'}),
         empty_label="Select Center"
-    )
\ No newline at end of file
+    )
+
+class ImportForm(forms.Form):
+    kind = forms.ChoiceField(
+        choices=[('students', 'Students'), ('grades', 'Grades')],
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+    dry_run = forms.BooleanField(required=False, label='Only check the file, do not save anything')
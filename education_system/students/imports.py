@@ -0,0 +1,299 @@
+"""
+Bulk import of students and grades from CSV (or .xlsx when openpyxl is installed).
+
+Rows are read incrementally and handled in batches: each batch is validated
+with plain field checks against lookups cached for the whole import (centers,
+subjects) or fetched once per batch (existing student IDs), then written with
+bulk_create inside its own transaction. Invalid rows are skipped and reported
+by line number; the rest of the file still imports.
+
+bulk_create does not send post_save, so the students_bulk_created and
+grades_bulk_created signals are sent after each batch for the search index,
+metrics, statistics and report caches.
+"""
+import csv
+import io
+import re
+from datetime import date, datetime
+from itertools import zip_longest
+
+from django.db import IntegrityError, transaction
+
+from centers.models import Center, Subject
+
+from .models import Grade, Student
+from .signals import grades_bulk_created, students_bulk_created
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+STUDENT_COLUMNS = ['student_id', 'first_name', 'last_name', 'date_of_birth', 'gender',
+                   'center', 'guardian_name', 'guardian_phone']
+GRADE_COLUMNS = ['student_id', 'subject', 'assessment_date', 'marks_obtained', 'total_marks', 'grade_letter']
+
+GENDERS = {}
+for code, label in Student.GENDER_CHOICES:
+    GENDERS[code.lower()] = code
+    GENDERS[label.lower()] = code
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported (unreadable, missing columns)"""
+
+
+def _cell_text(value):
+    # Date cells come back as datetimes at midnight
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat() if isinstance(value, date) else str(value)
+
+
+def read_rows(fileobj, filename=''):
+    """Yield (line number, {column: value}) from an uploaded CSV or .xlsx file"""
+    if filename.lower().endswith('.xlsx'):
+        if openpyxl is None:
+            raise ImportFileError('Reading .xlsx files needs openpyxl; upload a CSV instead')
+        sheet = openpyxl.load_workbook(fileobj, read_only=True, data_only=True).active
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(value or '').strip().lower() for value in next(rows, [])]
+        for line, values in enumerate(rows, start=2):
+            yield line, {
+                column: '' if value is None else _cell_text(value)
+                for column, value in zip(header, values)
+            }
+        return
+
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = [column.strip().lower() for column in next(reader, [])]
+    for values in reader:
+        if not any(values):
+            continue
+        yield reader.line_num, dict(zip_longest(header, values, fillvalue=''))
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _check_columns(row, required):
+    missing = [column for column in required if column not in row]
+    if missing:
+        raise ImportFileError(f"Missing columns: {', '.join(missing)}")
+
+
+def _max_lengths(model):
+    return {field.name: field.max_length for field in model._meta.fields if getattr(field, 'max_length', None)}
+
+
+class _RowError(Exception):
+    pass
+
+
+def _text(row, column, max_lengths, required=True):
+    value = (row.get(column) or '').strip()
+    if required and not value:
+        raise _RowError(f'{column} is required')
+    if column in max_lengths and len(value) > max_lengths[column]:
+        raise _RowError(f'{column} is longer than {max_lengths[column]} characters')
+    return value
+
+
+DATE_FORMAT = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def _date(row, column):
+    value = (row.get(column) or '').strip()
+    try:
+        if not DATE_FORMAT.fullmatch(value):
+            raise ValueError(value)
+        return date.fromisoformat(value)
+    except ValueError:
+        raise _RowError(f'{column} "{value}" is not a YYYY-MM-DD date')
+
+
+def _int(row, column):
+    value = (row.get(column) or '').strip()
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    if number is None or not number.is_integer():
+        raise _RowError(f'{column} "{value}" is not a whole number')
+    return int(number)
+
+
+def _new_result():
+    return {'rows': 0, 'created': 0, 'failed': 0, 'errors': []}
+
+
+def _fail(result, line, message):
+    result['failed'] += 1
+    result['errors'].append((line, message))
+
+
+def _lookup(model, *fields):
+    """{id and lower-cased field values: id} for a small reference table, loaded once per import"""
+    lookup = {}
+    for object_id, *values in model.objects.values_list('id', *fields):
+        lookup[str(object_id)] = object_id
+        for value in values:
+            lookup[str(value).lower()] = object_id
+    return lookup
+
+
+def _insert(model, objects, lines, result, dry_run, on_created):
+    """
+    Write one validated batch and call on_created(created objects) in the
+    same transaction, falling back to row-by-row inserts on a conflict.
+    """
+    if dry_run or not objects:
+        result['created'] += len(objects)
+        return
+    try:
+        with transaction.atomic():
+            created = model.objects.bulk_create(objects)
+            on_created(created)
+        result['created'] += len(created)
+    except IntegrityError:
+        for obj in objects:
+            # Ids bulk_create set before the conflict were rolled back with it
+            obj.pk = None
+            obj._state.adding = True
+        with transaction.atomic():
+            created = []
+            for obj, line in zip(objects, lines):
+                try:
+                    with transaction.atomic():
+                        model.objects.bulk_create([obj])
+                    created.append(obj)
+                except IntegrityError as e:
+                    _fail(result, line, str(e))
+            if created:
+                on_created(created)
+        result['created'] += len(created)
+
+
+def import_students(rows, batch_size=1000, dry_run=False):
+    """Create students from (line, row) pairs; returns counts and per-row errors"""
+    result = _new_result()
+    centers = _lookup(Center, 'name')
+    max_lengths = _max_lengths(Student)
+    seen = set()
+
+    for batch in _batches(rows, batch_size):
+        _check_columns(batch[0][1], STUDENT_COLUMNS)
+        result['rows'] += len(batch)
+        codes = {(row.get('student_id') or '').strip() for _, row in batch}
+        existing = set(Student.objects.filter(student_id__in=codes).values_list('student_id', flat=True))
+
+        students, lines = [], []
+        for line, row in batch:
+            try:
+                student_id = _text(row, 'student_id', max_lengths)
+                if student_id in existing or student_id in seen:
+                    raise _RowError(f'student_id "{student_id}" already exists')
+                gender = GENDERS.get((row.get('gender') or '').strip().lower())
+                if gender is None:
+                    raise _RowError(f'gender "{row.get("gender")}" must be one of M, F, O')
+                center_id = centers.get((row.get('center') or '').strip().lower())
+                if center_id is None:
+                    raise _RowError(f'center "{row.get("center")}" does not exist')
+                student = Student(
+                    student_id=student_id,
+                    first_name=_text(row, 'first_name', max_lengths),
+                    last_name=_text(row, 'last_name', max_lengths),
+                    date_of_birth=_date(row, 'date_of_birth'),
+                    gender=gender,
+                    center_id=center_id,
+                    guardian_name=_text(row, 'guardian_name', max_lengths),
+                    guardian_phone=_text(row, 'guardian_phone', max_lengths),
+                )
+            except _RowError as e:
+                _fail(result, line, str(e))
+                continue
+            seen.add(student_id)
+            students.append(student)
+            lines.append(line)
+
+        _insert(Student, students, lines, result, dry_run,
+                lambda created: students_bulk_created.send(sender=Student, students=created))
+
+    return result
+
+
+def import_grades(rows, batch_size=1000, dry_run=False):
+    """Create grades from (line, row) pairs; students are matched by their student_id code"""
+    result = _new_result()
+    subjects = _lookup(Subject, 'code', 'name')
+    max_lengths = _max_lengths(Grade)
+
+    for batch in _batches(rows, batch_size):
+        _check_columns(batch[0][1], GRADE_COLUMNS)
+        result['rows'] += len(batch)
+        codes = {(row.get('student_id') or '').strip() for _, row in batch}
+        students = {
+            code: (student_id, center_id)
+            for code, student_id, center_id in Student.objects.filter(
+                student_id__in=codes
+            ).values_list('student_id', 'id', 'center_id')
+        }
+
+        grades, lines = [], []
+        for line, row in batch:
+            try:
+                code = (row.get('student_id') or '').strip()
+                if code not in students:
+                    raise _RowError(f'student "{code}" does not exist')
+                subject_id = subjects.get((row.get('subject') or '').strip().lower())
+                if subject_id is None:
+                    raise _RowError(f'subject "{row.get("subject")}" does not exist')
+                marks_obtained = _int(row, 'marks_obtained')
+                total_marks = _int(row, 'total_marks')
+                if total_marks <= 0:
+                    raise _RowError('total_marks must be positive')
+                if not 0 <= marks_obtained <= total_marks:
+                    raise _RowError('marks_obtained must be between 0 and total_marks')
+                student_id, center_id = students[code]
+                grades.append(Grade(
+                    student_id=student_id,
+                    center_id=center_id,
+                    subject_id=subject_id,
+                    assessment_date=_date(row, 'assessment_date'),
+                    marks_obtained=marks_obtained,
+                    total_marks=total_marks,
+                    grade_letter=_text(row, 'grade_letter', max_lengths),
+                ))
+                lines.append(line)
+            except _RowError as e:
+                _fail(result, line, str(e))
+
+        _insert(Grade, grades, lines, result, dry_run,
+                lambda created: grades_bulk_created.send(sender=Grade, grades=created))
+
+    return result
+
+
+IMPORTERS = {
+    'students': import_students,
+    'grades': import_grades,
+}
+
+
+def write_error_report(result, out):
+    """Write a result's row errors as CSV (line, error) to a text stream"""
+    writer = csv.writer(out)
+    writer.writerow(['line', 'error'])
+    writer.writerows(result['errors'])
@@ -0,0 +1,48 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from students.synthetic import clear_synthetic_data, generate_dataset
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset (centers, students, attendance, grades)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--centers', type=int, default=5)
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--days', type=int, default=30, help='School days of attendance per student')
+        parser.add_argument('--grades', type=int, default=5, dest='grades_per_student',
+                            help='Grades per student')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--end-date', type=date.fromisoformat,
+                            help='Last attendance day (YYYY-MM-DD); defaults to today')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete previously generated synthetic data first')
+        parser.add_argument('--clear-only', action='store_true', help='Delete synthetic data and stop')
+
+    def handle(self, *args, **options):
+        if options['clear'] or options['clear_only']:
+            removed = clear_synthetic_data()
+            self.stdout.write(f'Removed {removed} synthetic students')
+            if options['clear_only']:
+                return
+
+        started = time.perf_counter()
+        try:
+            counts = generate_dataset(
+                centers=options['centers'],
+                students=options['students'],
+                days=options['days'],
+                grades_per_student=options['grades_per_student'],
+                seed=options['seed'],
+                end_date=options['end_date'],
+                batch_size=options['batch_size'],
+            )
+        except ValueError as e:
+            raise CommandError(f'{e} (use --clear)')
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary} in {elapsed:.1f}s'))
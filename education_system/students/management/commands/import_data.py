@@ -0,0 +1,46 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from students.imports import IMPORTERS, ImportFileError, read_rows, write_error_report
+
+
+class Command(BaseCommand):
+    help = 'Bulk import students or grades from a CSV (or .xlsx) file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help='File to import; the first row names the columns')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without saving')
+        parser.add_argument('--errors', help='Write the per-row error report to this CSV file ("-" for stdout)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                result = IMPORTERS[options['kind']](
+                    read_rows(fileobj, options['path']),
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                )
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        if options['errors'] == '-':
+            write_error_report(result, sys.stdout)
+        elif options['errors']:
+            with open(options['errors'], 'w', newline='') as out:
+                write_error_report(result, out)
+        else:
+            for line, error in result['errors'][:20]:
+                self.stderr.write(f'Line {line}: {error}')
+
+        action = 'Validated' if options['dry_run'] else 'Imported'
+        rate = result['rows'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {result['created']} of {result['rows']} {options['kind']} "
+            f"({result['failed']} failed) in {elapsed:.2f}s, {rate:.0f} rows/s"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from students.bitmaps import rebuild_attendance_bitmaps
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-student monthly attendance bitmaps from raw attendance'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='student_ids',
+                            help='Only rebuild this student id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        written = rebuild_attendance_bitmaps(options['student_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} monthly attendance bitmaps'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from students.metrics import rebuild_student_metrics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-student metrics summaries from raw attendance and grades'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='student_ids',
+                            help='Only rebuild this student id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_student_metrics(options['student_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt metrics for {rebuilt} students'))
@@ -0,0 +1,151 @@
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from centers.models import Subject
+
+from .models import Grade, Student, StudentMetrics
+
+# Days covered by the student detail page's attendance rate
+ATTENDANCE_WINDOW_DAYS = 30
+
+
+def attendance_window_start(today=None):
+    return (today or date.today()) - timedelta(days=ATTENDANCE_WINDOW_DAYS)
+
+
+def rebuild_student_metrics(student_ids=None, batch_size=500):
+    """Recompute StudentMetrics from raw grades (every student when ids are None)"""
+    students = Student.objects.order_by('id').values_list('id', flat=True)
+    if student_ids is not None:
+        students = students.filter(id__in=list(student_ids))
+    student_ids = list(students)
+
+    rebuilt = 0
+    for start in range(0, len(student_ids), batch_size):
+        batch = student_ids[start:start + batch_size]
+        metrics = {student_id: StudentMetrics(student_id=student_id) for student_id in batch}
+
+        for row in Grade.objects.filter(student_id__in=batch).values('student_id', 'subject_id', 'subject__name').annotate(
+            marks=Sum('marks_obtained'),
+            total=Sum('total_marks'),
+            count=Count('id'),
+            last=Max('assessment_date'),
+        ).order_by():
+            student_metrics = metrics[row['student_id']]
+            student_metrics.subject_totals[str(row['subject_id'])] = {
+                'name': row['subject__name'],
+                'marks': row['marks'],
+                'total': row['total'],
+                'count': row['count'],
+            }
+            student_metrics.marks_obtained_total += row['marks']
+            student_metrics.total_marks_total += row['total']
+            student_metrics.grade_count += row['count']
+            if student_metrics.last_assessment_date is None or row['last'] > student_metrics.last_assessment_date:
+                student_metrics.last_assessment_date = row['last']
+
+        _upsert_metrics(metrics.values())
+        rebuilt += len(batch)
+    return rebuilt
+
+
+METRIC_FIELDS = ['marks_obtained_total', 'total_marks_total', 'grade_count',
+                 'last_assessment_date', 'subject_totals', 'updated_at']
+
+
+def _upsert_metrics(rows):
+    """Write StudentMetrics rows, replacing existing ones"""
+    StudentMetrics.objects.bulk_create(
+        list(rows), update_conflicts=True, unique_fields=['student'], update_fields=METRIC_FIELDS,
+    )
+
+
+def create_empty_metrics(student_ids):
+    """Insert zeroed metrics rows for new students, skipping any that already have one"""
+    StudentMetrics.objects.bulk_create(
+        [StudentMetrics(student_id=student_id) for student_id in student_ids], ignore_conflicts=True,
+    )
+
+
+def get_student_metrics(student):
+    """The student's metrics row, built from raw data the first time it is needed"""
+    try:
+        return student.metrics
+    except StudentMetrics.DoesNotExist:
+        rebuild_student_metrics([student.id])
+        return StudentMetrics.objects.get(student_id=student.id)
+
+
+def _locked_metrics(student_ids, create):
+    """
+    Lock and return {student_id: StudentMetrics} plus the ids whose rows were
+    just rebuilt (and so already include the change being applied). Deletions
+    pass create=False: the row may already be gone in a cascade.
+    """
+    student_ids = set(student_ids)
+    metrics = {
+        row.student_id: row
+        for row in StudentMetrics.objects.select_for_update().filter(student_id__in=student_ids)
+    }
+    rebuilt = set()
+    missing = student_ids - set(metrics)
+    if missing and create:
+        rebuild_student_metrics(missing)
+        rebuilt = missing
+    return metrics, rebuilt
+
+
+def apply_grade_change(student_id, previous, current):
+    """
+    Move one grade's marks between the student's totals.
+
+    `previous` and `current` are (subject_id, assessment_date, marks_obtained,
+    total_marks) or None for a created or deleted grade.
+    """
+    with transaction.atomic():
+        metrics, rebuilt = _locked_metrics([student_id], create=current is not None)
+        student_metrics = metrics.get(student_id)
+        if student_metrics is None or student_id in rebuilt:
+            return
+
+        subjects = student_metrics.subject_totals
+        if previous:
+            subject_id, _, marks, total = previous
+            totals = subjects.get(str(subject_id))
+            if totals:
+                totals['marks'] -= marks
+                totals['total'] -= total
+                totals['count'] -= 1
+                if totals['count'] <= 0:
+                    del subjects[str(subject_id)]
+            student_metrics.marks_obtained_total -= marks
+            student_metrics.total_marks_total -= total
+            student_metrics.grade_count -= 1
+
+        if current:
+            subject_id, assessment_date, marks, total = current
+            totals = subjects.get(str(subject_id))
+            if totals is None:
+                totals = subjects[str(subject_id)] = {
+                    'name': Subject.objects.values_list('name', flat=True).get(id=subject_id),
+                    'marks': 0, 'total': 0, 'count': 0,
+                }
+            totals['marks'] += marks
+            totals['total'] += total
+            totals['count'] += 1
+            student_metrics.marks_obtained_total += marks
+            student_metrics.total_marks_total += total
+            student_metrics.grade_count += 1
+
+        last = student_metrics.last_assessment_date
+        if previous and previous[1] == last and (current is None or current[1] < last):
+            # The latest assessment moved back or went away; look up the new latest
+            student_metrics.last_assessment_date = Grade.objects.filter(
+                student_id=student_id
+            ).aggregate(last=Max('assessment_date'))['last']
+        elif current and (last is None or current[1] > last):
+            student_metrics.last_assessment_date = current[1]
+
+        student_metrics.save()
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_daily_summaries(apps, schema_editor):
+    Attendance = apps.get_model('students', 'Attendance')
+    DailyAttendanceSummary = apps.get_model('students', 'DailyAttendanceSummary')
+    rows = Attendance.objects.values('student__center_id', 'date').annotate(
+        total=Count('id'),
+        present=Count('id', filter=Q(is_present=True)),
+    ).order_by()
+    DailyAttendanceSummary.objects.bulk_create([
+        DailyAttendanceSummary(
+            center_id=row['student__center_id'],
+            date=row['date'],
+            present_count=row['present'],
+            absent_count=row['total'] - row['present'],
+            total_count=row['total'],
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centers', '0001_initial'),
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present_count', models.IntegerField(default=0)),
+                ('absent_count', models.IntegerField(default=0)),
+                ('total_count', models.IntegerField(default=0)),
+                ('center', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='centers.center')),
+            ],
+            options={
+                'unique_together': {('center', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_summaries, migrations.RunPython.noop),
+    ]
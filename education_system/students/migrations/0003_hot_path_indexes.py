@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centers', '0001_initial'),
+        ('students', '0002_dailyattendancesummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'student'], name='attendance_date_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyattendancesummary',
+            index=models.Index(fields=['date', 'center'], name='rollup_date_center_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['assessment_date', 'student'], name='grade_date_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['student', 'assessment_date'], name='grade_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['center', 'last_name', 'first_name', 'id'], name='student_active_center_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['last_name', 'first_name', 'id'], name='student_active_name_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_center(apps, schema_editor):
+    Student = apps.get_model('students', 'Student')
+    student_center = Subquery(Student.objects.filter(pk=OuterRef('student_id')).values('center_id')[:1])
+    for model_name in ('Attendance', 'Grade'):
+        apps.get_model('students', model_name).objects.update(center_id=student_center)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centers', '0001_initial'),
+        ('students', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='center',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='centers.center'),
+        ),
+        migrations.AddField(
+            model_name='grade',
+            name='center',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='centers.center'),
+        ),
+        migrations.RunPython(backfill_center, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendance',
+            name='center',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='centers.center'),
+        ),
+        migrations.AlterField(
+            model_name='grade',
+            name='center',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='centers.center'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['center', 'date'], name='attendance_center_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['center', 'assessment_date'], name='grade_center_date_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+from students.search import COLUMNS, CREATE_TABLES_SQL, DROP_TABLES_SQL, SEARCH_TABLE, TRIGRAM_TABLE, search_available
+
+
+def create_search_tables(apps, schema_editor):
+    if not search_available(schema_editor.connection):
+        return
+    Student = apps.get_model('students', 'Student')
+    for sql in CREATE_TABLES_SQL:
+        schema_editor.execute(sql)
+    rows = list(Student.objects.values_list('id', *COLUMNS))
+    placeholders = ', '.join(['%s'] * (len(COLUMNS) + 1))
+    with schema_editor.connection.cursor() as cursor:
+        for table in (SEARCH_TABLE, TRIGRAM_TABLE):
+            cursor.executemany(
+                f"INSERT INTO {table} (rowid, {', '.join(COLUMNS)}) VALUES ({placeholders})", rows
+            )
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_TABLES_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0005_grade_subject_date_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:26
+
+from datetime import date, timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def backfill_student_metrics(apps, schema_editor):
+    Student = apps.get_model('students', 'Student')
+    Attendance = apps.get_model('students', 'Attendance')
+    Grade = apps.get_model('students', 'Grade')
+    StudentMetrics = apps.get_model('students', 'StudentMetrics')
+
+    metrics = {student_id: StudentMetrics(student_id=student_id, recent_attendance=[], subject_totals={})
+               for student_id in Student.objects.values_list('id', flat=True)}
+    for student_id, day, is_present in Attendance.objects.filter(
+        date__gte=date.today() - timedelta(days=30)
+    ).order_by('student_id', 'date').values_list('student_id', 'date', 'is_present'):
+        metrics[student_id].recent_attendance.append([day.isoformat(), is_present])
+
+    for row in Grade.objects.values('student_id', 'subject_id', 'subject__name').annotate(
+        marks=Sum('marks_obtained'), total=Sum('total_marks'), count=Count('id'), last=Max('assessment_date'),
+    ).order_by():
+        student_metrics = metrics[row['student_id']]
+        student_metrics.subject_totals[str(row['subject_id'])] = {
+            'name': row['subject__name'], 'marks': row['marks'], 'total': row['total'], 'count': row['count'],
+        }
+        student_metrics.marks_obtained_total += row['marks']
+        student_metrics.total_marks_total += row['total']
+        student_metrics.grade_count += row['count']
+        if student_metrics.last_assessment_date is None or row['last'] > student_metrics.last_assessment_date:
+            student_metrics.last_assessment_date = row['last']
+
+    StudentMetrics.objects.bulk_create(metrics.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0006_student_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recent_attendance', models.JSONField(default=list)),
+                ('marks_obtained_total', models.IntegerField(default=0)),
+                ('total_marks_total', models.IntegerField(default=0)),
+                ('grade_count', models.IntegerField(default=0)),
+                ('last_assessment_date', models.DateField(blank=True, null=True)),
+                ('subject_totals', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='students.student')),
+            ],
+        ),
+        migrations.RunPython(backfill_student_metrics, migrations.RunPython.noop),
+    ]
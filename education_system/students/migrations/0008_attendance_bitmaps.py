@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_attendance_bitmaps(apps, schema_editor):
+    Attendance = apps.get_model('students', 'Attendance')
+    AttendanceBitmap = apps.get_model('students', 'AttendanceBitmap')
+    rows = {}
+    for student_id, center_id, day, is_present in Attendance.objects.order_by('student_id', 'date').values_list(
+        'student_id', 'center_id', 'date', 'is_present'
+    ).iterator(chunk_size=10000):
+        month = day.replace(day=1)
+        row = rows.get((student_id, month))
+        if row is None:
+            row = rows[(student_id, month)] = AttendanceBitmap(
+                student_id=student_id, center_id=center_id, month=month, recorded=0, present=0,
+            )
+        bit = 1 << (day.day - 1)
+        row.recorded |= bit
+        if is_present:
+            row.present |= bit
+        row.center_id = center_id
+    AttendanceBitmap.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centers', '0001_initial'),
+        ('students', '0007_student_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('recorded', models.IntegerField(default=0)),
+                ('present', models.IntegerField(default=0)),
+                ('center', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='centers.center')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_bitmaps', to='students.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['center', 'month'], name='bitmap_center_month_idx'), models.Index(fields=['month'], name='bitmap_month_idx')],
+                'unique_together': {('student', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_attendance_bitmaps, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='studentmetrics',
+            name='recent_attendance',
+        ),
+    ]
@@ -1,4 +1,7 @@
+from datetime import date
+
 from django.db import models
+from django.db.models import Q
 from centers.models import Center, Subject
 
 class Student(models.Model):
@@ -19,26 +22,180 @@ class Student(models.Model):
     guardian_name = models.CharField(max_length=200)
     guardian_phone = models.CharField(max_length=15)
     
+    class Meta:
+        indexes = [
+            # Partial indexes: SQLite cannot seek on a bare boolean column, but
+            # matches "WHERE is_active" against the index condition
+            models.Index(fields=['center', 'last_name', 'first_name', 'id'], condition=Q(is_active=True),
+                         name='student_active_center_idx'),
+            models.Index(fields=['last_name', 'first_name', 'id'], condition=Q(is_active=True),
+                         name='student_active_name_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored center so a transfer can be carried over to attendance and grades
+        instance._loaded_center_id = instance.__dict__.get('center_id')
+        # ...and the enrollment date, whose quarter is the student's reporting cohort
+        instance._loaded_enrollment_date = instance.__dict__.get('enrollment_date')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Only now: every post_save receiver compares against the state from before this save
+        self._loaded_enrollment_date = self.enrollment_date
+    
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.student_id})"
 
 class Attendance(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    # Copy of student.center so center/date range queries skip the student join
+    center = models.ForeignKey(Center, on_delete=models.CASCADE, editable=False)
     date = models.DateField()
     is_present = models.BooleanField()
     remarks = models.TextField(blank=True)
     
     class Meta:
         unique_together = ['student', 'date']
+        indexes = [
+            models.Index(fields=['date', 'student'], name='attendance_date_student_idx'),
+            models.Index(fields=['center', 'date'], name='attendance_center_date_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored state so the daily rollup can apply deltas on update
+        instance._loaded_state = (instance.__dict__.get('center_id'),
+                                  instance.__dict__.get('date'),
+                                  instance.__dict__.get('is_present'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.center_id = self.student.center_id
+        super().save(*args, **kwargs)
+        # Only now: every post_save receiver compares against the state from before this save
+        self._loaded_state = (self.center_id, self.date, self.is_present)
 
 class Grade(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    # Copy of student.center so center/date range queries skip the student join
+    center = models.ForeignKey(Center, on_delete=models.CASCADE, editable=False)
     assessment_date = models.DateField()
     marks_obtained = models.IntegerField()
     total_marks = models.IntegerField()
     grade_letter = models.CharField(max_length=2)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['assessment_date', 'student'], name='grade_date_student_idx'),
+            models.Index(fields=['student', 'assessment_date'], name='grade_student_date_idx'),
+            models.Index(fields=['center', 'assessment_date'], name='grade_center_date_idx'),
+            models.Index(fields=['subject', 'assessment_date'], name='grade_subject_date_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored marks so the student metrics can apply deltas on update
+        instance._loaded_state = (instance.__dict__.get('subject_id'),
+                                  instance.__dict__.get('assessment_date'),
+                                  instance.__dict__.get('marks_obtained'),
+                                  instance.__dict__.get('total_marks'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.center_id = self.student.center_id
+        super().save(*args, **kwargs)
+        # Only now: every post_save receiver compares against the state from before this save
+        self._loaded_state = (self.subject_id, self.assessment_date, self.marks_obtained, self.total_marks)
+
     def __str__(self):
-        return f"{self.student.first_name} - {self.subject.name} - {self.grade_letter}"
+        # Names only when select_related loaded them: listing grades must not cost two queries each
+        student = self.student.first_name if Grade.student.is_cached(self) else f"Student {self.student_id}"
+        subject = self.subject.name if Grade.subject.is_cached(self) else f"Subject {self.subject_id}"
+        return f"{student} - {subject} - {self.grade_letter}"
+
+
+class DailyAttendanceSummary(models.Model):
+    """Per-center, per-day attendance counts maintained alongside Attendance"""
+    center = models.ForeignKey(Center, on_delete=models.CASCADE)
+    date = models.DateField()
+    present_count = models.IntegerField(default=0)
+    absent_count = models.IntegerField(default=0)
+    total_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['center', 'date']
+        indexes = [
+            models.Index(fields=['date', 'center'], name='rollup_date_center_idx'),
+        ]
 
+    def __str__(self):
+        return f"{self.center_id} - {self.date}: {self.present_count}/{self.total_count}"
+
+
+class StudentMetrics(models.Model):
+    """
+    Per-student grade figures for the detail page, maintained alongside Grade
+    (attendance comes from AttendanceBitmap).
+
+    subject_totals maps subject id to its name, summed marks, summed total
+    marks and assessment count.
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='metrics')
+    marks_obtained_total = models.IntegerField(default=0)
+    total_marks_total = models.IntegerField(default=0)
+    grade_count = models.IntegerField(default=0)
+    last_assessment_date = models.DateField(null=True, blank=True)
+    subject_totals = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def average_percentage(self):
+        if not self.total_marks_total:
+            return 0
+        return self.marks_obtained_total * 100 / self.total_marks_total
+
+    @property
+    def subject_averages(self):
+        return sorted((
+            {
+                'name': totals['name'],
+                'count': totals['count'],
+                'average_percentage': totals['marks'] * 100 / totals['total'] if totals['total'] else 0,
+            }
+            for totals in self.subject_totals.values()
+        ), key=lambda subject: subject['name'])
+
+    def __str__(self):
+        return f"Metrics for {self.student_id}"
+
+
+class AttendanceBitmap(models.Model):
+    """
+    One month of a student's attendance as day bitmasks, maintained alongside Attendance.
+
+    Bit n - 1 of `recorded` is set when attendance was taken on day n of the
+    month, and the same bit of `present` when the student was present (see
+    students.bitmaps).
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_bitmaps')
+    # Copy of student.center, like Attendance.center
+    center = models.ForeignKey(Center, on_delete=models.CASCADE)
+    month = models.DateField(help_text="First day of the month")
+    recorded = models.IntegerField(default=0)
+    present = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['student', 'month']
+        indexes = [
+            models.Index(fields=['center', 'month'], name='bitmap_center_month_idx'),
+            models.Index(fields=['month'], name='bitmap_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} {self.month:%Y-%m}: {self.present.bit_count()}/{self.recorded.bit_count()}"
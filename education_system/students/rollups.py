@@ -0,0 +1,137 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Attendance, DailyAttendanceSummary
+
+
+def apply_attendance_delta(center_id, day, present=0, absent=0):
+    """Add present/absent deltas to the rollup row for one center and day"""
+    if not present and not absent:
+        return
+
+    updated = DailyAttendanceSummary.objects.filter(center_id=center_id, date=day).update(
+        present_count=F('present_count') + present,
+        absent_count=F('absent_count') + absent,
+        total_count=F('total_count') + present + absent,
+    )
+    if updated or present < 0 or absent < 0:
+        # Nothing to decrement when the row is already gone (e.g. center cascade)
+        return
+
+    try:
+        with transaction.atomic():
+            DailyAttendanceSummary.objects.create(
+                center_id=center_id,
+                date=day,
+                present_count=present,
+                absent_count=absent,
+                total_count=present + absent,
+            )
+    except IntegrityError:
+        # Another writer created the row in the meantime
+        apply_attendance_delta(center_id, day, present, absent)
+
+
+def apply_attendance_deltas(deltas):
+    """Apply a {(center_id, day): [present, absent]} mapping of deltas"""
+    for (center_id, day), (present, absent) in deltas.items():
+        apply_attendance_delta(center_id, day, present, absent)
+
+
+def rebuild_daily_summaries(date_from=None, date_to=None, batch_size=1000):
+    """Recompute rollup rows from the raw Attendance table, optionally within a date range"""
+    attendance = Attendance.objects.all()
+    summaries = DailyAttendanceSummary.objects.all()
+    if date_from:
+        attendance = attendance.filter(date__gte=date_from)
+        summaries = summaries.filter(date__gte=date_from)
+    if date_to:
+        attendance = attendance.filter(date__lte=date_to)
+        summaries = summaries.filter(date__lte=date_to)
+
+    rows = attendance.values('center_id', 'date').annotate(
+        total=Count('id'),
+        present=Count('id', filter=Q(is_present=True)),
+    ).order_by()
+
+    created = 0
+    with transaction.atomic():
+        summaries.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(DailyAttendanceSummary(
+                center_id=row['center_id'],
+                date=row['date'],
+                present_count=row['present'],
+                absent_count=row['total'] - row['present'],
+                total_count=row['total'],
+            ))
+            if len(batch) >= batch_size:
+                DailyAttendanceSummary.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            DailyAttendanceSummary.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+def _summary_range(date_from, date_to=None, centers=None):
+    summaries = DailyAttendanceSummary.objects.filter(date__gte=date_from)
+    if date_to:
+        summaries = summaries.filter(date__lte=date_to)
+    if centers is not None:
+        summaries = summaries.filter(center__in=centers)
+    return summaries
+
+
+def _totals(total, present):
+    total = total or 0
+    present = present or 0
+    return {
+        'total_records': total,
+        'present_records': present,
+        'absent_records': total - present,
+        'attendance_rate': (present / total * 100) if total > 0 else 0,
+    }
+
+
+def attendance_totals(date_from, date_to=None, centers=None):
+    """Attendance counts and rate over a date range, read from the daily rollup"""
+    sums = _summary_range(date_from, date_to, centers).aggregate(
+        total=Sum('total_count'),
+        present=Sum('present_count'),
+    )
+    return _totals(sums['total'], sums['present'])
+
+
+def attendance_totals_by_center(date_from, date_to=None, centers=None):
+    """Attendance counts and rate per center id over a date range"""
+    rows = _summary_range(date_from, date_to, centers).values('center_id').annotate(
+        total=Sum('total_count'),
+        present=Sum('present_count'),
+    ).order_by()
+    return defaultdict(
+        lambda: _totals(0, 0),
+        {row['center_id']: _totals(row['total'], row['present']) for row in rows},
+    )
+
+
+def daily_totals_by_center(date_from, date_to=None, centers=None):
+    """Per-center list of (date, present, absent, total) rollup rows over a date range"""
+    rows = _summary_range(date_from, date_to, centers).order_by('center_id', 'date').values_list(
+        'center_id', 'date', 'present_count', 'absent_count', 'total_count'
+    )
+    by_center = defaultdict(list)
+    for center_id, day, present, absent, total in rows.iterator():
+        by_center[center_id].append((day, present, absent, total))
+    return by_center
+
+
+def recent_attendance_rate(days=30, centers=None):
+    """Attendance rate for the last `days` days, as shown on the dashboards"""
+    since = date.today() - timedelta(days=days)
+    return attendance_totals(since, centers=centers)['attendance_rate']
@@ -0,0 +1,252 @@
+"""
+Student search backed by SQLite FTS5.
+
+Two contentless-style FTS5 tables mirror each student (rowid = Student.id):
+
+* students_search: unicode61 words with prefix indexes, for ranked
+  prefix matching on IDs, student names and guardian names.
+* students_search_trigram: trigram tokens, for partial student IDs or name
+  fragments and for typo-tolerant (fuzzy) matching by trigram overlap.
+
+Rows are kept in sync from Student save/delete signals. On other database
+backends, and on SQLite builds without FTS5 or its trigram tokenizer (SQLite
+3.34+), search falls back to icontains filters.
+"""
+import re
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+
+SEARCH_TABLE = 'students_search'
+TRIGRAM_TABLE = 'students_search_trigram'
+COLUMNS = ('student_id', 'first_name', 'last_name', 'guardian_name')
+
+# bm25 column weights: an ID hit beats a name hit beats a guardian hit
+BM25_WEIGHTS = '10.0, 5.0, 5.0, 1.0'
+
+# Minimum trigram similarity for a fuzzy match (pg_trgm's default) and
+# candidate rows fetched per requested result before scoring
+FUZZY_THRESHOLD = 0.3
+FUZZY_CANDIDATES = 10
+
+# Used by the migration that creates the tables
+CREATE_TABLES_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    f"{', '.join(COLUMNS)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TRIGRAM_TABLE} USING fts5("
+    f"{', '.join(COLUMNS)}, tokenize='trigram')",
+]
+DROP_TABLES_SQL = [
+    f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+    f"DROP TABLE IF EXISTS {TRIGRAM_TABLE}",
+]
+
+
+# Connection alias -> whether its SQLite build supports the search tables
+_supported = {}
+
+
+def search_available(using=None):
+    """Whether the database can hold the FTS5 search tables; probed once per connection alias"""
+    using = using or connection
+    if using.vendor != 'sqlite':
+        return False
+    if using.alias not in _supported:
+        try:
+            with transaction.atomic(using=using.alias), using.cursor() as cursor:
+                cursor.execute("CREATE VIRTUAL TABLE temp.students_search_probe USING fts5(value, tokenize='trigram')")
+                cursor.execute("DROP TABLE temp.students_search_probe")
+        except DatabaseError:
+            _supported[using.alias] = False
+        else:
+            _supported[using.alias] = True
+    return _supported[using.alias]
+
+
+def _quote(token):
+    return '"' + token.replace('"', '""') + '"'
+
+
+def _tokens(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def _trigrams(word):
+    # Padded like pg_trgm so the start and end of a word count for more
+    padded = f'  {word.lower()} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(query_tokens, text):
+    """Average over query tokens of the best trigram (Jaccard) similarity to any word of `text`"""
+    words = [_trigrams(word) for word in _tokens(text)]
+    if not query_tokens or not words:
+        return 0.0
+    total = 0.0
+    for token in query_tokens:
+        token_trigrams = _trigrams(token)
+        total += max(len(token_trigrams & word) / len(token_trigrams | word) for word in words)
+    return total / len(query_tokens)
+
+
+def index_students(rows, cursor=None, new=False):
+    """
+    Insert or replace search rows for (id, student_id, first_name, last_name,
+    guardian_name) tuples. Pass new=True for students known to have no rows
+    yet, which skips the (comparatively slow) FTS5 deletes.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    placeholders = ', '.join(['%s'] * (len(COLUMNS) + 1))
+    ids = [(row[0],) for row in rows]
+
+    def write(cursor):
+        for table in (SEARCH_TABLE, TRIGRAM_TABLE):
+            if not new:
+                cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", ids)
+            cursor.executemany(
+                f"INSERT INTO {table} (rowid, {', '.join(COLUMNS)}) VALUES ({placeholders})", rows
+            )
+
+    # One transaction per call: in autocommit mode every row would commit separately
+    with transaction.atomic():
+        if cursor is not None:
+            write(cursor)
+        else:
+            with connection.cursor() as cursor:
+                write(cursor)
+
+
+def index_student(student):
+    if not search_available():
+        return
+    index_students([(student.id, student.student_id, student.first_name,
+                     student.last_name, student.guardian_name)])
+
+
+def remove_student(student_id):
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        for table in (SEARCH_TABLE, TRIGRAM_TABLE):
+            cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [student_id])
+
+
+def rebuild_search_index(batch_size=2000):
+    """Repopulate both search tables from the Student table"""
+    from .models import Student
+
+    if not search_available():
+        return 0
+    indexed = 0
+    with connection.cursor() as cursor:
+        for table in (SEARCH_TABLE, TRIGRAM_TABLE):
+            cursor.execute(f"DELETE FROM {table}")
+        batch = []
+        for row in Student.objects.order_by('id').values_list('id', *COLUMNS).iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                index_students(batch, cursor, new=True)
+                indexed += len(batch)
+                batch = []
+        index_students(batch, cursor, new=True)
+        indexed += len(batch)
+    return indexed
+
+
+def _ranked(cursor, table, columns, match, scope, limit):
+    """
+    Rows of `columns` from `table` matching `match`, best first. `scope` maps
+    Student fields to required values; it is applied by joining the student
+    table, so the LIMIT counts only students within it.
+    """
+    join = where = ''
+    params = [match]
+    if scope:
+        join = f" JOIN students_student ON students_student.id = {table}.rowid"
+        for field, value in scope.items():
+            where += f" AND students_student.{field} = %s"
+            params.append(value)
+    cursor.execute(
+        f"SELECT {', '.join(f'{table}.{column}' for column in columns)} FROM {table}{join} "
+        f"WHERE {table} MATCH %s{where} ORDER BY bm25({table}, {BM25_WEIGHTS}) LIMIT %s",
+        params + [limit],
+    )
+    return cursor.fetchall()
+
+
+def _prefix_matches(cursor, tokens, scope, limit):
+    match = ' AND '.join(f'{_quote(token)}*' for token in tokens)
+    return [row[0] for row in _ranked(cursor, SEARCH_TABLE, ['rowid'], match, scope, limit)]
+
+
+def _substring_matches(cursor, tokens, scope, limit):
+    # The trigram tokenizer matches a quoted string of 3+ characters anywhere in a value
+    tokens = [token for token in tokens if len(token) >= 3]
+    if not tokens:
+        return []
+    match = ' AND '.join(_quote(token) for token in tokens)
+    return [row[0] for row in _ranked(cursor, TRIGRAM_TABLE, ['rowid'], match, scope, limit)]
+
+
+def _fuzzy_matches(cursor, tokens, scope, limit):
+    """
+    Typo-tolerant matches: candidates share a trigram or the first two letters
+    of a query word, and are kept when their trigram similarity clears
+    FUZZY_THRESHOLD.
+    """
+    candidates = {}
+    query_trigrams = {trigram for token in tokens for trigram in _trigrams(token) if trigram.strip() == trigram}
+    lookups = [
+        (TRIGRAM_TABLE, ' OR '.join(_quote(trigram) for trigram in sorted(query_trigrams))),
+        (SEARCH_TABLE, ' OR '.join(f'{_quote(token[:2])}*' for token in tokens)),
+    ]
+    for table, match in lookups:
+        if not match:
+            continue
+        for row in _ranked(cursor, table, ['rowid', *COLUMNS], match, scope, limit * FUZZY_CANDIDATES):
+            candidates[row[0]] = ' '.join(value or '' for value in row[1:])
+
+    scored = []
+    for student_id, text in candidates.items():
+        score = similarity(tokens, text)
+        if score >= FUZZY_THRESHOLD:
+            scored.append((-score, student_id))
+    return [student_id for _, student_id in sorted(scored)]
+
+
+def search_student_ids(query, limit=20, **scope):
+    """
+    Ranked Student ids for a free-text query.
+
+    Prefix matches on whole words come first, then substring matches (partial
+    IDs such as '2024' or 'arm'), then fuzzy trigram matches for misspellings.
+    Keyword arguments (is_active=True, center_id=...) restrict the matches
+    to students with those field values before they are ranked and cut.
+    """
+    tokens = _tokens(query)
+    if not tokens or not search_available():
+        return []
+
+    results = []
+    seen = set()
+    with connection.cursor() as cursor:
+        for matcher in (_prefix_matches, _substring_matches, _fuzzy_matches):
+            if len(results) >= limit:
+                break
+            for student_id in matcher(cursor, tokens, scope, limit):
+                if student_id not in seen:
+                    seen.add(student_id)
+                    results.append(student_id)
+    return results[:limit]
+
+
+def fallback_filter(query):
+    """icontains filter used when FTS5 is not available"""
+    return (
+        Q(first_name__icontains=query) |
+        Q(last_name__icontains=query) |
+        Q(student_id__icontains=query) |
+        Q(guardian_name__icontains=query)
+    )
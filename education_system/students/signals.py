@@ -0,0 +1,165 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from centers.models import Center, Subject
+
+from .bitmaps import apply_attendance_bits
+from .metrics import apply_grade_change, create_empty_metrics, rebuild_student_metrics
+from .models import Attendance, AttendanceBitmap, Grade, Student
+from .rollups import apply_attendance_deltas
+from .search import index_student, index_students, remove_student, search_available
+from .stats import invalidate
+
+# Sent after bulk attendance writes, which bypass post_save; provides `dates`
+attendance_bulk_written = Signal()
+
+# Sent after bulk imports (see students.imports); provide the created `students` / `grades`
+students_bulk_created = Signal()
+grades_bulk_created = Signal()
+
+# Sent after a transferred student's records moved centers; provides `student` and `previous_center_id`
+student_transferred = Signal()
+
+
+@receiver(post_save, sender=Attendance)
+def update_rollup_on_save(sender, instance, created, raw=False, **kwargs):
+    """Keep DailyAttendanceSummary in step with single-row attendance writes"""
+    if raw:
+        return
+
+    current = (instance.center_id, instance.date, instance.is_present)
+    previous = getattr(instance, '_loaded_state', None)
+    if previous == current and not created:
+        return
+
+    deltas = defaultdict(lambda: [0, 0])
+    old_date = None
+    if previous and not created:
+        old_center_id, old_date, old_present = previous
+        deltas[(old_center_id, old_date)][0 if old_present else 1] -= 1
+
+    deltas[(instance.center_id, instance.date)][0 if instance.is_present else 1] += 1
+    apply_attendance_deltas(deltas)
+    apply_attendance_bits([(instance.student_id, instance.center_id, old_date, instance.date, instance.is_present)])
+
+
+@receiver(post_delete, sender=Attendance)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    apply_attendance_deltas({
+        (instance.center_id, instance.date): [-1, 0] if instance.is_present else [0, -1],
+    })
+    apply_attendance_bits([(instance.student_id, instance.center_id, instance.date, None, None)])
+
+
+@receiver(post_save, sender=Grade)
+def update_metrics_on_grade_save(sender, instance, created, raw=False, **kwargs):
+    """Keep StudentMetrics grade totals in step with single-row grade writes"""
+    if raw:
+        return
+
+    current = (instance.subject_id, instance.assessment_date, instance.marks_obtained, instance.total_marks)
+    previous = None if created else getattr(instance, '_loaded_state', None)
+    if previous == current:
+        return
+    apply_grade_change(instance.student_id, previous, current)
+
+
+@receiver(post_delete, sender=Grade)
+def update_metrics_on_grade_delete(sender, instance, **kwargs):
+    state = getattr(instance, '_loaded_state', None) or (
+        instance.subject_id, instance.assessment_date, instance.marks_obtained, instance.total_marks
+    )
+    apply_grade_change(instance.student_id, state, None)
+
+
+@receiver(post_save, sender=Subject)
+def rename_subject_in_metrics(sender, instance, created, raw=False, **kwargs):
+    """Subject names are copied into StudentMetrics; refresh the students who have grades in it"""
+    if raw or created:
+        return
+    rebuild_student_metrics(
+        Grade.objects.filter(subject=instance).values_list('student_id', flat=True).distinct()
+    )
+
+
+@receiver(post_save, sender=Student)
+def create_student_metrics(sender, instance, created, raw=False, **kwargs):
+    """New students start with an empty metrics row, so student_detail never builds one"""
+    if raw or not created:
+        return
+    create_empty_metrics([instance.id])
+
+
+@receiver(post_save, sender=Student)
+def carry_over_transfer(sender, instance, created, raw=False, **kwargs):
+    """Move a transferred student's attendance, grades and bitmaps (and rollup counts) to the new center"""
+    previous = getattr(instance, '_loaded_center_id', None)
+    instance._loaded_center_id = instance.center_id
+    if raw or created or previous is None or previous == instance.center_id:
+        return
+
+    with transaction.atomic():
+        deltas = defaultdict(lambda: [0, 0])
+        for day, is_present in Attendance.objects.filter(student=instance).values_list('date', 'is_present'):
+            slot = 0 if is_present else 1
+            deltas[(previous, day)][slot] -= 1
+            deltas[(instance.center_id, day)][slot] += 1
+
+        Attendance.objects.filter(student=instance).update(center_id=instance.center_id)
+        Grade.objects.filter(student=instance).update(center_id=instance.center_id)
+        AttendanceBitmap.objects.filter(student=instance).update(center_id=instance.center_id)
+        apply_attendance_deltas(deltas)
+    student_transferred.send(sender=Student, student=instance, previous_center_id=previous)
+
+
+@receiver(post_save, sender=Student)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """Keep the student search tables in step with the Student row"""
+    # Fixtures may load before the search tables exist; rebuild_student_search catches them up
+    if raw:
+        return
+    index_student(instance)
+
+
+@receiver(post_delete, sender=Student)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_student(instance.id)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_stats(sender, **kwargs):
+    invalidate('students')
+
+
+@receiver(post_save, sender=Center)
+@receiver(post_delete, sender=Center)
+def invalidate_center_stats(sender, **kwargs):
+    invalidate('centers')
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+@receiver(attendance_bulk_written)
+def invalidate_attendance_stats(sender, **kwargs):
+    invalidate('attendance')
+
+
+@receiver(students_bulk_created)
+def index_imported_students(sender, students, **kwargs):
+    """Imported students get search rows, empty metrics and fresh statistics"""
+    if search_available():
+        index_students([
+            (student.id, student.student_id, student.first_name, student.last_name, student.guardian_name)
+            for student in students
+        ], new=True)
+    create_empty_metrics([student.id for student in students])
+    invalidate('students')
+
+
+@receiver(grades_bulk_created)
+def update_metrics_for_imported_grades(sender, grades, **kwargs):
+    rebuild_student_metrics({grade.student_id for grade in grades})
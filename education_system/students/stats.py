@@ -0,0 +1,115 @@
+"""
+Shared dashboard statistics, cached with generation-versioned keys.
+
+Each statistic depends on one or more data groups ('students', 'centers',
+'attendance'). Every group has a generation counter in the cache, and the
+counters it depends on are part of a statistic's key. Save/delete signals
+bump a group's counter once the write commits, so the next read misses and
+recomputes instead of serving numbers from before the change; superseded
+entries simply expire. STATS_CACHE_TTLS bounds how long any value lives.
+
+The cache is settings.CACHES[STATS_CACHE_ALIAS]. A per-process local-memory
+cache only sees bumps made in the same process; deployments with several
+processes should point it at the file-based or Redis backend.
+
+Values are always computed on the primary, never the reporting snapshot
+(education_system.reporting_db): a recompute follows a generation bump, and
+a snapshot taken before the write would be cached for the whole TTL.
+"""
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Q
+
+from centers.models import Center
+
+from .models import Student
+from .rollups import recent_attendance_rate
+
+GROUPS = ('students', 'centers', 'attendance')
+
+def stats_cache():
+    return caches[getattr(settings, 'STATS_CACHE_ALIAS', 'default')]
+
+
+def _ttl(name):
+    return getattr(settings, 'STATS_CACHE_TTLS', {}).get(name, 300)
+
+
+def _generation_key(group):
+    return f'stats:generation:{group}'
+
+
+def generation(group):
+    cache = stats_cache()
+    key = _generation_key(group)
+    value = cache.get(key)
+    if value is None:
+        # Seed from the clock so a counter lost to eviction or a restart never
+        # comes back at a value whose entries are still cached
+        cache.add(key, time.time_ns(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def bump_generation(group):
+    cache = stats_cache()
+    key = _generation_key(group)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def invalidate(*groups):
+    """Bump the groups' generations after the current transaction commits"""
+    for group in groups:
+        transaction.on_commit(lambda group=group: bump_generation(group))
+
+
+def cached_stat(name, groups, compute, *key_parts):
+    """Return the cached value of a statistic, computing and storing it on a miss"""
+    generations = '.'.join(str(generation(group)) for group in groups)
+    key = ':'.join(['stats', name, generations, *(str(part) for part in key_parts)])
+    cache = stats_cache()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout=_ttl(name))
+    return value
+
+
+def active_student_count():
+    return cached_stat(
+        'active_students', ['students'],
+        lambda: Student.objects.filter(is_active=True).count(),
+    )
+
+
+def active_center_count():
+    return cached_stat(
+        'active_centers', ['centers'],
+        lambda: Center.objects.filter(is_active=True).count(),
+    )
+
+
+def attendance_rate(days=30):
+    # The window moves at midnight, so today's date is part of the key
+    return cached_stat(
+        'attendance_rate', ['attendance'],
+        lambda: recent_attendance_rate(days=days),
+        days, date.today().isoformat(),
+    )
+
+
+def center_student_counts():
+    """Active centers with their active student counts, as plain dicts"""
+    return cached_stat(
+        'center_student_counts', ['students', 'centers'],
+        lambda: list(Center.objects.filter(is_active=True).annotate(
+            student_count=Count('student', filter=Q(student__is_active=True))
+        ).values('id', 'name', 'location', 'capacity', 'student_count')),
+    )
@@ -0,0 +1,230 @@
+"""
+Deterministic synthetic datasets for load testing and benchmarks.
+
+generate_dataset() creates N centers (each with its own coordinator user),
+M students spread unevenly across them, attendance for D school days
+(Mondays to Saturdays) ending at end_date, and G grades per student. The
+same seed and parameters always produce the same rows. Everything is
+written with bulk_create, so the derived tables (daily attendance rollup,
+student metrics, attendance bitmaps, search index) are rebuilt afterwards
+and the dashboard statistics invalidated.
+
+Synthetic rows are recognisable by their names (see the *_PREFIX constants),
+which is how clear_synthetic_data() finds them again.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from centers.models import Center, Subject
+
+from .bitmaps import rebuild_attendance_bitmaps
+from .metrics import rebuild_student_metrics
+from .models import Attendance, AttendanceBitmap, DailyAttendanceSummary, Grade, Student, StudentMetrics
+from .rollups import rebuild_daily_summaries
+from .search import rebuild_search_index
+from .stats import invalidate
+
+STUDENT_PREFIX = 'SYN'
+CENTER_PREFIX = 'Synthetic Center '
+COORDINATOR_PREFIX = 'synthetic-coordinator-'
+
+SUBJECTS = [
+    ('Mathematics', 'MATH'),
+    ('English', 'ENG'),
+    ('Science', 'SCI'),
+    ('Social Studies', 'SST'),
+    ('Hindi', 'HIN'),
+    ('Computer Basics', 'COMP'),
+]
+
+CITIES = ['Mumbai', 'Pune', 'Delhi', 'Kolkata', 'Chennai', 'Bengaluru', 'Hyderabad', 'Jaipur',
+          'Lucknow', 'Patna', 'Bhopal', 'Nagpur']
+FIRST_NAMES = ['Aarav', 'Aditi', 'Ananya', 'Arjun', 'Diya', 'Ishaan', 'Kavya', 'Krishna', 'Meera',
+               'Neha', 'Priya', 'Rahul', 'Riya', 'Rohan', 'Saanvi', 'Sai', 'Shreya', 'Vihaan',
+               'Vivaan', 'Zara', 'Aisha', 'Kabir', 'Tara', 'Dev', 'Anika', 'Yash', 'Pooja', 'Nikhil']
+LAST_NAMES = ['Sharma', 'Verma', 'Patel', 'Reddy', 'Iyer', 'Nair', 'Gupta', 'Singh', 'Kumar', 'Das',
+              'Banerjee', 'Mehta', 'Joshi', 'Khan', 'Rao', 'Pillai', 'Chopra', 'Bose', 'Yadav', 'Mishra']
+
+# (minimum percentage, letter), highest first
+GRADE_LETTERS = [(90, 'A+'), (80, 'A'), (70, 'B'), (60, 'C'), (50, 'D'), (0, 'F')]
+
+
+def grade_letter(percentage):
+    for minimum, letter in GRADE_LETTERS:
+        if percentage >= minimum:
+            return letter
+    return GRADE_LETTERS[-1][1]
+
+
+def school_days(end_date, days):
+    """The last `days` dates up to end_date, skipping Sundays, oldest first"""
+    dates = []
+    day = end_date
+    while len(dates) < days:
+        if day.weekday() != 6:
+            dates.append(day)
+        day -= timedelta(days=1)
+    return dates[::-1]
+
+
+def synthetic_data_exists():
+    return Center.objects.filter(name__startswith=CENTER_PREFIX).exists()
+
+
+def _bulk_create(model, objects, batch_size):
+    with transaction.atomic():
+        return model.objects.bulk_create(objects, batch_size=batch_size)
+
+
+def generate_dataset(centers=5, students=500, days=30, grades_per_student=5, seed=1, end_date=None,
+                     batch_size=2000):
+    """
+    Create one synthetic dataset; returns the number of rows created per model.
+
+    Refuses to run while synthetic data from an earlier call is present
+    (see clear_synthetic_data), since student IDs would collide.
+    """
+    if synthetic_data_exists():
+        raise ValueError('Synthetic data already exists; clear it first')
+    rng = random.Random(seed)
+    end_date = end_date or timezone.localdate()
+    dates = school_days(end_date, days)
+
+    subjects = []
+    for name, code in SUBJECTS:
+        subject, _ = Subject.objects.get_or_create(code=code, defaults={'name': name})
+        subjects.append(subject.id)
+
+    coordinators = _bulk_create(User, [
+        User(username=f'{COORDINATOR_PREFIX}{n:03d}', first_name=rng.choice(FIRST_NAMES),
+             last_name=rng.choice(LAST_NAMES))
+        for n in range(1, centers + 1)
+    ], batch_size)
+    # bulk_create does not return primary keys for every backend/model; look them up
+    coordinator_ids = dict(User.objects.filter(
+        username__startswith=COORDINATOR_PREFIX
+    ).values_list('username', 'id'))
+    center_rows = _bulk_create(Center, [
+        Center(
+            name=f'{CENTER_PREFIX}{n:03d}',
+            location=rng.choice(CITIES),
+            coordinator_id=coordinator_ids[user.username],
+            established_date=end_date - timedelta(days=rng.randint(365, 3650)),
+            capacity=rng.randint(5, 40) * 10,
+            is_active=rng.random() > 0.05,
+        )
+        for n, user in enumerate(coordinators, start=1)
+    ], batch_size)
+    center_ids = list(Center.objects.filter(
+        name__startswith=CENTER_PREFIX
+    ).order_by('name').values_list('id', flat=True))
+
+    # Uneven center sizes, like real enrolment
+    center_weights = [rng.uniform(0.3, 1.0) for _ in center_rows]
+    student_centers = rng.choices(center_ids, weights=center_weights, k=students)
+    enrollment_dates = []
+    student_rows = []
+    for n, center_id in enumerate(student_centers, start=1):
+        last_name = rng.choice(LAST_NAMES)
+        student_rows.append(Student(
+            student_id=f'{STUDENT_PREFIX}{n:07d}',
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=last_name,
+            date_of_birth=end_date - timedelta(days=rng.randint(6 * 365, 16 * 365)),
+            gender=rng.choice('MF' * 9 + 'O'),
+            center_id=center_id,
+            is_active=rng.random() > 0.03,
+            guardian_name=f'{rng.choice(FIRST_NAMES)} {last_name}',
+            guardian_phone=f'9{rng.randint(0, 999999999):09d}',
+        ))
+        enrollment_dates.append(dates[0] - timedelta(days=rng.randint(0, 730)))
+    _bulk_create(Student, student_rows, batch_size)
+    student_ids = list(Student.objects.filter(
+        student_id__startswith=STUDENT_PREFIX
+    ).order_by('student_id').values_list('id', flat=True))
+
+    # enrollment_date is auto_now_add; spread it out afterwards, one UPDATE per date
+    by_enrollment = {}
+    for student_id, enrolled in zip(student_ids, enrollment_dates):
+        by_enrollment.setdefault(enrolled, []).append(student_id)
+    with transaction.atomic():
+        for enrolled, ids in by_enrollment.items():
+            Student.objects.filter(id__in=ids).update(enrollment_date=enrolled)
+
+    counts = {'users': len(coordinators), 'centers': len(center_rows), 'students': len(student_rows),
+              'attendance': 0, 'grades': 0}
+
+    # Each student has their own attendance habit and ability
+    attendance_rates = [rng.uniform(0.55, 0.98) for _ in student_ids]
+    abilities = [rng.gauss(65, 12) for _ in student_ids]
+
+    batch = []
+    for day in dates:
+        for student_id, center_id, rate in zip(student_ids, student_centers, attendance_rates):
+            batch.append(Attendance(student_id=student_id, center_id=center_id, date=day,
+                                    is_present=rng.random() < rate))
+            if len(batch) >= batch_size:
+                counts['attendance'] += len(_bulk_create(Attendance, batch, batch_size))
+                batch = []
+    if batch:
+        counts['attendance'] += len(_bulk_create(Attendance, batch, batch_size))
+
+    batch = []
+    for student_id, center_id, ability in zip(student_ids, student_centers, abilities):
+        for _ in range(grades_per_student):
+            total = rng.choice([50, 100, 100, 100])
+            percentage = min(100, max(0, rng.gauss(ability, 10)))
+            marks = round(total * percentage / 100)
+            batch.append(Grade(
+                student_id=student_id, center_id=center_id, subject_id=rng.choice(subjects),
+                assessment_date=rng.choice(dates), marks_obtained=marks, total_marks=total,
+                grade_letter=grade_letter(marks * 100 / total),
+            ))
+            if len(batch) >= batch_size:
+                counts['grades'] += len(_bulk_create(Grade, batch, batch_size))
+                batch = []
+    if batch:
+        counts['grades'] += len(_bulk_create(Grade, batch, batch_size))
+
+    rebuild_daily_summaries(dates[0], dates[-1])
+    rebuild_student_metrics(student_ids)
+    rebuild_attendance_bitmaps(student_ids)
+    rebuild_search_index()
+    invalidate('students', 'centers', 'attendance')
+    return counts
+
+
+def clear_synthetic_data():
+    """
+    Delete everything generate_dataset() created; returns the number of students removed.
+
+    Attendance and grades are deleted with plain SQL rather than through the
+    ORM (which would send a signal per row), then the derived tables are rebuilt.
+    """
+    center_ids = list(Center.objects.filter(name__startswith=CENTER_PREFIX).values_list('id', flat=True))
+    if not center_ids:
+        return 0
+    placeholders = ', '.join(['%s'] * len(center_ids))
+    students = Student.objects.filter(center_id__in=center_ids)
+    student_ids = list(students.values_list('id', flat=True))
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for model in (Attendance, AttendanceBitmap, Grade, DailyAttendanceSummary):
+                cursor.execute(
+                    f'DELETE FROM {model._meta.db_table} WHERE center_id IN ({placeholders})', center_ids
+                )
+            StudentMetrics.objects.filter(student_id__in=student_ids).delete()
+            cursor.execute(
+                f'DELETE FROM {Student._meta.db_table} WHERE center_id IN ({placeholders})', center_ids
+            )
+        Center.objects.filter(id__in=center_ids).delete()
+        User.objects.filter(username__startswith=COORDINATOR_PREFIX).delete()
+
+    rebuild_search_index()
+    invalidate('students', 'centers', 'attendance')
+    return len(student_ids)
@@ -1,3 +1,756 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from centers.models import Center, Subject
+from education_system.instrumentation import registry
+from education_system.reporting_db import current_source
+
+from .bitmaps import (
+    attendance_by_student, load_bitmaps, longest_present_streak, rebuild_attendance_bitmaps, student_attendance,
+)
+from .bulk import bulk_mark_attendance
+from .imports import import_grades, import_students, read_rows
+from .metrics import rebuild_student_metrics
+from .models import Attendance, AttendanceBitmap, DailyAttendanceSummary, Grade, Student, StudentMetrics
+from .rollups import attendance_totals, rebuild_daily_summaries
+from .search import search_available, search_student_ids
+from .stats import _generation_key, active_student_count, cached_stat, center_student_counts, stats_cache
+from .synthetic import clear_synthetic_data, generate_dataset
+
+
+class SyntheticDataTests(TestCase):
+    params = {'centers': 3, 'students': 40, 'days': 6, 'grades_per_student': 3, 'seed': 7,
+              'end_date': date(2024, 3, 16)}
+
+    def snapshot(self):
+        return (
+            list(Student.objects.order_by('student_id').values_list(
+                'student_id', 'first_name', 'last_name', 'center__name', 'enrollment_date')),
+            list(Attendance.objects.order_by('student__student_id', 'date').values_list(
+                'student__student_id', 'date', 'is_present')),
+            list(Grade.objects.order_by('id').values_list(
+                'student__student_id', 'subject__code', 'assessment_date', 'marks_obtained', 'total_marks')),
+        )
+
+    def test_same_seed_same_data(self):
+        counts = generate_dataset(**self.params)
+        self.assertEqual(counts['students'], 40)
+        self.assertEqual(counts['attendance'], 40 * 6)
+        self.assertEqual(counts['grades'], 40 * 3)
+        first = self.snapshot()
+
+        self.assertEqual(clear_synthetic_data(), 40)
+        self.assertFalse(Student.objects.exists())
+        generate_dataset(**self.params)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_derived_tables_are_built(self):
+        generate_dataset(**self.params)
+        # Sunday 2024-03-10 is skipped
+        self.assertNotIn(date(2024, 3, 10), set(Attendance.objects.values_list('date', flat=True)))
+        self.assertEqual(DailyAttendanceSummary.objects.aggregate(total=Sum('total_count'))['total'], 240)
+        self.assertEqual(StudentMetrics.objects.aggregate(grades=Sum('grade_count'))['grades'], 120)
+        # Six school days in one month: one bitmap per student
+        self.assertEqual(AttendanceBitmap.objects.count(), 40)
+
+
+class AttendanceRollupTests(TestCase):
+    """DailyAttendanceSummary follows every kind of attendance write and matches a full rebuild"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='coordinator')
+        cls.center, cls.other_center = [
+            Center.objects.create(name=name, location='Mumbai', coordinator=user,
+                                  established_date=date(2020, 1, 1), capacity=100)
+            for name in ('Central Learning Hub', 'North Learning Hub')
+        ]
+        cls.students = [
+            Student.objects.create(
+                student_id=f'STU00{n}', first_name='Asha', last_name='Rao', date_of_birth=date(2012, 1, 1),
+                gender='F', center=cls.center, guardian_name='Guardian', guardian_phone='0000000000',
+            )
+            for n in range(3)
+        ]
+
+    def rollup(self):
+        # A rebuild drops the rows that incremental updates leave at zero
+        return list(DailyAttendanceSummary.objects.filter(total_count__gt=0).order_by('center_id', 'date').values_list(
+            'center_id', 'date', 'present_count', 'absent_count', 'total_count'))
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollup()
+        rebuild_daily_summaries()
+        self.assertEqual(self.rollup(), incremental)
+        return incremental
+
+    def test_single_row_writes(self):
+        day, next_day = date(2025, 1, 6), date(2025, 1, 7)
+        first, second, third = self.students
+        Attendance.objects.create(student=first, date=day, is_present=True)
+        record = Attendance.objects.create(student=second, date=day, is_present=True)
+        self.assertEqual(self.assertMatchesRebuild(), [(self.center.id, day, 2, 0, 2)])
+
+        # Status change, on the instance that created the row and on one loaded from the database
+        record.is_present = False
+        record.save()
+        self.assertEqual(self.assertMatchesRebuild(), [(self.center.id, day, 1, 1, 2)])
+        record = Attendance.objects.get(id=record.id)
+        record.is_present = True
+        record.save()
+        record.save()  # unchanged: no delta
+        self.assertEqual(self.assertMatchesRebuild(), [(self.center.id, day, 2, 0, 2)])
+
+        # Date change moves the count
+        record = Attendance.objects.get(id=record.id)
+        record.date = next_day
+        record.is_present = False
+        record.save()
+        self.assertEqual(self.assertMatchesRebuild(),
+                         [(self.center.id, day, 1, 0, 1), (self.center.id, next_day, 0, 1, 1)])
+
+        Attendance.objects.create(student=third, date=next_day, is_present=True)
+        Attendance.objects.get(id=record.id).delete()
+        self.assertEqual(self.assertMatchesRebuild(),
+                         [(self.center.id, day, 1, 0, 1), (self.center.id, next_day, 1, 0, 1)])
+
+    def test_bulk_writes_and_transfer(self):
+        day = date(2025, 1, 6)
+        centers = {student.id: self.center.id for student in self.students}
+        first, second, third = self.students
+        bulk_mark_attendance({first.id: ('present', ''), second.id: ('absent', '')}, day, centers)
+        bulk_mark_attendance({first.id: ('absent', ''), second.id: ('absent', 'Ill'), third.id: ('present', '')},
+                             day, centers)
+        self.assertEqual(self.assertMatchesRebuild(), [(self.center.id, day, 1, 2, 3)])
+
+        first.center = self.other_center
+        first.save()
+        self.assertEqual(self.assertMatchesRebuild(),
+                         [(self.center.id, day, 1, 1, 2), (self.other_center.id, day, 0, 1, 1)])
+        self.assertAlmostEqual(attendance_totals(day, day)['attendance_rate'], 100 / 3)
+
+        second.delete()
+        self.assertEqual(self.assertMatchesRebuild(),
+                         [(self.center.id, day, 1, 0, 1), (self.other_center.id, day, 0, 1, 1)])
+
+    def test_rebuild_command(self):
+        days = [date(2025, 1, 6), date(2025, 1, 7)]
+        for day in days:
+            Attendance.objects.create(student=self.students[0], date=day, is_present=True)
+        expected = self.rollup()
+        DailyAttendanceSummary.objects.update(present_count=0, absent_count=5, total_count=5)
+
+        call_command('rebuild_attendance_rollup', '--from', '2025-01-07', stdout=StringIO())
+        self.assertEqual(self.rollup(), [(self.center.id, days[0], 0, 5, 5), expected[1]])
+        call_command('rebuild_attendance_rollup', stdout=StringIO())
+        self.assertEqual(self.rollup(), expected)
+
+
+class BulkMarkAttendanceTests(TestCase):
+    """bulk_mark_attendance writes only what changed and keeps the rollup and bitmaps in step"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='coordinator')
+        cls.center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        cls.students = [
+            Student.objects.create(
+                student_id=f'STU00{n}', first_name='Asha', last_name='Rao', date_of_birth=date(2012, 1, 1),
+                gender='F', center=cls.center, guardian_name='Guardian', guardian_phone='0000000000',
+            )
+            for n in range(4)
+        ]
+        cls.centers = {student.id: cls.center.id for student in cls.students}
+        cls.day = date(2025, 1, 6)
+
+    def derived(self):
+        return (
+            list(DailyAttendanceSummary.objects.filter(total_count__gt=0).order_by('center_id', 'date').values_list(
+                'center_id', 'date', 'present_count', 'absent_count', 'total_count')),
+            list(AttendanceBitmap.objects.filter(recorded__gt=0).order_by('student_id', 'month').values_list(
+                'student_id', 'month', 'recorded', 'present')),
+        )
+
+    def assertDerivedMatchRows(self):
+        incremental = self.derived()
+        rebuild_daily_summaries()
+        rebuild_attendance_bitmaps()
+        self.assertEqual(self.derived(), incremental)
+
+    def test_diff_and_bulk_write(self):
+        first, second, third, fourth = self.students
+        result = bulk_mark_attendance({first.id: ('present', ''), second.id: ('absent', '')}, self.day, self.centers)
+        self.assertEqual((result['created'], result['updated'], result['unchanged']), (2, 0, 0))
+
+        result = bulk_mark_attendance({
+            first.id: ('present', ''),  # unchanged
+            second.id: ('absent', 'Ill'),  # remarks only
+            third.id: ('present', ''),  # new
+            fourth.id: ('late', ''),  # invalid status
+            999: ('present', ''),  # not in the center
+        }, self.day, self.centers)
+        self.assertEqual((result['created'], result['updated'], result['unchanged'], result['failed']), (1, 1, 1, 2))
+        self.assertEqual({student_id for student_id, _ in result['errors']}, {fourth.id, 999})
+        self.assertEqual(Attendance.objects.get(student=second, date=self.day).remarks, 'Ill')
+
+        bulk_mark_attendance({first.id: ('absent', ''), second.id: ('present', 'Ill')}, self.day, self.centers)
+        self.assertEqual(
+            DailyAttendanceSummary.objects.values_list('present_count', 'absent_count', 'total_count').get(),
+            (2, 1, 3),
+        )
+        self.assertDerivedMatchRows()
+
+    def test_integrity_error_falls_back_to_row_upserts(self):
+        first, second = self.students[:2]
+        # Another request marked the first student after our read of the existing rows
+        Attendance.objects.create(student=first, date=self.day, is_present=False)
+        with mock.patch.object(Attendance.objects, 'filter', return_value=Attendance.objects.none()):
+            result = bulk_mark_attendance({first.id: ('present', ''), second.id: ('absent', '')},
+                                          self.day, self.centers)
+        self.assertEqual((result['created'], result['updated'], result['failed']), (1, 1, 0))
+        self.assertEqual(
+            dict(Attendance.objects.filter(date=self.day).values_list('student_id', 'is_present')),
+            {first.id: True, second.id: False},
+        )
+        self.assertDerivedMatchRows()
+
+    def test_mark_attendance_view(self):
+        first, second, third = self.students[:3]
+        Attendance.objects.create(student=first, date=self.day, is_present=False)
+        other = Center.objects.create(
+            name='North Learning Hub', location='Pune', coordinator=self.center.coordinator,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        response = self.client.post(f"{reverse('mark_attendance')}?center={other.id}", {
+            'attendance_date': self.day.isoformat(), f'student_{first.id}': 'present',
+        }, follow=True)
+        # Students outside the selected center are failures, not writes
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)],
+                         ['❌ Failed to mark attendance for 1 students.'])
+
+        response = self.client.post(reverse('mark_attendance'), {
+            'attendance_date': self.day.isoformat(),
+            f'student_{first.id}': 'present',
+            f'student_{second.id}': 'absent', f'remarks_{second.id}': 'Ill',
+            f'student_{third.id}': 'late',
+        }, follow=True)
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)][-2:], [
+            '✅ Successfully marked attendance for 2 students!',
+            '❌ Failed to mark attendance for 1 students.',
+        ])
+        self.assertEqual(
+            list(Attendance.objects.filter(date=self.day).order_by('student_id').values_list(
+                'student_id', 'is_present', 'remarks')),
+            [(first.id, True, ''), (second.id, False, 'Ill')],
+        )
+        self.assertDerivedMatchRows()
+
+
+class MarkAttendancePageTests(TestCase):
+    """The attendance page renders in a fixed number of queries and stores what was submitted"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='coordinator')
+        cls.center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        cls.day = date(2025, 1, 6)
+
+    def add_students(self, count):
+        students = []
+        for _ in range(count):
+            n = Student.objects.count()
+            students.append(Student.objects.create(
+                student_id=f'STU{n:03d}', first_name='Asha', last_name=f'Rao {n}', date_of_birth=date(2012, 1, 1),
+                gender='F', center=self.center, guardian_name='Guardian', guardian_phone='0000000000',
+            ))
+        return students
+
+    def get_page(self):
+        return self.client.get(reverse('mark_attendance'), {'date': self.day.isoformat(), 'center': self.center.id})
+
+    def test_queries_do_not_grow_with_students(self):
+        for student in self.add_students(3):
+            Attendance.objects.create(student=student, date=self.day, is_present=student.id % 2 == 0)
+        self.get_page()  # warm up the session and content types
+        # Students (with the day's status), the day's totals and the center list
+        with self.assertNumQueries(3):
+            response = self.get_page()
+        self.assertEqual(response.context['student_count'], 3)
+
+        for student in self.add_students(10):
+            Attendance.objects.create(student=student, date=self.day, is_present=True)
+        with self.assertNumQueries(3):
+            response = self.get_page()
+        summary = response.context['attendance_summary']
+        self.assertEqual((summary['total'], summary['present'] + summary['absent']), (13, 13))
+        statuses = {student.id: student.today_is_present for student in response.context['students']}
+        self.assertEqual(statuses, dict(Attendance.objects.filter(date=self.day).values_list('student_id', 'is_present')))
+
+    def test_post_stores_submitted_statuses(self):
+        present, absent, unmarked = self.add_students(3)
+        self.client.post(reverse('mark_attendance'), {
+            'attendance_date': self.day.isoformat(),
+            f'student_{present.id}': 'present',
+            f'student_{absent.id}': 'absent', f'remarks_{absent.id}': 'Travelling',
+        })
+        self.assertEqual(
+            list(Attendance.objects.filter(date=self.day).order_by('student_id').values_list(
+                'student_id', 'is_present', 'remarks')),
+            [(present.id, True, ''), (absent.id, False, 'Travelling')],
+        )
+        response = self.get_page()
+        statuses = {student.id: student.today_is_present for student in response.context['students']}
+        self.assertEqual(statuses, {present.id: True, absent.id: False, unmarked.id: None})
+        self.assertContains(response, 'Already marked', count=2)
+
+
+@mock.patch('students.views.GRADES_PER_PAGE', 3)
+class GradeListPaginationTests(TestCase):
+    """Grade list cursors walk every row exactly once, through tied dates and with filters applied"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='coordinator')
+        cls.center, cls.other_center = [
+            Center.objects.create(name=name, location='Mumbai', coordinator=user,
+                                  established_date=date(2020, 1, 1), capacity=100)
+            for name in ('Central Learning Hub', 'North Learning Hub')
+        ]
+        cls.math = Subject.objects.create(name='Mathematics', code='MATH')
+        cls.science = Subject.objects.create(name='Science', code='SCI')
+        students = [
+            Student.objects.create(
+                student_id=f'S{n}', first_name='Asha', last_name=f'Rao {n}', date_of_birth=date(2012, 1, 1),
+                gender='F', center=center, guardian_name='Guardian', guardian_phone='0000000000',
+            )
+            for n, center in enumerate([cls.center, cls.other_center])
+        ]
+        # Four grades share each assessment date, so page boundaries fall inside ties
+        for n in range(16):
+            Grade.objects.create(
+                student=students[n % 2], subject=cls.math if n % 4 < 2 else cls.science,
+                assessment_date=date(2025, 1, 10 + n // 4), marks_obtained=50 + n, total_marks=100, grade_letter='C',
+            )
+
+    def get(self, **params):
+        response = self.client.get(reverse('grade_list'), params)
+        return response.context
+
+    def walk_forward(self, **filters):
+        pages = [self.get(**filters)]
+        while pages[-1]['next_cursor']:
+            pages.append(self.get(**filters, after=pages[-1]['next_cursor']))
+        return pages
+
+    def ids(self, page):
+        return [row['id'] for row in page['grades']]
+
+    def test_cursors_visit_every_row_once(self):
+        pages = self.walk_forward()
+        expected = list(Grade.objects.order_by('-assessment_date', '-id').values_list('id', flat=True))
+        self.assertEqual([grade_id for page in pages for grade_id in self.ids(page)], expected)
+        self.assertEqual([len(page['grades']) for page in pages], [3, 3, 3, 3, 3, 1])
+        self.assertIsNone(pages[0]['previous_cursor'])
+        self.assertIsNone(pages[-1]['next_cursor'])
+
+    def test_previous_cursor_returns_the_same_pages(self):
+        pages = self.walk_forward()
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.get(before=page['previous_cursor'])
+            self.assertEqual(self.ids(page), self.ids(expected))
+            self.assertEqual(page['next_cursor'], expected['next_cursor'])
+        self.assertIsNone(page['previous_cursor'])
+
+    def test_filters_apply_with_the_cursor(self):
+        filters = {'center': str(self.other_center.id), 'date_from': '2025-01-11'}
+        pages = self.walk_forward(**filters)
+        expected = list(Grade.objects.filter(
+            center=self.other_center, assessment_date__gte=date(2025, 1, 11),
+        ).order_by('-assessment_date', '-id').values_list('id', flat=True))
+        self.assertEqual(len(expected), 6)
+        self.assertEqual([self.ids(page) for page in pages], [expected[:3], expected[3:]])
+        self.assertEqual(pages[0]['filter_query'], urlencode(filters))
+        self.assertEqual(self.ids(self.get(**filters, before=pages[1]['previous_cursor'])), expected[:3])
+
+        math = self.get(**filters, subject=str(self.math.id), after=pages[0]['next_cursor'])
+        expected_math = list(Grade.objects.filter(id__in=expected[3:], subject=self.math).order_by(
+            '-assessment_date', '-id').values_list('id', flat=True))
+        self.assertTrue(expected_math)
+        self.assertEqual(self.ids(math), expected_math)
+
+
+class AttendanceBitmapTests(TestCase):
+    """The monthly bitmaps follow every kind of attendance write and answer range queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='coordinator')
+        cls.center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        cls.student = Student.objects.create(
+            student_id='STU001', first_name='Asha', last_name='Rao', date_of_birth=date(2012, 1, 1),
+            gender='F', center=cls.center, guardian_name='Guardian', guardian_phone='0000000000',
+        )
+
+    def bitmaps(self):
+        return list(AttendanceBitmap.objects.order_by('month').values_list('month', 'recorded', 'present'))
+
+    def test_single_row_writes(self):
+        jan31 = Attendance.objects.create(student=self.student, date=date(2025, 1, 31), is_present=True)
+        Attendance.objects.create(student=self.student, date=date(2025, 2, 1), is_present=False)
+        self.assertEqual(self.bitmaps(), [(date(2025, 1, 1), 1 << 30, 1 << 30), (date(2025, 2, 1), 1, 0)])
+
+        jan31.is_present = False
+        jan31.save()
+        self.assertEqual(self.bitmaps()[0], (date(2025, 1, 1), 1 << 30, 0))
+
+        jan31.date = date(2025, 1, 2)
+        jan31.save()
+        self.assertEqual(self.bitmaps()[0], (date(2025, 1, 1), 1 << 1, 0))
+
+        jan31.delete()
+        self.assertEqual(self.bitmaps()[0], (date(2025, 1, 1), 0, 0))
+
+    def test_bulk_writes_and_rebuild_agree(self):
+        for offset in range(10):
+            day = date(2025, 3, 3) + timedelta(days=offset)
+            result = bulk_mark_attendance({self.student.id: ('present' if offset < 6 else 'absent', '')}, day,
+                                          {self.student.id: self.center.id})
+            self.assertEqual(result['created'], 1)
+        incremental = self.bitmaps()
+        rebuild_attendance_bitmaps()
+        self.assertEqual(self.bitmaps(), incremental)
+
+        summary = student_attendance(self.student.id, date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual((summary['recorded_days'], summary['present_days']), (10, 6))
+        self.assertEqual((summary['absence_streak'], summary['present_streak']), (4, 0))
+        months = load_bitmaps(date(2025, 3, 1), date(2025, 3, 31))[self.student.id]
+        self.assertEqual(longest_present_streak(months), 6)
+        # A run spans days without a record and month boundaries
+        Attendance.objects.create(student=self.student, date=date(2025, 4, 1), is_present=True)
+        Attendance.objects.create(student=self.student, date=date(2025, 4, 3), is_present=True)
+        self.assertEqual(student_attendance(self.student.id, date(2025, 3, 1), date(2025, 4, 30))['present_streak'], 2)
+        # Ranges cut months at the exact day
+        self.assertEqual(student_attendance(self.student.id, date(2025, 3, 5), date(2025, 3, 8))['present_days'], 4)
+        self.assertEqual(attendance_by_student(date(2025, 3, 1), date(2025, 3, 31),
+                                               centers=[self.center])[self.student.id], summary)
+
+    def test_detail_pages(self):
+        today = date.today()
+        for offset in range(1, 6):
+            Attendance.objects.create(student=self.student, date=today - timedelta(days=offset), is_present=offset > 2)
+        response = self.client.get(reverse('student_detail', args=[self.student.id]))
+        self.assertEqual((response.context['attendance_percentage'], response.context['days_tracked']), (60.0, 5))
+        self.assertEqual(response.context['absence_streak'], 2)
+        self.assertEqual(len(response.context['recent_attendance']), 5)
+
+        response = self.client.get(reverse('center_detail', args=[self.center.id]))
+        self.assertEqual((response.context['attendance_rate'], response.context['low_attendance_count']), (60.0, 1))
+        self.assertContains(response, '2 absent')
+
+
+class StudentMetricsTests(TestCase):
+    """Grade writes keep StudentMetrics equal to a rebuild, and student_detail reads it within budget"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='coordinator')
+        cls.center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        cls.maths = Subject.objects.create(name='Maths', code='MTH')
+        cls.science = Subject.objects.create(name='Science', code='SCI')
+        cls.student = Student.objects.create(
+            student_id='STU001', first_name='Asha', last_name='Rao', date_of_birth=date(2012, 1, 1),
+            gender='F', center=cls.center, guardian_name='Guardian', guardian_phone='0000000000',
+        )
+
+    def metrics(self):
+        row = StudentMetrics.objects.get(student=self.student)
+        return (row.marks_obtained_total, row.total_marks_total, row.grade_count,
+                row.last_assessment_date, row.subject_totals)
+
+    def assertMatchesRebuild(self):
+        incremental = self.metrics()
+        rebuild_student_metrics([self.student.id])
+        self.assertEqual(self.metrics(), incremental)
+        return incremental
+
+    def grade(self, subject, day, marks):
+        return Grade.objects.create(student=self.student, subject=subject, assessment_date=day,
+                                    marks_obtained=marks, total_marks=100, grade_letter='B')
+
+    def test_new_student_has_empty_metrics(self):
+        self.assertEqual(self.metrics(), (0, 0, 0, None, {}))
+
+    def test_grade_writes(self):
+        first = self.grade(self.maths, date(2025, 1, 10), 60)
+        latest = self.grade(self.maths, date(2025, 2, 10), 80)
+        self.assertEqual(self.assertMatchesRebuild()[:4], (140, 200, 2, date(2025, 2, 10)))
+
+        latest.subject = self.science
+        latest.marks_obtained = 90
+        latest.save()
+        totals = self.assertMatchesRebuild()[4]
+        self.assertEqual(totals[str(self.science.id)]['marks'], 90)
+        self.assertEqual(totals[str(self.maths.id)]['count'], 1)
+
+        # Moving or deleting the latest assessment looks up the one before it
+        latest.assessment_date = date(2025, 1, 1)
+        latest.save()
+        self.assertEqual(self.assertMatchesRebuild()[3], date(2025, 1, 10))
+        first.delete()
+        self.assertEqual(self.assertMatchesRebuild()[:4], (90, 100, 1, date(2025, 1, 1)))
+
+        self.science.name = 'General Science'
+        self.science.save()
+        self.assertEqual(self.metrics()[4][str(self.science.id)]['name'], 'General Science')
+
+    def test_missing_row_is_rebuilt(self):
+        self.grade(self.maths, date(2025, 1, 10), 60)
+        StudentMetrics.objects.all().delete()
+        self.grade(self.maths, date(2025, 1, 20), 70)
+        self.assertEqual(self.assertMatchesRebuild()[:3], (130, 200, 2))
+
+    def test_str_does_not_query(self):
+        self.grade(self.maths, date(2025, 1, 10), 60)
+        grade = Grade.objects.get()
+        with self.assertNumQueries(0):
+            self.assertEqual(str(grade), f'Student {self.student.id} - Subject {self.maths.id} - B')
+        grade = Grade.objects.select_related('student', 'subject').get()
+        with self.assertNumQueries(0):
+            self.assertEqual(str(grade), 'Asha - Maths - B')
+
+    @override_settings(VIEW_BUDGET_ACTION='raise')
+    def test_detail_page_within_budget(self):
+        self.grade(self.maths, date(2025, 1, 10), 60)
+        registry.reset()
+        response = self.client.get(reverse('student_detail', args=[self.student.id]))
+        self.assertEqual((response.context['avg_percentage'], response.context['grade_count']), (60.0, 1))
+        self.assertEqual(registry.snapshot()['student_detail']['over_budget'], 0)
+
+
+class StatsCacheTests(TestCase):
+    """Dashboard statistics are served from the cache until a committed write bumps their generation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='coordinator')
+        cls.center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+
+    def setUp(self):
+        stats_cache().clear()
+
+    def add_student(self, student_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Student.objects.create(
+                student_id=student_id, first_name='Asha', last_name='Rao', date_of_birth=date(2012, 1, 1),
+                gender='F', center=self.center, guardian_name='Guardian', guardian_phone='0000000000',
+            )
+
+    def test_writes_bump_generation(self):
+        self.add_student('STU001')
+        self.assertEqual(active_student_count(), 1)
+        # Queryset updates send no signals, so the cached value stands...
+        Student.objects.update(is_active=False)
+        self.assertEqual(active_student_count(), 1)
+        # ...until a signalled write commits
+        self.add_student('STU002')
+        self.add_student('STU003')
+        self.assertEqual(active_student_count(), 2)
+        self.assertEqual(center_student_counts()[0]['student_count'], 2)
+
+        # Nothing is bumped before the transaction commits
+        Student.objects.create(
+            student_id='STU004', first_name='Ravi', last_name='Rao', date_of_birth=date(2012, 1, 1),
+            gender='M', center=self.center, guardian_name='Guardian', guardian_phone='0000000000',
+        )
+        self.assertEqual(active_student_count(), 2)
+
+    def test_lost_generation_misses(self):
+        self.add_student('STU001')
+        self.assertEqual(active_student_count(), 1)
+        Student.objects.update(is_active=False)
+        stats_cache().delete(_generation_key('students'))
+        self.assertEqual(active_student_count(), 0)
+
+    def test_computed_on_primary(self):
+        self.assertIsNone(cached_stat('source', ['students'], current_source))
+
+
+class StudentSearchTests(TestCase):
+    """Ranked search applies the active and center filters before cutting to its limit"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='coordinator')
+        cls.center, cls.other_center = [
+            Center.objects.create(name=name, location='Mumbai', coordinator=user,
+                                  established_date=date(2020, 1, 1), capacity=100)
+            for name in ('Central Learning Hub', 'North Learning Hub')
+        ]
+        cls.students = {}
+        for student_id, first_name, center, is_active in [
+            ('STU001', 'Asha', cls.center, True), ('STU002', 'Ashok', cls.center, True),
+            ('STU003', 'Ashwin', cls.center, False), ('STU004', 'Ashima', cls.other_center, True),
+        ]:
+            cls.students[first_name] = Student.objects.create(
+                student_id=student_id, first_name=first_name, last_name='Rao', date_of_birth=date(2012, 1, 1),
+                gender='F', center=center, guardian_name='Guardian', guardian_phone='0000000000',
+                is_active=is_active,
+            )
+
+    def setUp(self):
+        if not search_available():
+            self.skipTest('Full-text search needs SQLite')
+
+    def test_scope_applies_before_limit(self):
+        self.assertEqual(len(search_student_ids('rao', limit=10)), 4)
+        self.assertEqual(search_student_ids('rao', limit=1, center_id=self.other_center.id),
+                         [self.students['Ashima'].id])
+        active = search_student_ids('ash', limit=10, is_active=True)
+        self.assertEqual(len(active), 3)
+        self.assertNotIn(self.students['Ashwin'].id, active)
+        # Fuzzy matches are scoped too
+        self.assertEqual(search_student_ids('ashimq', limit=5, center_id=self.other_center.id),
+                         [self.students['Ashima'].id])
+
+    def test_list_search_with_center_filter(self):
+        with mock.patch('students.views.STUDENT_SEARCH_LIMIT', 1):
+            response = self.client.get(reverse('student_list'), {'search': 'rao', 'center': self.other_center.id})
+        self.assertEqual([student.id for student in response.context['students']], [self.students['Ashima'].id])
+
+        response = self.client.get(reverse('student_autocomplete'), {'q': 'ash'})
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_support_is_probed_once(self):
+        with mock.patch.dict('students.search._supported', clear=True):
+            self.assertTrue(search_available())
+            with self.assertNumQueries(0):
+                self.assertTrue(search_available())
+
+    def test_falls_back_without_fts5(self):
+        with mock.patch.dict('students.search._supported', {connection.alias: False}):
+            with mock.patch('students.views.search_student_ids', side_effect=AssertionError):
+                response = self.client.get(reverse('student_list'), {'search': 'ashim'})
+        self.assertEqual([student.id for student in response.context['students']], [self.students['Ashima'].id])
+
+    def test_fixture_loads_skip_the_index(self):
+        student = self.students['Asha']
+        student.first_name = 'Meera'
+        with mock.patch('students.signals.index_student') as index_student:
+            student.save_base(raw=True)
+        index_student.assert_not_called()
+
+
+class ImportTests(TestCase):
+    """CSV imports write valid rows in batches, report bad ones by line and keep derived data current"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='coordinator')
+        cls.center = Center.objects.create(
+            name='Central Learning Hub', location='Mumbai', coordinator=user,
+            established_date=date(2020, 1, 1), capacity=100,
+        )
+        cls.subject = Subject.objects.create(name='Maths', code='MTH')
+
+    def rows(self, text):
+        return read_rows(StringIO(text.strip() + '\n'))
+
+    def import_students(self, batch_size=2):
+        return import_students(self.rows("""
+student_id,first_name,last_name,date_of_birth,gender,center,guardian_name,guardian_phone
+STU001,Asha,Rao,2012-01-01,F,Central Learning Hub,Guardian,0000000000
+STU002,Ravi,Kumar,2012-02-01,male,central learning hub,Guardian,0000000000
+STU001,Asha,Rao,2012-01-01,F,Central Learning Hub,Guardian,0000000000
+STU003,Meera,Shah,2012-01-01xyz,F,Central Learning Hub,Guardian,0000000000
+STU004,Meera,Shah,20120101,F,Central Learning Hub,Guardian,0000000000
+STU005,Meera,Shah,2012-01-01,X,Central Learning Hub,Guardian,0000000000
+STU006,Meera,Shah,2012-01-01,F,Nowhere,Guardian,0000000000
+"""), batch_size=batch_size)
+
+    def test_students(self):
+        result = self.import_students()
+        self.assertEqual((result['rows'], result['created'], result['failed']), (7, 2, 5))
+        self.assertEqual([line for line, _ in result['errors']], [4, 5, 6, 7, 8])
+        self.assertIn('already exists', result['errors'][0][1])
+        self.assertIn('not a YYYY-MM-DD date', result['errors'][1][1])
+
+        student = Student.objects.get(student_id='STU002')
+        self.assertEqual((student.gender, student.date_of_birth, student.enrollment_date),
+                         ('M', date(2012, 2, 1), date.today()))
+        self.assertEqual(StudentMetrics.objects.count(), 2)
+        if search_available():
+            self.assertEqual(search_student_ids('Ravi'), [student.id])
+
+    def test_dry_run_writes_nothing(self):
+        result = import_students(self.rows("""
+student_id,first_name,last_name,date_of_birth,gender,center,guardian_name,guardian_phone
+STU001,Asha,Rao,2012-01-01,F,Central Learning Hub,Guardian,0000000000
+"""), dry_run=True)
+        self.assertEqual(result['created'], 1)
+        self.assertFalse(Student.objects.exists())
+
+    def test_conflicting_batch_falls_back_to_rows(self):
+        # Another writer takes a student_id after the batch checked for existing ones
+        original = Student.objects.filter
+
+        def filter_then_conflict(*args, **kwargs):
+            queryset = original(*args, **kwargs)
+            if 'student_id__in' in kwargs and not original(student_id='STU002').exists():
+                Student.objects.create(
+                    student_id='STU002', first_name='Other', last_name='Student', date_of_birth=date(2012, 1, 1),
+                    gender='F', center=self.center, guardian_name='Guardian', guardian_phone='0000000000',
+                )
+            return queryset
+
+        with mock.patch.object(Student.objects, 'filter', side_effect=filter_then_conflict):
+            result = self.import_students(batch_size=10)
+        self.assertEqual((result['created'], result['failed']), (1, 6))
+        self.assertEqual(Student.objects.get(student_id='STU001').metrics.grade_count, 0)
+
+    def test_grades(self):
+        self.import_students()
+        result = import_grades(self.rows("""
+student_id,subject,assessment_date,marks_obtained,total_marks,grade_letter
+STU001,MTH,2025-01-10,60,100,B
+STU002,maths,2025-01-12,45.0,50,A
+STU001,MTH,2025-01-11,120,100,A
+STU009,MTH,2025-01-10,60,100,B
+STU001,History,2025-01-10,60,100,B
+STU001,MTH,2025-01-10,sixty,100,B
+STU001,MTH,2025-01-10T00:00,60,100,B
+"""))
+        self.assertEqual((result['created'], result['failed']), (2, 5))
+        self.assertEqual([line for line, _ in result['errors']], [4, 5, 6, 7, 8])
+        grade = Grade.objects.get(student__student_id='STU002')
+        self.assertEqual((grade.center_id, grade.marks_obtained, grade.assessment_date),
+                         (self.center.id, 45, date(2025, 1, 12)))
+        metrics = StudentMetrics.objects.get(student__student_id='STU001')
+        self.assertEqual((metrics.grade_count, metrics.marks_obtained_total, metrics.last_assessment_date),
+                         (1, 60, date(2025, 1, 10)))
 
-# Create your tests here.
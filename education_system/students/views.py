@@ -1,29 +1,44 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.db.models import Q, Avg
+from django.db.models import Q, Avg, Count, OuterRef, Subquery
 from django.core.paginator import Paginator
+from django.http import JsonResponse
 from .models import Student, Attendance, Grade
-from .forms import StudentForm, AttendanceForm
+from .forms import StudentForm, AttendanceForm, ImportForm
+from .imports import GRADE_COLUMNS, IMPORTERS, STUDENT_COLUMNS, ImportFileError, read_rows
+from .bulk import parse_attendance_form, bulk_mark_attendance
+from .bitmaps import attendance_days, load_bitmaps, longest_present_streak, restrict, summarize
+from .metrics import attendance_window_start, get_student_metrics
+from .search import fallback_filter, search_available, search_student_ids
 from datetime import date, timedelta
+from urllib.parse import urlencode
 from centers.models import Center
 
+# Most ranked matches a list search will show
+STUDENT_SEARCH_LIMIT = 500
+AUTOCOMPLETE_LIMIT = 10
+# Days covered by the student detail page's long-range attendance rate
+ATTENDANCE_YEAR_DAYS = 365
+
 def student_list(request):
-    students = Student.objects.filter(is_active=True).select_related('center')
-    
-    # Search functionality
-    search_query = request.GET.get('search')
-    if search_query:
-        students = students.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(student_id__icontains=search_query)
-        )
+    students = Student.objects.filter(is_active=True).select_related('center').order_by('last_name', 'first_name', 'id')
     
     # Filter by center
     center_filter = request.GET.get('center')
     if center_filter:
         students = students.filter(center_id=center_filter)
     
+    # Search functionality: ranked full-text matches, in rank order
+    search_query = request.GET.get('search')
+    if search_query:
+        if search_available():
+            scope = {'center_id': center_filter} if center_filter else {}
+            ranked_ids = search_student_ids(search_query, limit=STUDENT_SEARCH_LIMIT, is_active=True, **scope)
+            rank = {student_id: position for position, student_id in enumerate(ranked_ids)}
+            students = sorted(students.filter(id__in=ranked_ids), key=lambda student: rank[student.id])
+        else:
+            students = students.filter(fallback_filter(search_query))
+    
     # Pagination
     paginator = Paginator(students, 20)
     page_number = request.GET.get('page')
@@ -41,39 +56,68 @@ def student_list(request):
     }
     return render(request, 'students/student_list.html', context)
 
+def student_autocomplete(request):
+    """Top ranked active students for a partial query, as JSON for search-as-you-type"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'results': []})
+
+    students = Student.objects.filter(is_active=True).select_related('center')
+    if search_available():
+        ranked_ids = search_student_ids(query, limit=AUTOCOMPLETE_LIMIT, is_active=True)
+        rank = {student_id: position for position, student_id in enumerate(ranked_ids)}
+        students = sorted(students.filter(id__in=ranked_ids), key=lambda student: rank[student.id])
+    else:
+        students = students.filter(fallback_filter(query)).order_by('last_name', 'first_name', 'id')
+
+    return JsonResponse({'results': [
+        {
+            'id': student.id,
+            'student_id': student.student_id,
+            'name': f"{student.first_name} {student.last_name}",
+            'center': student.center.name,
+        }
+        for student in students[:AUTOCOMPLETE_LIMIT]
+    ]})
+
 def student_detail(request, student_id):
-    student = get_object_or_404(Student, id=student_id)
+    student = get_object_or_404(
+        Student.objects.select_related('center__coordinator', 'metrics'), id=student_id
+    )
     today = date.today()
     dob = student.date_of_birth
     age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
     
-    # Get recent attendance (last 30 days)
-    thirty_days_ago = date.today() - timedelta(days=30)
-    recent_attendance = Attendance.objects.filter(
-        student=student,
-        date__gte=thirty_days_ago
-    ).order_by('-date')
+    # Attendance rates, streaks and recent days come from the monthly bitmaps
+    year_months = load_bitmaps(
+        today - timedelta(days=ATTENDANCE_YEAR_DAYS), today, students=[student.id]
+    ).get(student.id, [])
+    year = summarize(year_months)
+    months = restrict(year_months, attendance_window_start(today), today)
+    window = summarize(months)
+    recent_attendance = [
+        {'date': day, 'is_present': is_present}
+        for day, is_present in reversed(attendance_days(months))
+    ]
     
-    # Calculate attendance percentage
-    total_days = recent_attendance.count()
-    present_days = recent_attendance.filter(is_present=True).count()
-    attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
-    
-    # Get recent grades
-    recent_grades = Grade.objects.filter(student=student).select_related('subject').order_by('-assessment_date')[:10]
-    
-    # Calculate average performance
-    avg_percentage = Grade.objects.filter(student=student).aggregate(
-        avg_percentage=Avg('marks_obtained') * 100 / Avg('total_marks')
-    )['avg_percentage'] or 0
+    # Grade averages come from the metrics row
+    metrics = get_student_metrics(student)
     
     context = {
         'student': student,
         'age': age,
         'recent_attendance': recent_attendance[:10],
-        'attendance_percentage': round(attendance_percentage, 1),
-        'recent_grades': recent_grades,
-        'avg_percentage': round(avg_percentage, 1),
+        'days_tracked': window['recorded_days'],
+        'attendance_percentage': round(window['attendance_rate'], 1),
+        'present_streak': window['present_streak'],
+        'absence_streak': window['absence_streak'],
+        'year_attendance_percentage': round(year['attendance_rate'], 1),
+        'year_days_tracked': year['recorded_days'],
+        'longest_present_streak': longest_present_streak(year_months),
+        'avg_percentage': round(metrics.average_percentage, 1),
+        'grade_count': metrics.grade_count,
+        'last_assessment_date': metrics.last_assessment_date,
+        'subject_averages': metrics.subject_averages,
     }
     return render(request, 'students/student_detail.html', context)
 
@@ -108,46 +152,22 @@ def mark_attendance(request):
     if selected_center:
         students = students.filter(center_id=selected_center)
     
-    # Get today's attendance
-    today_attendance = Attendance.objects.filter(
-        date=selected_date
-    ).select_related('student')
-    
-    if selected_center:
-        today_attendance = today_attendance.filter(student__center_id=selected_center)
-    
     # Handle POST request for marking attendance
     if request.method == 'POST':
         attendance_date = request.POST.get('attendance_date')
-        if attendance_date:
-            attendance_date = date.fromisoformat(attendance_date)
-        else:
-            attendance_date = selected_date
+        try:
+            attendance_date = date.fromisoformat(attendance_date) if attendance_date else selected_date
+        except ValueError:
+            messages.error(request, '❌ Invalid attendance date.')
+            return redirect('mark_attendance')
         
-        success_count = 0
-        error_count = 0
+        # One pass over the form, then a single batched write for all students
+        entries = parse_attendance_form(request.POST)
+        student_centers = dict(students.values_list('id', 'center_id'))
+        result = bulk_mark_attendance(entries, attendance_date, student_centers)
         
-        for student in students:
-            attendance_status = request.POST.get(f'student_{student.id}')
-            remarks = request.POST.get(f'remarks_{student.id}', '')
-            
-            if attendance_status:
-                is_present = attendance_status == 'present'
-                
-                # Create or update attendance record
-                attendance, created = Attendance.objects.update_or_create(
-                    student=student,
-                    date=attendance_date,
-                    defaults={
-                        'is_present': is_present,
-                        'remarks': remarks
-                    }
-                )
-                
-                if created or attendance:
-                    success_count += 1
-                else:
-                    error_count += 1
+        success_count = result['created'] + result['updated'] + result['unchanged']
+        error_count = result['failed']
         
         if success_count > 0:
             messages.success(
@@ -163,13 +183,30 @@ def mark_attendance(request):
         
         return redirect('mark_attendance')
     
+    # Annotate each student with the selected day's status in the same query
+    day_attendance = Attendance.objects.filter(student=OuterRef('pk'), date=selected_date)
+    students = list(students.annotate(
+        today_is_present=Subquery(day_attendance.values('is_present')[:1]),
+    ))
+    
+    # Present/absent totals for the day
+    today_attendance = Attendance.objects.filter(date=selected_date)
+    if selected_center:
+        today_attendance = today_attendance.filter(center_id=selected_center)
+    attendance_summary = today_attendance.aggregate(
+        total=Count('id'),
+        present=Count('id', filter=Q(is_present=True)),
+    )
+    attendance_summary['absent'] = attendance_summary['total'] - attendance_summary['present']
+    
     # Get all centers for filter dropdown
     centers = Center.objects.filter(is_active=True)
     
     context = {
         'students': students,
+        'student_count': len(students),
         'centers': centers,
-        'today_attendance': today_attendance,
+        'attendance_summary': attendance_summary,
         'selected_date': selected_date,
         'selected_center': selected_center,
     }
@@ -215,7 +252,114 @@ def add_grade(request):
         form = GradeForm()
     return render(request, 'students/add_grade.html', {'form': form})
 
+# Row errors listed on the import page; the command writes the full report
+IMPORT_ERRORS_SHOWN = 200
+
+def import_data(request):
+    """Bulk import students or grades from an uploaded CSV"""
+    result = None
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = IMPORTERS[form.cleaned_data['kind']](
+                    read_rows(upload.file, upload.name),
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+            except ImportFileError as e:
+                messages.error(request, f'❌ {e}')
+            else:
+                if result['failed']:
+                    messages.error(request, f"❌ {result['failed']} rows could not be imported; see the errors below.")
+                else:
+                    messages.success(request, f"✅ {result['created']} rows imported successfully!")
+    else:
+        form = ImportForm()
+    
+    context = {
+        'form': form,
+        'result': result,
+        'errors': result['errors'][:IMPORT_ERRORS_SHOWN] if result else [],
+        'dry_run': form.data.get('dry_run') if result else False,
+        'student_columns': STUDENT_COLUMNS,
+        'grade_columns': GRADE_COLUMNS,
+    }
+    return render(request, 'students/import_data.html', context)
+
+GRADES_PER_PAGE = 50
+
+def _parse_grade_cursor(value):
+    """Cursor values look like '2025-06-21_42' (assessment_date, id)"""
+    try:
+        day, grade_id = value.split('_')
+        return date.fromisoformat(day), int(grade_id)
+    except (AttributeError, ValueError):
+        return None
+
+def _grade_cursor(row):
+    return f"{row['assessment_date'].isoformat()}_{row['id']}"
+
 def grade_list(request):
-    grades = Grade.objects.select_related('student', 'subject').order_by('-assessment_date')
-    # Optional: implement filtering by student, subject, or date
-    return render(request, 'students/grade_list.html', {'grades': grades})
+    """Grades newest first, filtered server-side and paged by (assessment_date, id) keyset"""
+    grades = Grade.objects.all()
+    
+    # Filters
+    filters = {
+        'student': request.GET.get('student', '').strip(),
+        'subject': request.GET.get('subject', ''),
+        'center': request.GET.get('center', ''),
+        'date_from': request.GET.get('date_from', ''),
+        'date_to': request.GET.get('date_to', ''),
+    }
+    if filters['student']:
+        grades = grades.filter(student_id__in=Student.objects.filter(student_id=filters['student']).values('id'))
+    if filters['subject'].isdigit():
+        grades = grades.filter(subject_id=filters['subject'])
+    if filters['center'].isdigit():
+        grades = grades.filter(center_id=filters['center'])
+    for key, lookup in (('date_from', 'assessment_date__gte'), ('date_to', 'assessment_date__lte')):
+        try:
+            grades = grades.filter(**{lookup: date.fromisoformat(filters[key])})
+        except ValueError:
+            filters[key] = ''
+    
+    # Keyset pagination: seek past the cursor instead of counting an OFFSET
+    after = _parse_grade_cursor(request.GET.get('after'))
+    before = _parse_grade_cursor(request.GET.get('before'))
+    if before:
+        day, grade_id = before
+        grades = grades.filter(
+            Q(assessment_date__gt=day) | Q(assessment_date=day, id__gt=grade_id)
+        ).order_by('assessment_date', 'id')
+    else:
+        if after:
+            day, grade_id = after
+            grades = grades.filter(
+                Q(assessment_date__lt=day) | Q(assessment_date=day, id__lt=grade_id)
+            )
+        grades = grades.order_by('-assessment_date', '-id')
+    
+    rows = list(grades.values(
+        'id', 'assessment_date', 'marks_obtained', 'total_marks', 'grade_letter',
+        'student__first_name', 'student__last_name', 'subject__name',
+    )[:GRADES_PER_PAGE + 1])
+    has_more = len(rows) > GRADES_PER_PAGE
+    rows = rows[:GRADES_PER_PAGE]
+    if before:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, after is not None
+    
+    query = {key: value for key, value in filters.items() if value}
+    context = {
+        'grades': rows,
+        'filters': filters,
+        'filter_query': urlencode(query),
+        'next_cursor': _grade_cursor(rows[-1]) if rows and has_next else None,
+        'previous_cursor': _grade_cursor(rows[0]) if rows and has_previous else None,
+        'subjects': Subject.objects.order_by('name'),
+        'centers': Center.objects.filter(is_active=True),
+    }
+    return render(request, 'students/grade_list.html', context)